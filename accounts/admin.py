@@ -1,16 +1,23 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
 
+from bolao2026.admin_utils import LargeTableAdminMixin
+
 from .models import User, Robinho
 
 
 @admin.register(User)
-class UserAdmin(DjangoUserAdmin):
-    pass
+class UserAdmin(LargeTableAdminMixin, DjangoUserAdmin):
+    # Sem o filtro por grupos (JOIN + DISTINCT na tabela de usuários).
+    list_filter = ("is_staff", "is_superuser", "is_active")
+    # username é único (indexado): busca por prefixo usa o índice
+    search_fields = ("^username", "=email")
 
 
 @admin.register(Robinho)
-class RobinhoAdmin(admin.ModelAdmin):
+class RobinhoAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ("codigo", "email", "pago", "usado", "ativo", "criado_em")
     list_filter = ("pago", "usado", "ativo")
-    search_fields = ("codigo", "email")
+    # codigo tem índice: busca exata ou por prefixo
+    search_fields = ("^codigo", "=email")
+    raw_id_fields = ("user",)
@@ -12,3 +12,16 @@ class IsSuperUserOrReadOnly(BasePermission):
         if request.method in SAFE_METHODS:
             return bool(user and user.is_authenticated)
         return bool(user and user.is_authenticated and user.is_superuser)
+
+
+class IsSuperUser(BasePermission):
+    """
+    Permissão: apenas superuser.
+    """
+
+    def has_permission(self, request, view):
+        return bool(
+            request.user
+            and request.user.is_authenticated
+            and request.user.is_superuser
+        )
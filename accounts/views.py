@@ -4,6 +4,7 @@ from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .permissions import IsSuperUser
 from .serializers import (
     ActivateWithRobinhoSerializer,
     LoginSerializer,
@@ -15,19 +16,6 @@ from .serializers import (
 User = get_user_model()
 
 
-class IsSuperUser(permissions.BasePermission):
-    """
-    Permissão: apenas superuser.
-    """
-
-    def has_permission(self, request, view):
-        return bool(
-            request.user
-            and request.user.is_authenticated
-            and request.user.is_superuser
-        )
-
-
 class ActivateWithRobinhoView(generics.CreateAPIView):
     """
     POST /api/accounts/ativar-robinho/
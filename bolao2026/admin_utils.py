@@ -0,0 +1,59 @@
+"""
+Admin para tabelas grandes (centenas de milhares de palpites).
+
+O changelist padrão faz COUNT(*) da tabela inteira (às vezes duas vezes:
+resultado filtrado + total) a cada página. Aqui:
+
+- sem filtro/busca, o total vem da estimativa do próprio banco
+  (pg_class no PostgreSQL, information_schema no MySQL), sem varrer nada;
+- com filtro/busca, a contagem para em COUNT_LIMIT linhas;
+- show_full_result_count = False evita o segundo COUNT.
+
+Em troca, o número de páginas é aproximado; para chegar em registros
+antigos, use filtros ou a busca.
+"""
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+COUNT_LIMIT = 10000
+
+
+def estimated_row_count(model, using="default"):
+    """
+    Nº aproximado de linhas da tabela segundo as estatísticas do banco,
+    ou None se o banco não oferecer (ex.: SQLite).
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == "postgresql":
+        sql = "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass"
+    elif connection.vendor == "mysql":
+        sql = (
+            "SELECT table_rows FROM information_schema.tables "
+            "WHERE table_schema = DATABASE() AND table_name = %s"
+        )
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [table])
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        if not qs.query.where:
+            estimate = estimated_row_count(qs.model, qs.db)
+            if estimate is not None and estimate > COUNT_LIMIT:
+                return estimate
+        return qs[:COUNT_LIMIT].count()
+
+
+class LargeTableAdminMixin:
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
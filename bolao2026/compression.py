@@ -0,0 +1,88 @@
+"""
+Compressão das respostas da API.
+
+- ApiGZipMiddleware: GZip do Django para todas as respostas, exceto o
+  stream SSE (cada evento precisa sair na hora, sem buffer do gzip).
+- Payloads pré-comprimidos: respostas grandes e cacheadas (ranking, lista
+  de jogos) guardam no cache o JSON já renderizado e a versão gzip lado a
+  lado. Um cache hit devolve os bytes prontos, sem renderizar nem
+  comprimir de novo a cada requisição; o middleware não mexe em respostas
+  que já têm Content-Encoding. Nas views do DRF, os bytes prontos só servem
+  quando a negociação escolheu JSON (accepts_payload); a API navegável e o
+  ?indent passam pelo Response normal.
+"""
+import gzip
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.gzip import GZipMiddleware, re_accepts_gzip
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+
+from .renderers import dumps
+
+COMPRESS_LEVEL = 6
+
+
+class ApiGZipMiddleware(GZipMiddleware):
+    def process_response(self, request, response):
+        if response.get("Content-Type", "").startswith("text/event-stream"):
+            return response
+        return super().process_response(request, response)
+
+
+def build_payload(data):
+    """
+    {"json": bytes, "gzip": bytes ou None} — gzip só quando compensa.
+    """
+    raw = dumps(data)
+    compressed = gzip.compress(raw, compresslevel=COMPRESS_LEVEL, mtime=0)
+    return {"json": raw, "gzip": compressed if len(compressed) < len(raw) else None}
+
+
+def cached_payload(key, build, timeout):
+    """
+    Payload do cache em `key`; num miss, build() devolve os dados a renderizar.
+    """
+    payload = cache.get(key)
+    if payload is None:
+        payload = build_payload(build())
+        cache.set(key, payload, timeout)
+    return payload
+
+
+async def acached_payload(key, abuild, timeout):
+    payload = await cache.aget(key)
+    if payload is None:
+        payload = build_payload(await abuild())
+        await cache.aset(key, payload, timeout)
+    return payload
+
+
+def accepts_payload(request):
+    """
+    Se a negociação de conteúdo do DRF (já feita em `request`) escolheu o
+    JSON compacto que está no payload.
+    """
+    renderer = getattr(request, "accepted_renderer", None)
+    if not isinstance(renderer, JSONRenderer):
+        return False
+    return not renderer.get_indent(request.accepted_media_type, {})
+
+
+def payload_response(request, payload, status=200):
+    """
+    HttpResponse com o JSON comprimido (se o cliente aceitar gzip) ou cru.
+    """
+    accepts_gzip = re_accepts_gzip.search(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+    if payload["gzip"] is not None and accepts_gzip:
+        response = HttpResponse(
+            payload["gzip"], status=status, content_type="application/json"
+        )
+        response["Content-Encoding"] = "gzip"
+    else:
+        response = HttpResponse(
+            payload["json"], status=status, content_type="application/json"
+        )
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
@@ -0,0 +1,129 @@
+"""
+Roteamento de leituras para réplicas do banco.
+
+- ReplicaRoutingMiddleware: requisições GET/HEAD/OPTIONS leem das réplicas
+  listadas em settings.DATABASE_REPLICAS; escritas sempre vão para "default".
+- Read-your-writes: depois de uma escrita bem-sucedida, o mesmo cliente
+  (token ou sessão) fica "preso" ao banco principal por
+  settings.DATABASE_REPLICA_PIN_SECONDS, tempo para a réplica alcançar.
+- replica_reads(): liga/desliga o uso de réplica num trecho de código
+  (ex.: cálculo do ranking fora de uma requisição).
+
+Sem réplicas configuradas, tudo continua indo para "default".
+Para o pin funcionar entre workers, o cache precisa ser compartilhado.
+"""
+import contextvars
+import hashlib
+import random
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Token/sessão recém-criados (login, ativação) precisam ser achados na
+# requisição seguinte, antes de a réplica alcançar: sempre no principal.
+# O mesmo vale para o DatabaseCache (app "django_cache"): versões e eventos
+# ao vivo lidos de uma réplica atrasada voltariam ao valor anterior.
+PRIMARY_ONLY_APPS = ("authtoken", "sessions", "django_cache")
+
+_use_replica = contextvars.ContextVar("use_replica", default=False)
+
+
+def replica_aliases():
+    return list(getattr(settings, "DATABASE_REPLICAS", []))
+
+
+def pin_seconds():
+    return getattr(settings, "DATABASE_REPLICA_PIN_SECONDS", 5)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    token = _use_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = replica_aliases()
+        if not replicas or not _use_replica.get():
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return DEFAULT_DB_ALIAS
+        # Dentro de transação no principal, a leitura tem que ver o que
+        # a própria transação gravou.
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+def _pin_key(request):
+    """
+    Identifica o cliente pelo header Authorization (token do DRF) ou,
+    na falta dele, pelo cookie de sessão (admin).
+    """
+    credential = request.headers.get("Authorization") or request.COOKIES.get(
+        settings.SESSION_COOKIE_NAME
+    )
+    if not credential:
+        return None
+    digest = hashlib.sha256(credential.encode()).hexdigest()
+    return f"db:pin:{digest}"
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not replica_aliases():
+            return self.get_response(request)
+
+        key = _pin_key(request)
+        if request.method in SAFE_METHODS:
+            pinned = key is not None and cache.get(key) is not None
+            with replica_reads(not pinned):
+                return self.get_response(request)
+
+        response = self.get_response(request)
+        if key is not None and response.status_code < 400:
+            cache.set(key, 1, pin_seconds())
+        return response
+
+    async def __acall__(self, request):
+        if not replica_aliases():
+            return await self.get_response(request)
+
+        key = _pin_key(request)
+        if request.method in SAFE_METHODS:
+            pinned = key is not None and await cache.aget(key) is not None
+            with replica_reads(not pinned):
+                return await self.get_response(request)
+
+        response = await self.get_response(request)
+        if key is not None and response.status_code < 400:
+            await cache.aset(key, 1, pin_seconds())
+        return response
@@ -0,0 +1,202 @@
+"""
+Profiler por amostragem das requisições lentas (opt-in).
+
+- ProfilingMiddleware: com settings.PROFILE_SAMPLE_RATE > 0, roda o cProfile
+  numa fração das requisições e guarda o perfil só das que passaram de
+  settings.PROFILE_MIN_MS. Fora da amostra o custo é um random().
+- Os perfis vão para settings.PROFILE_DIR, um arquivo .prof por requisição
+  com a view no nome (ex.: RankingView.get, MatchViewSet.list); ficam os
+  PROFILE_KEEP mais recentes de cada view. Em arquivo, os workers do mesmo
+  servidor somam na mesma pasta.
+- profile_report(): junta os perfis de cada view (pstats) e devolve as
+  funções mais caras. Servido em /api/copa/profiles/ (superuser) e pelo
+  comando profile_report.
+
+Só um perfil por vez no processo (o cProfile não aceita dois ativos ao
+mesmo tempo): requisições sorteadas enquanto outra está sendo perfilada
+passam direto.
+
+Sob ASGI, as requisições fora da amostra passam direto pelo caminho async
+(sem thread). As sorteadas rodam numa thread (sync_to_async), como no
+modo síncrono: a duração é a real, mas o cProfile só enxerga essa thread,
+e o que as views async executam no event loop aparece como espera.
+"""
+import cProfile
+import os
+import pstats
+import random
+import threading
+import time
+from pathlib import Path
+
+from asgiref.sync import (
+    async_to_sync,
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.conf import settings
+
+SORT_KEYS = ("cumulative", "tottime", "calls")
+
+_lock = threading.Lock()
+
+
+def sample_rate():
+    return getattr(settings, "PROFILE_SAMPLE_RATE", 0.0)
+
+
+def profile_dir():
+    return Path(getattr(settings, "PROFILE_DIR", settings.BASE_DIR / "profiles"))
+
+
+def view_label(request):
+    """
+    "MatchViewSet.list", "RankingView.get", ... (ou o nome da rota).
+    """
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved"
+    func = match.func
+    cls = getattr(func, "cls", None) or getattr(func, "view_class", None)
+    if cls is None:
+        return match.view_name or func.__name__
+    method = request.method.lower()
+    actions = getattr(func, "actions", None)  # ViewSets do DRF
+    if actions:
+        method = actions.get(method, method)
+    return f"{cls.__name__}.{method}"
+
+
+def _profile_files(label=None):
+    folder = profile_dir()
+    if not folder.is_dir():
+        return []
+    pattern = f"{label}~*.prof" if label else "*.prof"
+    return sorted(folder.glob(pattern))
+
+
+def _save(profiler, label, elapsed_ms):
+    folder = profile_dir()
+    folder.mkdir(parents=True, exist_ok=True)
+    # view~duração~instante~pid: a listagem sai sem abrir os arquivos
+    name = f"{label}~{elapsed_ms:.0f}~{time.time_ns()}~{os.getpid()}.prof"
+    profiler.dump_stats(folder / name)
+
+    keep = getattr(settings, "PROFILE_KEEP", 50)
+    files = sorted(
+        _profile_files(label), key=lambda path: int(path.stem.split("~")[2])
+    )
+    for path in files[:-keep]:
+        path.unlink(missing_ok=True)
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not _sampled():
+            return self.get_response(request)
+        return _profile(request, self.get_response)
+
+    async def __acall__(self, request):
+        if not _sampled():
+            return await self.get_response(request)
+        return await sync_to_async(_profile)(request, async_to_sync(self.get_response))
+
+
+def _sampled():
+    rate = sample_rate()
+    return rate > 0 and random.random() < rate
+
+
+def _profile(request, get_response):
+    if not _lock.acquire(blocking=False):
+        return get_response(request)
+    try:
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            response = get_response(request)
+        finally:
+            profiler.disable()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms >= getattr(settings, "PROFILE_MIN_MS", 500):
+            _save(profiler, view_label(request), elapsed_ms)
+    finally:
+        _lock.release()
+    return response
+
+
+def _function_name(func):
+    filename, line, name = func
+    if filename == "~":  # built-ins
+        return name
+    return f"{filename}:{line}({name})"
+
+
+def profile_report(label=None, top=30, sort="cumulative"):
+    """
+    Uma entrada por view: amostras, duração (média/máx) e as `top` funções
+    mais caras pelo critério `sort` (ver SORT_KEYS). Chamadas e tempos das
+    funções são médias por requisição.
+    """
+    if sort not in SORT_KEYS:
+        raise ValueError(f"sort deve ser um de: {', '.join(SORT_KEYS)}.")
+
+    by_view = {}
+    for path in _profile_files(label):
+        by_view.setdefault(path.stem.split("~")[0], []).append(path)
+
+    report = []
+    for view, paths in sorted(by_view.items()):
+        durations = [float(path.stem.split("~")[1]) for path in paths]
+        stats = pstats.Stats(*(str(path) for path in paths))
+        stats.sort_stats(sort)
+        functions = []
+        for func in stats.fcn_list[:top]:
+            _, calls, tottime, cumtime, _ = stats.stats[func]
+            functions.append(
+                {
+                    "function": _function_name(func),
+                    "calls": round(calls / len(paths), 1),
+                    "tottime_ms": round(tottime * 1000 / len(paths), 3),
+                    "cumtime_ms": round(cumtime * 1000 / len(paths), 3),
+                }
+            )
+        report.append(
+            {
+                "view": view,
+                "samples": len(paths),
+                "avg_ms": round(sum(durations) / len(durations), 1),
+                "max_ms": max(durations),
+                "functions": functions,
+            }
+        )
+    return report
+
+
+def merged_stats(label=None):
+    """
+    pstats.Stats com todos os perfis (da view), ou None se não houver.
+    """
+    paths = _profile_files(label)
+    if not paths:
+        return None
+    return pstats.Stats(*(str(path) for path in paths))
+
+
+def clear_profiles(label=None):
+    paths = _profile_files(label)
+    for path in paths:
+        path.unlink(missing_ok=True)
+    return len(paths)
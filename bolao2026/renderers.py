@@ -0,0 +1,84 @@
+"""
+JSON rápido para a API (DRF e views async), usando orjson quando instalado.
+
+orjson é opcional: sem ele (ou com ?indent pedido pelo cliente), tudo cai
+no JSONRenderer/JSONParser padrão do DRF. A saída é a mesma do DRF:
+compacta, UTF-8 sem escapes, datetimes/decimais/UUIDs/lazy strings
+convertidos pelo mesmo encoder (rest_framework.utils.encoders) e
+U+2028/U+2029 escapados.
+"""
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependência opcional
+    orjson = None
+
+# datetime/date/time passam pelo encoder do DRF (formato e 'Z' iguais)
+_ORJSON_OPTIONS = (
+    (
+        orjson.OPT_NON_STR_KEYS
+        | orjson.OPT_PASSTHROUGH_DATETIME
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+    )
+    if orjson is not None
+    else 0
+)
+
+_default = JSONEncoder().default
+
+
+def fast_json_enabled():
+    return orjson is not None and getattr(settings, "API_FAST_JSON", True)
+
+
+def dumps(data):
+    """
+    Serializa `data` em bytes JSON no formato do JSONRenderer do DRF.
+    """
+    if not fast_json_enabled():
+        return JSONRenderer().render(data)
+    content = orjson.dumps(data, default=_default, option=_ORJSON_OPTIONS)
+    # mesmo tratamento do DRF: separadores de linha do JS escapados
+    return content.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+        b"\xe2\x80\xa9", b"\\u2029"
+    )
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    application/json via orjson. Tem formato próprio (?format=orjson): o
+    JSONRenderer do DRF continua registrado logo depois, com ?format=json.
+    """
+
+    format = "orjson"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if not fast_json_enabled() or self.get_indent(
+            accepted_media_type or "", renderer_context or {}
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if not fast_json_enabled():
+            return super().parse(stream, media_type, parser_context)
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        try:
+            data = stream.read()
+            if encoding.lower().replace("-", "") != "utf8":
+                data = data.decode(encoding)
+            return orjson.loads(data)
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise ParseError(f"JSON parse error - {exc}")
@@ -27,12 +27,15 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",          # CORS primeiro
     "django.middleware.security.SecurityMiddleware",
+    "bolao2026.compression.ApiGZipMiddleware",      # antes de quem lê/grava o corpo
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "bolao2026.db_routing.ReplicaRoutingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "bolao2026.profiling.ProfilingMiddleware",      # só age com PROFILE_SAMPLE_RATE > 0
 ]
 
 
@@ -72,6 +75,69 @@ DATABASES = {
     }
 }
 
+# Réplicas de leitura (opcional)
+# Aliases de DATABASES listados em DATABASE_REPLICAS recebem as leituras das
+# requisições GET/HEAD/OPTIONS e o cálculo do ranking; escritas continuam no
+# "default". Após uma escrita, o mesmo cliente lê do "default" por
+# DATABASE_REPLICA_PIN_SECONDS (read-your-writes).
+# Para testar localmente, uma segunda instância MySQL ou um arquivo SQLite
+# (cópia do banco) servem de réplica:
+#
+# DATABASES["replica"] = {
+#     "ENGINE": "django.db.backends.sqlite3",
+#     "NAME": BASE_DIR / "replica.sqlite3",
+#     "TEST": {"MIRROR": "default"},
+# }
+# DATABASE_REPLICAS = ["replica"]
+DATABASE_REPLICAS = []
+DATABASE_REPLICA_PIN_SECONDS = 5
+DATABASE_ROUTERS = ["bolao2026.db_routing.ReplicaRouter"]
+
+# Cache compartilhado por todos os processos (workers web, run_worker e
+# comandos): o worker aquece o cache e publica o ranking ao vivo para os
+# workers web. Um LocMemCache (padrão do Django) ficaria preso em cada
+# processo. O DatabaseCache só precisa do banco (crie a tabela com
+# "manage.py createcachetable"); com muito acesso, troque por Redis ou
+# Memcached.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "copa_cache",
+    }
+}
+
+# Eventos ao vivo (SSE em /api/copa/live/, requer ASGI)
+# "cache": relay pelo cache compartilhado acima, para vários workers e para
+# os eventos publicados pelo run_worker. "memory": hub no processo, só com
+# um worker e COPA_JOBS_EAGER = True (ver copa/live.py).
+LIVE_EVENTS_BACKEND = "cache"
+LIVE_EVENTS_POLL_SECONDS = 1.0
+
+# Jobs em segundo plano (repontuação, ranking, cache; ver copa/jobs.py),
+# executados pelo comando run_worker. Com True rodam na própria requisição
+# (desenvolvimento, sem worker).
+COPA_JOBS_EAGER = False
+
+# Snapshots binários dos palpites de etapas encerradas (ver copa/snapshots.py)
+COPA_SNAPSHOT_DIR = BASE_DIR / "snapshots"
+
+# Dumps dos palpites de torneios arquivados (ver copa/archive.py). Guarde
+# com backup: é a única cópia dos palpites depois do arquivamento.
+COPA_ARCHIVE_DIR = BASE_DIR / "archives"
+
+# Autosave de palpites (ver copa/autosave.py): segundos que as mudanças
+# ficam no buffer do cache antes de irem para Bet. 0 grava direto. Só vale
+# com cache compartilhado fora do banco (Redis, Memcached, arquivos): com o
+# DatabaseCache acima o autosave grava direto. Rode flush_autosave em loop.
+COPA_AUTOSAVE_SECONDS = 5
+
+# Profiler por amostragem (ver bolao2026/profiling.py): fração das
+# requisições perfiladas (0 desliga) e duração mínima para guardar o perfil.
+PROFILE_SAMPLE_RATE = 0.0
+PROFILE_MIN_MS = 500
+PROFILE_DIR = BASE_DIR / "profiles"
+PROFILE_KEEP = 50
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -103,4 +169,20 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    # Accept: application/json sai via orjson quando instalado (mesma saída
+    # do JSONRenderer do DRF; sem orjson, usa o padrão do DRF). O
+    # JSONRenderer do DRF fica disponível em ?format=json. Ver
+    # bolao2026/renderers.py.
+    "DEFAULT_RENDERER_CLASSES": [
+        "bolao2026.renderers.ORJSONRenderer",
+        "rest_framework.renderers.JSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "bolao2026.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
 }
+# False desliga o orjson mesmo instalado (comparação/diagnóstico).
+API_FAST_JSON = True
@@ -1,5 +1,7 @@
 from django.contrib import admin
 
+from bolao2026.admin_utils import LargeTableAdminMixin
+
 from .models import (
     Tournament,
     Stage,
@@ -8,12 +10,26 @@ from .models import (
     Bet,
     ExtraResult,
     ExtraBet,
+    BetDistribution,
+    League,
+    LeagueMembership,
+    TournamentArchive,
+    ArchivedUserSummary,
+)
+
+# str(Match) mostra times e fase, e str(Stage) mostra o torneio: listas que
+# exibem um jogo precisam trazer tudo isso no mesmo SELECT.
+MATCH_RELATED = (
+    "home_team",
+    "away_team",
+    "stage__tournament",
 )
 
 
 @admin.register(Tournament)
 class TournamentAdmin(admin.ModelAdmin):
     list_display = ("name", "start_date", "extras_deadline")
+    search_fields = ("name",)
 
 
 @admin.register(Stage)
@@ -28,6 +44,8 @@ class StageAdmin(admin.ModelAdmin):
         "points_one_team_goals",
     )
     list_filter = ("tournament", "order")
+    list_select_related = ("tournament",)
+    search_fields = ("name",)
 
 
 @admin.register(Team)
@@ -49,20 +67,98 @@ class MatchAdmin(admin.ModelAdmin):
         "away_score",
     )
     list_filter = ("tournament", "stage", "group_name")
+    list_select_related = ("tournament",) + MATCH_RELATED
+    autocomplete_fields = ("stage", "home_team", "away_team")
+    search_fields = ("home_team__code", "away_team__code")
 
 
 @admin.register(Bet)
-class BetAdmin(admin.ModelAdmin):
+class BetAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ("user", "match", "home_score", "away_score", "created_at")
+    # Match.stage tem índice; as opções do filtro vêm da tabela de fases.
     list_filter = ("match__stage",)
+    list_select_related = ("user",) + tuple(f"match__{f}" for f in MATCH_RELATED)
+    raw_id_fields = ("user", "match")
+    # busca exata: usa o índice único de username
+    search_fields = ("=user__username",)
 
 
 @admin.register(ExtraResult)
 class ExtraResultAdmin(admin.ModelAdmin):
-    list_display = ("tournament", "type", "team", "player_name")
+    list_display = ("tournament", "type", "team", "player_name", "derived")
+    list_select_related = ("tournament", "team")
+    autocomplete_fields = ("team",)
+    readonly_fields = ("derived",)
+
+    def save_model(self, request, obj, form, change):
+        # editado à mão: derive_extra_results não retira mais este gabarito
+        obj.derived = False
+        super().save_model(request, obj, form, change)
 
 
 @admin.register(ExtraBet)
-class ExtraBetAdmin(admin.ModelAdmin):
+class ExtraBetAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ("tournament", "user", "type", "team", "player_name", "created_at")
+    # coberto pelo índice (tournament, type)
     list_filter = ("tournament", "type")
+    list_select_related = ("tournament", "user", "team")
+    raw_id_fields = ("user",)
+    autocomplete_fields = ("team",)
+    search_fields = ("=user__username",)
+
+
+@admin.register(BetDistribution)
+class BetDistributionAdmin(admin.ModelAdmin):
+    list_display = ("match", "total", "home_wins", "draws", "away_wins", "computed_at")
+    list_select_related = tuple(f"match__{f}" for f in MATCH_RELATED)
+    raw_id_fields = ("match",)
+
+
+class LeagueMembershipInline(admin.TabularInline):
+    model = LeagueMembership
+    extra = 0
+    raw_id_fields = ("user",)
+
+
+@admin.register(League)
+class LeagueAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ("name", "tournament", "owner", "invite_code", "created_at")
+    list_filter = ("tournament",)
+    list_select_related = ("tournament", "owner")
+    raw_id_fields = ("owner",)
+    # invite_code é único (indexado); nome por prefixo
+    search_fields = ("^name", "=invite_code")
+    inlines = [LeagueMembershipInline]
+
+
+class ArchivedUserSummaryInline(admin.TabularInline):
+    model = ArchivedUserSummary
+    extra = 0
+    raw_id_fields = ("user",)
+    fields = ("position", "username", "total_points", "extras_points", "bets_count")
+    readonly_fields = fields
+
+
+@admin.register(TournamentArchive)
+class TournamentArchiveAdmin(admin.ModelAdmin):
+    list_display = ("tournament", "bets_count", "extra_bets_count", "created_at")
+    list_select_related = ("tournament",)
+    exclude = ("standings",)
+    readonly_fields = (
+        "tournament",
+        "dump_file",
+        "dump_sha256",
+        "bets_count",
+        "extra_bets_count",
+        "created_at",
+    )
+    inlines = [ArchivedUserSummaryInline]
+
+    # criado e desfeito só pelo comando archive_tournament (o dump e os
+    # palpites apagados andam junto com o registro)
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
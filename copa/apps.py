@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CopaConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "copa"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,345 @@
+"""
+Arquivamento de torneios encerrados.
+
+Os palpites de torneios passados só são lidos como histórico, mas
+continuam inflando Bet/ExtraBet (e seus índices) para as consultas do
+torneio ativo. archive_tournament():
+
+0. encerra os prazos ainda abertos (etapas e extras), para nenhum
+   palpite ser gravado entre o dump e a remoção (--force);
+1. grava a classificação final (mesmo formato de compute_ranking, que
+   passa a servir dela) e um resumo por usuário (ArchivedUserSummary);
+2. grava todos os palpites num dump NDJSON comprimido com gzip em
+   settings.COPA_ARCHIVE_DIR, com todas as colunas (para restaurar igual);
+3. apaga os palpites das tabelas, em lotes.
+
+restore_tournament() confere o hash do dump, recria os palpites com os
+mesmos IDs e apaga o arquivo (e os resumos). As duas operações podem ser
+repetidas se pararem no meio.
+"""
+import gzip
+import hashlib
+import json
+import os
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.signals import post_delete
+from django.utils import timezone
+
+from .autosave import flush_pending
+from .cache import bump_bets_version, bump_results_version
+from .exports import CHUNK_SIZE, iter_keyset
+from .models import (
+    Tournament,
+    Stage,
+    Bet,
+    ExtraBet,
+    TournamentArchive,
+    ArchivedUserSummary,
+)
+from .ranking import compute_ranking
+from .scoring import bet_points_expression
+from .signals import invalidate_user_bets_cache
+from .snapshots import discard_snapshots
+
+# colunas gravadas no dump (restaurar recria as linhas com elas)
+BET_FIELDS = (
+    "id",
+    "user_id",
+    "match_id",
+    "home_score",
+    "away_score",
+    "points",
+    "created_at",
+    "updated_at",
+)
+EXTRA_BET_FIELDS = (
+    "id",
+    "user_id",
+    "tournament_id",
+    "type",
+    "team_id",
+    "player_name",
+    "player_name_normalized",
+    "points",
+    "created_at",
+)
+DATETIME_FIELDS = ("created_at", "updated_at")
+
+
+def archive_dir():
+    return Path(settings.COPA_ARCHIVE_DIR)
+
+
+def dump_path(archive):
+    return archive_dir() / archive.dump_file
+
+
+def _tournament_bets(tournament):
+    return Bet.objects.filter(match__tournament=tournament)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _dump_line(model, row):
+    row = {
+        key: value.isoformat() if key in DATETIME_FIELDS else value
+        for key, value in row.items()
+    }
+    return json.dumps({"model": model, **row}, ensure_ascii=False) + "\n"
+
+
+def write_dump(tournament, path, chunk_size=CHUNK_SIZE):
+    """
+    Grava o dump dos palpites em `path` (via arquivo temporário).
+    Devolve (palpites, extras).
+    """
+    counts = {"bet": 0, "extra_bet": 0}
+    tmp = path.with_suffix(".tmp")
+    with gzip.open(tmp, "wt", encoding="utf-8") as fh:
+        for model, qs, fields in (
+            ("bet", _tournament_bets(tournament), BET_FIELDS),
+            (
+                "extra_bet",
+                ExtraBet.objects.filter(tournament=tournament),
+                EXTRA_BET_FIELDS,
+            ),
+        ):
+            for row in iter_keyset(qs, fields, chunk_size):
+                fh.write(_dump_line(model, row))
+                counts[model] += 1
+    with open(tmp, "rb") as fh:
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+    return counts["bet"], counts["extra_bet"]
+
+
+def user_summaries(tournament, standings):
+    """
+    ArchivedUserSummary (não salvos) a partir da classificação final, com
+    palpites e pontos por fase de cada usuário (um GROUP BY).
+    """
+    per_stage = defaultdict(dict)
+    bets_count = defaultdict(int)
+    rows = (
+        _tournament_bets(tournament)
+        .values("user_id", "match__stage__order")
+        .annotate(count=Count("id"), points=Sum(bet_points_expression()))
+        .order_by()
+    )
+    for row in rows:
+        per_stage[row["user_id"]][str(row["match__stage__order"])] = row["points"]
+        bets_count[row["user_id"]] += row["count"]
+
+    return [
+        ArchivedUserSummary(
+            user_id=row["user_id"],
+            username=row["username"],
+            position=row["position"],
+            total_points=row["total_points"],
+            extras_points=row["extras_points"],
+            exact_scores=row["exact_scores"],
+            results=row["results"],
+            bets_count=bets_count[row["user_id"]],
+            stage_points=per_stage[row["user_id"]],
+            champion_hit=row["champion_hit"],
+        )
+        for row in standings
+    ]
+
+
+@contextmanager
+def _muted_bet_signals():
+    """
+    Desconecta a invalidação de cache por palpite apagado: sem receivers
+    de post_delete, o delete() vira um DELETE direto, sem carregar as
+    linhas (o cache é invalidado uma vez só no fim, em _invalidate).
+    """
+    for model in (Bet, ExtraBet):
+        post_delete.disconnect(invalidate_user_bets_cache, sender=model)
+    try:
+        yield
+    finally:
+        for model in (Bet, ExtraBet):
+            post_delete.connect(invalidate_user_bets_cache, sender=model)
+
+
+def _delete_in_batches(qs, chunk_size):
+    model = qs.model
+    deleted = 0
+    with _muted_bet_signals():
+        while True:
+            ids = list(qs.order_by("pk").values_list("pk", flat=True)[:chunk_size])
+            if not ids:
+                return deleted
+            count, _ = model.objects.filter(pk__in=ids).delete()
+            deleted += count
+
+
+def close_deadlines(tournament):
+    """
+    Encerra agora os prazos ainda abertos do torneio (etapas e extras).
+    Devolve quantas etapas foram fechadas.
+    """
+    now = timezone.now()
+    Tournament.objects.filter(pk=tournament.pk, extras_deadline__gt=now).update(
+        extras_deadline=now
+    )
+    closed = Stage.objects.filter(tournament=tournament, deadline__gt=now).update(
+        deadline=now
+    )
+    bump_results_version(tournament.id)
+    return closed
+
+
+def _invalidate(tournament, user_ids):
+    bump_results_version(tournament.id)
+    for user_id in user_ids:
+        bump_bets_version(user_id)
+
+
+def archive_tournament(tournament, chunk_size=CHUNK_SIZE):
+    """
+    Arquiva o torneio (ou termina um arquivamento interrompido).
+    Devolve o TournamentArchive.
+    """
+    archive = TournamentArchive.objects.filter(tournament=tournament).first()
+    if archive is None:
+        # prazos fechados antes do dump: o que chegar depois é recusado
+        close_deadlines(tournament)
+        flush_pending(force=True)
+        standings = compute_ranking(tournament)
+        summaries = user_summaries(tournament, standings)
+
+        archive_dir().mkdir(parents=True, exist_ok=True)
+        name = f"tournament-{tournament.id}-{datetime.now():%Y%m%d%H%M%S}.ndjson.gz"
+        path = archive_dir() / name
+        bets_count, extra_bets_count = write_dump(tournament, path, chunk_size)
+
+        with transaction.atomic():
+            archive = TournamentArchive.objects.create(
+                tournament=tournament,
+                standings=standings,
+                dump_file=name,
+                dump_sha256=_sha256(path),
+                bets_count=bets_count,
+                extra_bets_count=extra_bets_count,
+            )
+            for summary in summaries:
+                summary.archive = archive
+            ArchivedUserSummary.objects.bulk_create(summaries, batch_size=chunk_size)
+
+    user_ids = set(
+        ArchivedUserSummary.objects.filter(archive=archive).values_list(
+            "user_id", flat=True
+        )
+    )
+    _delete_in_batches(_tournament_bets(tournament), chunk_size)
+    _delete_in_batches(ExtraBet.objects.filter(tournament=tournament), chunk_size)
+    discard_snapshots(
+        Stage.objects.filter(tournament=tournament).values_list("id", flat=True)
+    )
+    _invalidate(tournament, user_ids - {None})
+    return archive
+
+
+def _read_dump(path):
+    with gzip.open(path, "rt", encoding="utf-8") as fh:
+        for line in fh:
+            row = json.loads(line)
+            for key in DATETIME_FIELDS:
+                if key in row:
+                    row[key] = datetime.fromisoformat(row[key])
+            yield row.pop("model"), row
+
+
+@contextmanager
+def _keep_timestamps(*models):
+    """
+    Desliga auto_now/auto_now_add durante a restauração, para o bulk_create
+    gravar as datas do dump e não o instante atual. Só para o processo do
+    comando (altera os campos do model enquanto dura).
+    """
+    changed = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            flags = (getattr(field, "auto_now", False), getattr(field, "auto_now_add", False))
+            if any(flags):
+                changed.append((field, flags))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in changed:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def restore_tournament(tournament, chunk_size=CHUNK_SIZE):
+    """
+    Recoloca os palpites do dump nas tabelas e desfaz o arquivamento.
+    Palpites de usuários apagados depois do arquivamento ficam de fora.
+    Devolve (palpites, extras, ignorados). Levanta ValueError se não há
+    arquivo ou se o dump não confere.
+    """
+    archive = TournamentArchive.objects.filter(tournament=tournament).first()
+    if archive is None:
+        raise ValueError(f"O torneio {tournament} não está arquivado.")
+    path = dump_path(archive)
+    if not path.is_file():
+        raise ValueError(f"Dump não encontrado: {path}.")
+    if _sha256(path) != archive.dump_sha256:
+        raise ValueError(f"Dump corrompido (hash não confere): {path}.")
+
+    user_ids = set(
+        archive.summaries.exclude(user=None).values_list("user_id", flat=True)
+    )
+    existing_users = set(
+        get_user_model().objects.filter(pk__in=user_ids).values_list("pk", flat=True)
+    )
+    models = {"bet": Bet, "extra_bet": ExtraBet}
+    batches = {"bet": [], "extra_bet": []}
+    skipped = {"bet": 0, "extra_bet": 0}
+    with _keep_timestamps(Bet, ExtraBet):
+        for model, row in _read_dump(path):
+            if row["user_id"] not in existing_users:
+                skipped[model] += 1
+                continue
+            batch = batches[model]
+            batch.append(models[model](**row))
+            if len(batch) >= chunk_size:
+                # ignore_conflicts: linhas de uma restauração interrompida já existem
+                models[model].objects.bulk_create(batch, ignore_conflicts=True)
+                batch.clear()
+        for model, batch in batches.items():
+            if batch:
+                models[model].objects.bulk_create(batch, ignore_conflicts=True)
+
+    bets_count = _tournament_bets(tournament).count()
+    extra_bets_count = ExtraBet.objects.filter(tournament=tournament).count()
+    expected = (
+        archive.bets_count - skipped["bet"],
+        archive.extra_bets_count - skipped["extra_bet"],
+    )
+    if (bets_count, extra_bets_count) != expected:
+        raise ValueError(
+            f"Restauração incompleta: {bets_count}/{expected[0]} palpites, "
+            f"{extra_bets_count}/{expected[1]} extras."
+        )
+
+    archive.delete()
+    path.unlink()
+    _invalidate(tournament, existing_users)
+    return bets_count, extra_bets_count, sum(skipped.values())
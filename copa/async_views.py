@@ -0,0 +1,174 @@
+"""
+Versões async (ASGI) dos endpoints de leitura mais consultados.
+
+Durante os jogos, milhares de clientes fazem polling de ranking/jogos/palpites.
+Estas views usam o ORM async e o cache async do Django, então um worker ASGI
+atende muitas conexões simultâneas sem prender uma thread por requisição.
+Mesmos dados e filtros das views DRF equivalentes.
+
+    GET /api/copa/async/ranking/?tournament=<id>
+    GET /api/copa/async/matches/?tournament=&stage=&stage_order=&group_name=
+    GET /api/copa/async/matches/<id>/
+    GET /api/copa/async/bets/
+    GET /api/copa/live/?tournament=<id>   (Server-Sent Events)
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework.authtoken.models import Token
+
+from bolao2026.compression import acached_payload, payload_response
+from bolao2026.renderers import dumps
+
+from .autosave import AutosaveBusy, flush_user
+from .cache import MATCHES_CACHE_SECONDS, aresults_version
+from .live import hub
+from .models import Tournament, Match
+from .ranking import aget_ranking_payload
+from .serializers import MatchSerializer, BetSerializer
+from .views import match_list_cache_key, match_queryset, bet_queryset
+
+SSE_KEEPALIVE_SECONDS = 15
+SSE_RETRY_MILLISECONDS = 3000
+
+
+async def aauthenticate(request, allow_query_token=False):
+    """
+    Equivalente async do TokenAuthentication do DRF
+    (header "Authorization: Token <chave>"). Devolve o usuário ou None.
+
+    allow_query_token: aceita também ?token=<chave> (o EventSource do
+    navegador não permite enviar headers).
+    """
+    auth = request.headers.get("Authorization", "").split()
+    if len(auth) == 2 and auth[0].lower() == "token":
+        key = auth[1]
+    elif allow_query_token and request.GET.get("token"):
+        key = request.GET["token"]
+    else:
+        return None
+    try:
+        token = await Token.objects.select_related("user").aget(key=key)
+    except Token.DoesNotExist:
+        return None
+    if not token.user.is_active:
+        return None
+    return token.user
+
+
+def json_response(data, status=200):
+    return HttpResponse(dumps(data), status=status, content_type="application/json")
+
+
+def detail(message, status):
+    return json_response({"detail": message}, status=status)
+
+
+class AsyncAPIView(View):
+    """
+    Base: exige token válido e deixa o usuário em request.user.
+    """
+
+    allow_query_token = False
+
+    async def dispatch(self, request, *args, **kwargs):
+        user = await aauthenticate(request, self.allow_query_token)
+        if user is None:
+            return detail(
+                "As credenciais de autenticação não foram fornecidas.", 401
+            )
+        request.user = user
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except (ValueError, ValidationError):
+            return detail("Parâmetros inválidos.", 400)
+
+
+class AsyncRankingView(AsyncAPIView):
+    async def get(self, request):
+        tournament_id = request.GET.get("tournament")
+        if not tournament_id:
+            return detail("Não encontrado.", 404)
+        tournament = await Tournament.objects.filter(id=tournament_id).afirst()
+        if tournament is None:
+            return detail("Não encontrado.", 404)
+        return payload_response(request, await aget_ranking_payload(tournament))
+
+
+class AsyncMatchListView(AsyncAPIView):
+    async def get(self, request):
+        version = await aresults_version(request.GET.get("tournament"))
+
+        async def build():
+            matches = [m async for m in match_queryset(request.GET)]
+            return MatchSerializer(matches, many=True).data
+
+        payload = await acached_payload(
+            match_list_cache_key(request.GET, version), build, MATCHES_CACHE_SECONDS
+        )
+        return payload_response(request, payload)
+
+
+class AsyncMatchDetailView(AsyncAPIView):
+    async def get(self, request, pk):
+        try:
+            match = await match_queryset({}).aget(pk=pk)
+        except Match.DoesNotExist:
+            return detail("Não encontrado.", 404)
+        return json_response(MatchSerializer(match).data)
+
+
+class AsyncBetListView(AsyncAPIView):
+    async def get(self, request):
+        try:
+            await sync_to_async(flush_user)(request.user.id)
+        except AutosaveBusy:
+            pass  # outra requisição está gravando o buffer; lista o que já está no banco
+        bets = [b async for b in bet_queryset(request.user)]
+        return json_response(BetSerializer(bets, many=True).data)
+
+
+def sse_message(event):
+    data = json.dumps(event["data"], separators=(",", ":"))
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
+
+
+class LiveEventsView(AsyncAPIView):
+    """
+    Stream SSE com placares ("match") e deltas do ranking ("ranking").
+    Só funciona servido por ASGI.
+    """
+
+    allow_query_token = True
+
+    async def get(self, request):
+        tournament_id = request.GET.get("tournament")
+        tournament_id = int(tournament_id) if tournament_id else None
+
+        response = StreamingHttpResponse(
+            self.stream(tournament_id), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"  # nginx: não segurar o stream
+        return response
+
+    async def stream(self, tournament_id):
+        subscription = hub.subscribe(tournament_id)
+        try:
+            yield f"retry: {SSE_RETRY_MILLISECONDS}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.queue.get(), SSE_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield sse_message(event)
+        finally:
+            hub.unsubscribe(subscription)
@@ -0,0 +1,245 @@
+"""
+Autosave de palpites com buffer no cache (coalescência de escritas).
+
+O front salva a cada mudança de placar, então digitar "2-1 -> 3-1" vira
+várias escritas seguidas do mesmo palpite. O autosave guarda só o último
+placar de cada (usuário, jogo) num buffer por usuário no cache e grava em
+Bet de uma vez (um upsert por usuário), em vez de um UPDATE (e uma
+invalidação de cache) por tecla:
+
+- o buffer é gravado quando fica mais velho que COPA_AUTOSAVE_SECONDS (no
+  próximo autosave do usuário ou pelo comando flush_autosave em loop) e
+  antes de qualquer leitura/escrita normal de palpites do usuário
+  (BetViewSet, cartela);
+- no prazo: flush_pending() sempre grava os buffers com jogo de prazo
+  encerrado, e snapshot_bets e archive_tournament gravam todos
+  (force=True) antes de ler Bet;
+- perto do prazo (WRITE_THROUGH_SECONDS) não há buffer: grava direto.
+
+Quem tem buffer fica registrado no banco (AutosaveBuffer, uma linha por
+buffer, não por palpite), então qualquer processo acha o que gravar. Os
+placares em si ficam só no cache: o buffer só é usado com um cache
+compartilhado entre processos que não seja o próprio banco (Redis,
+Memcached, arquivos); com LocMem, Dummy ou DatabaseCache tudo grava
+direto, como com COPA_AUTOSAVE_SECONDS = 0. Um buffer perdido (restart
+do Redis sem persistência, despejo) perde no máximo
+COPA_AUTOSAVE_SECONDS de digitação, nunca o que já estava em Bet.
+
+Medido com 10 alterações seguidas do mesmo palpite (SQLite, cache em
+arquivos, um usuário): PATCH faz 10 UPDATEs em copa_bet; o autosave com
+buffer faz 1 upsert em copa_bet e 2 escritas em copa_autosavebuffer
+(INSERT no começo, DELETE no flush).
+"""
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+
+from .cache import bump_bets_version
+from .models import AutosaveBuffer, Bet, Match
+from .results import _parse_score
+
+WRITE_THROUGH_SECONDS = 120
+BUFFER_TTL = 3600
+LOCK_SECONDS = 5
+LOCK_TRIES = 50
+MAX_ITEMS = 200
+
+# backends em que o buffer não serve: cada processo com o seu (LocMem),
+# nada guardado (Dummy) ou uma escrita no banco por alteração (DatabaseCache)
+UNBUFFERED_CACHES = (LocMemCache, DummyCache, DatabaseCache)
+
+
+class AutosaveBusy(APIException):
+    """
+    Buffer do usuário travado por outra requisição (tentar de novo).
+    """
+
+    status_code = 503
+    default_detail = "Tente novamente."
+    default_code = "autosave_busy"
+
+
+def autosave_seconds():
+    return getattr(settings, "COPA_AUTOSAVE_SECONDS", 5)
+
+
+def buffering_enabled():
+    return autosave_seconds() > 0 and not isinstance(
+        caches["default"], UNBUFFERED_CACHES
+    )
+
+
+def _buffer_key(user_id):
+    return f"copa:autosave:{user_id}"
+
+
+def _lock_key(user_id):
+    return f"copa:autosave-lock:{user_id}"
+
+
+@contextmanager
+def _user_lock(user_id):
+    key = _lock_key(user_id)
+    for _ in range(LOCK_TRIES):
+        if cache.add(key, 1, LOCK_SECONDS):
+            break
+        time.sleep(0.01)
+    else:
+        raise AutosaveBusy()
+    try:
+        yield
+    finally:
+        cache.delete(key)
+
+
+def parse_autosave(data):
+    """
+    Aceita um palpite ({match_id, home_score, away_score}) ou uma lista.
+    Devolve [(match_id, home, away)], o último valor de cada jogo.
+    Levanta ValueError com a mensagem de erro.
+    """
+    items = data if isinstance(data, list) else [data]
+    if not items or len(items) > MAX_ITEMS:
+        raise ValueError(f"Envie de 1 a {MAX_ITEMS} palpites.")
+    bets = {}
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValueError("Cada item deve ser um objeto.")
+        match_id = item.get("match_id")
+        if not isinstance(match_id, int) or isinstance(match_id, bool):
+            raise ValueError(f"match_id inválido: {match_id!r}.")
+        home = _parse_score(item.get("home_score"), "home_score")
+        away = _parse_score(item.get("away_score"), "away_score")
+        if home is None or away is None:
+            raise ValueError("Informe home_score e away_score.")
+        bets[match_id] = (home, away)
+    return [(match_id, home, away) for match_id, (home, away) in bets.items()]
+
+
+def _write(user_id, bets):
+    """
+    Upsert dos palpites {match_id: (home, away)} do usuário numa query.
+    """
+    options = {}
+    if connection.features.supports_update_conflicts_with_target:
+        options["unique_fields"] = ["user", "match"]
+    Bet.objects.bulk_create(
+        [
+            Bet(user_id=user_id, match_id=match_id, home_score=home, away_score=away)
+            for match_id, (home, away) in bets.items()
+        ],
+        update_conflicts=True,
+        update_fields=["home_score", "away_score", "updated_at"],
+        **options,
+    )
+    # bulk_create não dispara os signals de Bet
+    transaction.on_commit(lambda: bump_bets_version(user_id))
+
+
+def _drain(user_id, extra=None):
+    """
+    Grava o buffer do usuário (mais `extra`, que tem precedência) e o
+    descarta. Chamar com o lock do usuário. Devolve quantos gravou.
+    """
+    key = _buffer_key(user_id)
+    buffer = cache.get(key)
+    bets = {**(buffer["bets"] if buffer else {}), **(extra or {})}
+    if bets:
+        _write(user_id, bets)
+    if buffer is not None:
+        cache.delete(key)
+    AutosaveBuffer.objects.filter(user_id=user_id).delete()
+    return len(bets)
+
+
+def autosave_bets(user, items):
+    """
+    Recebe palpites já validados por parse_autosave. Devolve "buffered" ou
+    "written". Levanta ValueError (jogo inexistente ou prazo encerrado) ou
+    AutosaveBusy.
+    """
+    now = timezone.now()
+    deadlines = dict(
+        Match.objects.filter(id__in=[item[0] for item in items]).values_list(
+            "id", "stage__deadline"
+        )
+    )
+    for match_id, _, _ in items:
+        if match_id not in deadlines:
+            raise ValueError(f"Jogo {match_id} não encontrado.")
+        if deadlines[match_id] <= now:
+            raise ValueError("Prazo para palpites desta etapa já encerrou.")
+
+    seconds = autosave_seconds()
+    deadline = min(deadlines.values())
+    bets = {match_id: (home, away) for match_id, home, away in items}
+    if not buffering_enabled():
+        _write(user.id, bets)
+        return "written"
+
+    ts = now.timestamp()
+    with _user_lock(user.id):
+        key = _buffer_key(user.id)
+        buffer = cache.get(key)
+        if deadline - now <= timedelta(seconds=WRITE_THROUGH_SECONDS) or (
+            buffer and ts - buffer["since"] >= seconds
+        ):
+            # o buffer vai junto: gravado depois, sobrescreveria estes
+            _drain(user.id, bets)
+            return "written"
+
+        if buffer is None:
+            buffer = {"since": ts, "deadline": deadline, "bets": {}}
+            # registra antes de guardar: buffer sem registro nunca seria gravado
+            AutosaveBuffer.objects.update_or_create(
+                user_id=user.id, defaults={"created_at": now, "deadline": deadline}
+            )
+        elif deadline < buffer["deadline"]:
+            buffer["deadline"] = deadline
+            AutosaveBuffer.objects.filter(user_id=user.id).update(deadline=deadline)
+        buffer["bets"].update(bets)
+        cache.set(key, buffer, BUFFER_TTL)
+    return "buffered"
+
+
+def flush_user(user_id):
+    """
+    Grava o buffer do usuário, se houver. Devolve quantos palpites gravou.
+    """
+    if cache.get(_buffer_key(user_id)) is None:
+        return 0
+    with _user_lock(user_id):
+        return _drain(user_id)
+
+
+def flush_pending(force=False):
+    """
+    Grava os buffers mais velhos que COPA_AUTOSAVE_SECONDS e os que têm
+    jogo com prazo encerrado (com force=True, todos). Devolve quantos
+    palpites gravou.
+    """
+    pending = AutosaveBuffer.objects.all()
+    if not force:
+        now = timezone.now()
+        pending = pending.filter(
+            Q(created_at__lte=now - timedelta(seconds=autosave_seconds()))
+            | Q(deadline__lte=now)
+        )
+    written = 0
+    for user_id in list(pending.values_list("user_id", flat=True)):
+        try:
+            with _user_lock(user_id):
+                written += _drain(user_id)
+        except AutosaveBusy:
+            pass  # outra requisição está com o buffer; fica para a próxima volta
+    return written
@@ -0,0 +1,111 @@
+"""
+Chaves de cache do app copa.
+
+Tudo que depende de resultados oficiais (ranking, lista de jogos, ...) leva
+a "versão de resultados" do torneio na chave. Gravar um resultado só
+incrementa a versão: as entradas antigas deixam de ser lidas e expiram
+sozinhas, sem precisar saber quais chaves apagar.
+"""
+import time
+
+from django.core.cache import cache
+
+from bolao2026.db_routing import pin_seconds
+
+RANKING_CACHE_SECONDS = 60
+MATCHES_CACHE_SECONDS = 60
+STATS_CACHE_SECONDS = 600
+
+
+def _results_version_key(tournament_id):
+    # tournament_id=None: versão global (consultas sem filtro de torneio)
+    return f"copa:results-version:{tournament_id or 'all'}"
+
+
+def _initial_version():
+    # Baseada no relógio: se a chave for despejada do cache, a nova versão
+    # nunca colide com uma versão antiga que ainda tenha entradas guardadas.
+    return int(time.time() * 1000)
+
+
+def results_version(tournament_id):
+    return cache.get_or_set(
+        _results_version_key(tournament_id), _initial_version, None
+    )
+
+
+async def aresults_version(tournament_id):
+    return await cache.aget_or_set(
+        _results_version_key(tournament_id), _initial_version, None
+    )
+
+
+def _results_changed_key(tournament_id):
+    return f"copa:results-changed:{tournament_id}"
+
+
+def bump_results_version(tournament_id):
+    for key in (_results_version_key(tournament_id), _results_version_key(None)):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), None)
+    # Enquanto a réplica pode não ter o resultado novo, o ranking é
+    # recalculado no banco principal (ver bolao2026.db_routing).
+    cache.set(_results_changed_key(tournament_id), 1, pin_seconds())
+
+
+def results_recently_changed(tournament_id):
+    return cache.get(_results_changed_key(tournament_id)) is not None
+
+
+async def aresults_recently_changed(tournament_id):
+    return await cache.aget(_results_changed_key(tournament_id)) is not None
+
+
+def _bets_version_key(user_id):
+    return f"copa:bets-version:{user_id}"
+
+
+def bets_version(user_id):
+    """
+    Versão dos palpites de um usuário (muda quando ele grava um palpite).
+    """
+    return cache.get_or_set(_bets_version_key(user_id), _initial_version, None)
+
+
+def bump_bets_version(user_id):
+    try:
+        cache.incr(_bets_version_key(user_id))
+    except ValueError:
+        cache.set(_bets_version_key(user_id), _initial_version(), None)
+
+
+def ranking_key(tournament_id, version):
+    return f"copa:ranking:{tournament_id}:{version}"
+
+
+def ranking_payload_key(tournament_id, version):
+    return f"copa:ranking-payload:{tournament_id}:{version}"
+
+
+def matches_key(version, params):
+    """
+    `params`: tupla ordenada com os filtros da lista de jogos.
+    Guarda o payload pré-comprimido (bolao2026.compression).
+    """
+    filters = "&".join(f"{k}={v}" for k, v in params)
+    return f"copa:matches:{version}:{filters}"
+
+
+def user_stats_key(tournament_id, user_id, version, user_version):
+    return f"copa:stats:{tournament_id}:{user_id}:{version}:{user_version}"
+
+
+def head_to_head_key(
+    tournament_id, user_a_id, user_b_id, closed_stage_ids, version, bets_versions
+):
+    stages = ",".join(str(i) for i in closed_stage_ids)
+    users = f"{user_a_id}:{user_b_id}"
+    bets = ":".join(str(v) for v in bets_versions)
+    return f"copa:h2h:{tournament_id}:{users}:{stages}:{version}:{bets}"
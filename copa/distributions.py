@@ -0,0 +1,171 @@
+"""
+Distribuição dos palpites por jogo (resultado mais apostado, placares
+mais comuns).
+
+Só é calculada depois do prazo da etapa: a partir daí os palpites não
+mudam, então cada etapa é agregada uma única vez (um GROUP BY para todos
+os jogos da etapa), gravada em BetDistribution e servida do cache sem
+expiração.
+
+O congelamento roda pelo comando freeze_distributions (cron, logo após o
+prazo) ou pelo job freeze_distributions, enfileirado quando alguém pede
+uma distribuição que ainda não existe; a requisição não agrega nada.
+"""
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+
+from bolao2026.db_routing import replica_reads
+
+from .autosave import flush_pending
+from .jobs import enqueue
+from .models import Match, Bet, BetDistribution, Job
+
+TOP_SCORES = 5
+
+# Cache-Control do endpoint: a distribuição é recalculada só se palpites
+# forem importados depois do prazo; o ETag resolve a revalidação.
+DISTRIBUTION_MAX_AGE = 300
+
+
+class DistributionPending(APIException):
+    """
+    Prazo encerrado, mas a distribuição ainda não foi congelada (o job foi
+    enfileirado).
+    """
+
+    status_code = 503
+    default_detail = "Distribuição sendo calculada. Tente novamente em instantes."
+    default_code = "distribution_pending"
+
+
+def _distribution_key(match_id):
+    return f"copa:distribution:{match_id}"
+
+
+def _share(part, total):
+    return round(part / total, 4) if total else 0.0
+
+
+def freeze_stage(stage):
+    """
+    Calcula e grava a distribuição de todos os jogos da etapa que ainda
+    não têm uma. Devolve quantas foram criadas. Tudo no banco principal:
+    uma réplica atrasada perderia os palpites recém-gravados.
+    """
+    with replica_reads(False), transaction.atomic():
+        return _freeze_stage(stage)
+
+
+def _freeze_stage(stage):
+    match_ids = list(
+        Match.objects.filter(stage=stage, distribution__isnull=True).values_list(
+            "id", flat=True
+        )
+    )
+    if not match_ids:
+        return 0
+    # buffers do autosave com prazo encerrado entram antes de congelar
+    flush_pending()
+
+    histograms = defaultdict(list)
+    rows = (
+        Bet.objects.filter(match_id__in=match_ids)
+        .values("match_id", "home_score", "away_score")
+        .annotate(count=Count("id"))
+    )
+    for row in rows:
+        histograms[row["match_id"]].append(
+            (row["home_score"], row["away_score"], row["count"])
+        )
+
+    distributions = []
+    for match_id in match_ids:
+        histogram = histograms.get(match_id, [])
+        top = sorted(histogram, key=lambda h: (-h[2], h[0], h[1]))[:TOP_SCORES]
+        distributions.append(
+            BetDistribution(
+                match_id=match_id,
+                total=sum(h[2] for h in histogram),
+                home_wins=sum(h[2] for h in histogram if h[0] > h[1]),
+                draws=sum(h[2] for h in histogram if h[0] == h[1]),
+                away_wins=sum(h[2] for h in histogram if h[0] < h[1]),
+                top_scores=[list(h) for h in top],
+            )
+        )
+    # Duas requisições podem congelar a mesma etapa ao mesmo tempo.
+    BetDistribution.objects.bulk_create(distributions, ignore_conflicts=True)
+    return len(distributions)
+
+
+def unfreeze_matches(match_ids):
+    """
+    Descarta distribuições já gravadas (ex.: palpites importados depois
+    do prazo), para serem recalculadas no próximo acesso.
+    """
+    BetDistribution.objects.filter(match_id__in=match_ids).delete()
+    cache.delete_many([_distribution_key(match_id) for match_id in match_ids])
+
+
+def serialize_distribution(distribution):
+    total = distribution.total
+    return {
+        "match": distribution.match_id,
+        "total": total,
+        "outcomes": {
+            outcome: {"count": count, "share": _share(count, total)}
+            for outcome, count in (
+                ("home_win", distribution.home_wins),
+                ("draw", distribution.draws),
+                ("away_win", distribution.away_wins),
+            )
+        },
+        "top_scores": [
+            {
+                "home_score": home,
+                "away_score": away,
+                "count": count,
+                "share": _share(count, total),
+            }
+            for home, away, count in distribution.top_scores
+        ],
+        "computed_at": distribution.computed_at.isoformat(),
+    }
+
+
+def distribution_etag(data):
+    """
+    ETag de uma distribuição serializada (muda quando é recalculada).
+    """
+    return f'"dist-{data["match"]}-{data["total"]}-{data["computed_at"]}"'
+
+
+def get_distribution(match):
+    """
+    Distribuição de um jogo, ou None se o prazo da etapa ainda não passou.
+    Levanta DistributionPending se ela ainda não foi congelada.
+    """
+    key = _distribution_key(match.id)
+    data = cache.get(key)
+    if data is not None:
+        return data
+
+    if match.stage.deadline > timezone.now():
+        return None
+
+    distribution = BetDistribution.objects.filter(match=match).first()
+    if distribution is None:
+        enqueue(Job.Kind.FREEZE_DISTRIBUTIONS, match.stage_id)
+        # em modo eager o job já rodou; lê do principal para enxergá-lo
+        with replica_reads(False):
+            distribution = BetDistribution.objects.filter(match=match).first()
+        if distribution is None:
+            raise DistributionPending()
+
+    data = serialize_distribution(distribution)
+    cache.set(key, data, None)
+    return data
@@ -0,0 +1,202 @@
+"""
+Exportação em streaming de todos os palpites (jogos + extras) de um torneio.
+
+Pensada para auditoria depois de cada prazo. As tabelas são percorridas em
+lotes por chave (id > último id lido), então a memória fica constante e a
+primeira linha sai imediatamente, independente do tamanho do bolão.
+(No MySQL o .iterator() do Django não usa cursor no servidor e carregaria
+o resultado inteiro na memória do driver.)
+"""
+import csv
+import json
+
+from .models import (
+    Match,
+    Bet,
+    ExtraBet,
+    ExtraResult,
+    Team,
+    EXTRA_POINTS,
+)
+from .scoring import score_bet, score_extra
+
+CHUNK_SIZE = 2000
+
+COLUMNS = [
+    "kind",
+    "user_id",
+    "username",
+    "match_id",
+    "stage_order",
+    "home_team",
+    "away_team",
+    "home_score",
+    "away_score",
+    "official_home_score",
+    "official_away_score",
+    "extra_type",
+    "team",
+    "player_name",
+    "points",
+    "saved_at",
+]
+
+# formato -> (content_type, extensão)
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+}
+
+
+def iter_keyset(qs, fields, chunk_size=CHUNK_SIZE):
+    """
+    Percorre `qs` em lotes ordenados por id, via `.values(*fields)`.
+    `fields` precisa incluir "id".
+    """
+    last_id = 0
+    while True:
+        rows = list(
+            qs.filter(pk__gt=last_id).order_by("pk").values(*fields)[:chunk_size]
+        )
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1]["id"]
+
+
+def _blank_row(kind):
+    row = dict.fromkeys(COLUMNS)
+    row["kind"] = kind
+    return row
+
+
+def iter_bet_rows(tournament, chunk_size=CHUNK_SIZE):
+    # Jogos do torneio são poucos: carrega tudo uma vez só,
+    # e os lotes de palpites não precisam de JOIN com match/stage/team.
+    matches = {
+        m["id"]: m
+        for m in Match.objects.filter(tournament=tournament).values(
+            "id",
+            "stage__order",
+            "stage__points_exact_score",
+            "stage__points_result",
+            "stage__points_one_team_goals",
+            "home_team__code",
+            "away_team__code",
+            "home_score",
+            "away_score",
+        )
+    }
+    if not matches:
+        return
+
+    bets = Bet.objects.filter(match_id__in=list(matches))
+    fields = (
+        "id",
+        "user_id",
+        "user__username",
+        "match_id",
+        "home_score",
+        "away_score",
+        "updated_at",
+    )
+    for b in iter_keyset(bets, fields, chunk_size):
+        m = matches[b["match_id"]]
+        row = _blank_row("bet")
+        row.update(
+            user_id=b["user_id"],
+            username=b["user__username"],
+            match_id=b["match_id"],
+            stage_order=m["stage__order"],
+            home_team=m["home_team__code"],
+            away_team=m["away_team__code"],
+            home_score=b["home_score"],
+            away_score=b["away_score"],
+            official_home_score=m["home_score"],
+            official_away_score=m["away_score"],
+            points=score_bet(
+                b["home_score"],
+                b["away_score"],
+                m["home_score"],
+                m["away_score"],
+                m["stage__points_exact_score"],
+                m["stage__points_result"],
+                m["stage__points_one_team_goals"],
+            ),
+            saved_at=b["updated_at"].isoformat(),
+        )
+        yield row
+
+
+def iter_extra_rows(tournament, chunk_size=CHUNK_SIZE):
+    results = {
+        r.type: r for r in ExtraResult.objects.filter(tournament=tournament)
+    }
+    team_codes = dict(Team.objects.values_list("id", "code"))
+
+    extras = ExtraBet.objects.filter(tournament=tournament)
+    fields = (
+        "id",
+        "user_id",
+        "user__username",
+        "type",
+        "team_id",
+        "player_name",
+        "created_at",
+    )
+    for e in iter_keyset(extras, fields, chunk_size):
+        gabarito = results.get(e["type"])
+        points = 0
+        if gabarito is not None:
+            points = score_extra(
+                e["type"],
+                e["team_id"],
+                e["player_name"],
+                gabarito.team_id,
+                gabarito.player_name,
+                EXTRA_POINTS[e["type"]],
+            )
+        row = _blank_row("extra")
+        row.update(
+            user_id=e["user_id"],
+            username=e["user__username"],
+            extra_type=e["type"],
+            team=team_codes.get(e["team_id"]),
+            player_name=e["player_name"],
+            points=points,
+            saved_at=e["created_at"].isoformat(),
+        )
+        yield row
+
+
+def iter_rows(tournament, chunk_size=CHUNK_SIZE):
+    yield from iter_bet_rows(tournament, chunk_size)
+    yield from iter_extra_rows(tournament, chunk_size)
+
+
+def iter_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+class _Echo:
+    """
+    Pseudo-arquivo: devolve o que o csv.writer escreveria.
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMNS)
+    for row in rows:
+        yield writer.writerow([row[c] for c in COLUMNS])
+
+
+def iter_export(tournament, output, chunk_size=CHUNK_SIZE):
+    rows = iter_rows(tournament, chunk_size)
+    if output == "csv":
+        return iter_csv(rows)
+    return iter_ndjson(rows)
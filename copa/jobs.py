@@ -0,0 +1,230 @@
+"""
+Jobs em segundo plano (fila no banco, tabela Job).
+
+Gravar um resultado não repontua nada dentro da requisição: o serviço de
+resultados só enfileira jobs e o comando run_worker os executa.
+
+    rescore_match      grava Bet.points dos palpites do jogo (um UPDATE)
+    rescore_extras     grava ExtraBet.points do torneio
+    refresh_standings  recalcula o ranking (cache) e publica o delta ao vivo
+    warm_cache         pré-carrega a lista de jogos do torneio no cache
+    freeze_distributions  congela a distribuição dos palpites de uma etapa
+
+Regras:
+- idempotentes: reexecutar um job dá o mesmo resultado, então uma falha
+  pode ser repetida e duplicatas eventuais não causam dano;
+- deduplicados: enfileirar um job igual (tipo + alvo) a um que ainda está
+  pendente não cria outro — dez resultados do mesmo torneio geram um só
+  refresh_standings se o worker ainda não o pegou;
+- com settings.COPA_JOBS_EAGER = True, rodam na hora (sem worker).
+
+warm_cache e refresh_standings só servem aos workers web se o cache for
+compartilhado com o run_worker (settings.CACHES) e os eventos ao vivo
+passarem por ele (LIVE_EVENTS_BACKEND = "cache"), que é o padrão.
+"""
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from bolao2026.compression import build_payload
+
+from .cache import MATCHES_CACHE_SECONDS, results_version
+from .live import publish_ranking_delta
+from .models import (
+    Tournament,
+    Stage,
+    Match,
+    Bet,
+    ExtraBet,
+    ExtraResult,
+    ExtraType,
+    Job,
+    EXTRA_POINTS,
+)
+from .scoring import result_points_expression
+
+MAX_ATTEMPTS = 3
+
+HANDLERS = {}
+
+
+def handler(kind):
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+
+    return register
+
+
+def enqueue(kind, key):
+    """
+    Enfileira um job, a menos que já exista um pendente igual.
+    Devolve o Job (ou None se rodou na hora, em modo eager).
+    """
+    key = str(key)
+    if getattr(settings, "COPA_JOBS_EAGER", False):
+        HANDLERS[kind](key)
+        return None
+    job = Job.objects.filter(kind=kind, key=key, status=Job.Status.PENDING).first()
+    if job is None:
+        job = Job.objects.create(kind=kind, key=key)
+    return job
+
+
+def claim_jobs(limit):
+    """
+    Marca até `limit` jobs pendentes como "running" e devolve seus IDs.
+    O UPDATE condicional garante que dois workers não pegam o mesmo job.
+    """
+    claimed = []
+    pending = (
+        Job.objects.filter(status=Job.Status.PENDING)
+        .order_by("id")
+        .values_list("id", flat=True)[:limit]
+    )
+    for job_id in pending:
+        updated = Job.objects.filter(id=job_id, status=Job.Status.PENDING).update(
+            status=Job.Status.RUNNING,
+            started_at=timezone.now(),
+            attempts=F("attempts") + 1,
+        )
+        if updated:
+            claimed.append(job_id)
+    return claimed
+
+
+def requeue_stale(seconds):
+    """
+    Devolve para a fila jobs "running" há mais de `seconds` segundos
+    (worker que morreu no meio). Seguro porque os jobs são idempotentes.
+    """
+    limit = timezone.now() - timedelta(seconds=seconds)
+    return Job.objects.filter(
+        status=Job.Status.RUNNING, started_at__lt=limit
+    ).update(status=Job.Status.PENDING)
+
+
+def run_job(job_id):
+    """
+    Executa um job já reservado por claim_jobs. Falhas voltam para a fila
+    até MAX_ATTEMPTS tentativas. Roda em thread ou processo do worker.
+    """
+    close_old_connections()
+    try:
+        job = Job.objects.get(id=job_id)
+        try:
+            HANDLERS[job.kind](job.key)
+        except Exception:
+            status = (
+                Job.Status.PENDING
+                if job.attempts < MAX_ATTEMPTS
+                else Job.Status.FAILED
+            )
+            Job.objects.filter(id=job.id).update(
+                status=status,
+                error=traceback.format_exc()[-4000:],
+                finished_at=timezone.now(),
+            )
+            return False
+        Job.objects.filter(id=job.id).update(
+            status=Job.Status.DONE, error="", finished_at=timezone.now()
+        )
+        return True
+    finally:
+        close_old_connections()
+
+
+def enqueue_result_jobs(matches):
+    """
+    Jobs de um lote de resultados gravados: repontuar cada jogo e, por
+    torneio, aquecer o cache (o ranking vem do job de cada repontuação).
+    """
+    for match in matches:
+        enqueue(Job.Kind.RESCORE_MATCH, match.id)
+    for tournament_id in {m.tournament_id for m in matches}:
+        enqueue(Job.Kind.WARM_CACHE, tournament_id)
+
+
+# ---------- Handlers ----------
+
+
+@handler(Job.Kind.RESCORE_MATCH)
+def rescore_match(key):
+    match = Match.objects.select_related("stage").get(id=int(key))
+    stage = match.stage
+    points = result_points_expression(
+        match.home_score,
+        match.away_score,
+        stage.points_exact_score,
+        stage.points_result,
+        stage.points_one_team_goals,
+    )
+    # só os que mudaram, com updated_at novo: os clientes do ?since= recebem
+    # os pontos novos mesmo quando o jogo não mudou (regra da etapa)
+    Bet.objects.filter(match=match).exclude(points=points).update(
+        points=points, updated_at=Now()
+    )
+    enqueue(Job.Kind.REFRESH_STANDINGS, match.tournament_id)
+
+
+@handler(Job.Kind.RESCORE_EXTRAS)
+def rescore_extras(key):
+    tournament_id = int(key)
+    results = {
+        r.type: r for r in ExtraResult.objects.filter(tournament_id=tournament_id)
+    }
+    extras = ExtraBet.objects.filter(tournament_id=tournament_id)
+
+    with transaction.atomic():
+        extras.update(points=0)
+        for type_, gabarito in results.items():
+            points = EXTRA_POINTS[type_]
+            if type_ == ExtraType.TOP_SCORER:
+                if gabarito.player_name_normalized:
+                    extras.filter(
+                        type=type_,
+                        player_name_normalized=gabarito.player_name_normalized,
+                    ).update(points=points)
+            elif gabarito.team_id:
+                extras.filter(type=type_, team_id=gabarito.team_id).update(
+                    points=points
+                )
+
+    enqueue(Job.Kind.REFRESH_STANDINGS, tournament_id)
+
+
+@handler(Job.Kind.REFRESH_STANDINGS)
+def refresh_standings(key):
+    tournament = Tournament.objects.get(id=int(key))
+    # get_ranking() recalcula e grava no cache; o delta vai para o SSE.
+    publish_ranking_delta(tournament)
+
+
+@handler(Job.Kind.WARM_CACHE)
+def warm_cache(key):
+    # import local: views importa o serviço de resultados, que importa jobs
+    from .serializers import MatchSerializer
+    from .views import match_list_cache_key, match_queryset
+
+    params = {"tournament": key}
+    cache.set(
+        match_list_cache_key(params, results_version(key)),
+        build_payload(
+            MatchSerializer(match_queryset(params), many=True).data
+        ),
+        MATCHES_CACHE_SECONDS,
+    )
+
+
+@handler(Job.Kind.FREEZE_DISTRIBUTIONS)
+def freeze_distributions(key):
+    # import local: distributions importa jobs (enqueue)
+    from .distributions import freeze_stage
+
+    freeze_stage(Stage.objects.get(id=int(key)))
@@ -0,0 +1,205 @@
+"""
+Eventos ao vivo (placar e ranking) para o stream SSE.
+
+Em vez de milhares de clientes fazendo polling em /matches/ e /ranking/,
+cada cliente mantém uma conexão aberta em /api/copa/live/ e recebe:
+
+- "match":   placar gravado (copa/results.py);
+- "ranking": delta compacto do ranking após a repontuação (job
+             refresh_standings), só com as linhas que mudaram:
+             [user_id, position, total_points].
+
+Backends (settings.LIVE_EVENTS_BACKEND):
+
+- "memory": hub em memória do processo. Basta com um worker ASGI e os
+            jobs rodando na requisição (COPA_JOBS_EAGER); eventos publicados
+            pelo run_worker não chegam.
+- "cache" (padrão): os eventos passam por um log no cache do Django e
+            cada worker lê o log a cada LIVE_EVENTS_POLL_SECONDS e repassa
+            aos seus clientes. Com cache compartilhado (FileBasedCache,
+            DatabaseCache, Redis, Memcached) funciona com vários workers e
+            com o run_worker: uma consulta ao cache por worker, não por
+            cliente.
+"""
+import asyncio
+import itertools
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .ranking import get_ranking
+
+SUBSCRIBER_QUEUE_SIZE = 100
+EVENT_LOG_SECONDS = 60
+
+_SEQ_KEY = "copa:live:seq"
+
+
+def _event_key(seq):
+    return f"copa:live:event:{seq}"
+
+
+def _ranking_snapshot_key(tournament_id):
+    return f"copa:live:ranking:{tournament_id}"
+
+
+class Subscription:
+    def __init__(self, loop, tournament_id=None):
+        self.loop = loop
+        self.tournament_id = tournament_id
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def wants(self, event):
+        return self.tournament_id is None or event["tournament"] == self.tournament_id
+
+    def put(self, event):
+        # Cliente lento demais: descarta o evento em vez de acumular memória.
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+
+class BroadcastHub:
+    """
+    Distribui eventos para as conexões abertas neste processo.
+    publish() pode ser chamado de qualquer thread (views síncronas).
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def subscribe(self, tournament_id=None):
+        subscription = Subscription(asyncio.get_running_loop(), tournament_id)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, event):
+        event.setdefault("id", next(self._ids))
+        self.deliver(event)
+
+    def deliver(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            if subscription.wants(event):
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+
+
+class CacheRelayHub(BroadcastHub):
+    """
+    publish() grava no log do cache; um poller por event loop entrega aos
+    clientes locais. Todos os workers (inclusive o que publicou) recebem
+    o evento pelo mesmo caminho.
+    """
+
+    def __init__(self, poll_seconds=1.0):
+        super().__init__()
+        self.poll_seconds = poll_seconds
+        self._pollers = {}
+
+    def subscribe(self, tournament_id=None):
+        subscription = super().subscribe(tournament_id)
+        loop = subscription.loop
+        poller = self._pollers.get(loop)
+        if poller is None or poller.done():
+            self._pollers[loop] = loop.create_task(self._poll())
+        return subscription
+
+    def publish(self, event):
+        cache.add(_SEQ_KEY, 0, None)
+        while True:
+            seq = cache.incr(_SEQ_KEY)
+            event["id"] = seq
+            # incr não é atômico em todo backend (DatabaseCache, arquivos):
+            # se dois processos pegaram o mesmo número, o segundo tenta o próximo
+            if cache.add(_event_key(seq), event, EVENT_LOG_SECONDS):
+                return
+
+    async def _poll(self):
+        last_seen = await cache.aget(_SEQ_KEY) or 0
+        while self.subscriber_count:
+            await asyncio.sleep(self.poll_seconds)
+            seq = await cache.aget(_SEQ_KEY) or 0
+            if seq <= last_seen:
+                continue
+            keys = [_event_key(n) for n in range(last_seen + 1, seq + 1)]
+            events = await cache.aget_many(keys)
+            for key in keys:
+                if key in events:
+                    self.deliver(events[key])
+            last_seen = seq
+
+
+def _build_hub():
+    backend = getattr(settings, "LIVE_EVENTS_BACKEND", "memory")
+    if backend == "cache":
+        return CacheRelayHub(getattr(settings, "LIVE_EVENTS_POLL_SECONDS", 1.0))
+    return BroadcastHub()
+
+
+hub = _build_hub()
+
+
+def publish_match_result(match):
+    hub.publish(
+        {
+            "type": "match",
+            "tournament": match.tournament_id,
+            "data": {
+                "id": match.id,
+                "home_score": match.home_score,
+                "away_score": match.away_score,
+                "home_penalties": match.home_penalties,
+                "away_penalties": match.away_penalties,
+            },
+        }
+    )
+
+
+def ranking_delta(previous, ranking):
+    """
+    Linhas do ranking novo que mudaram em relação ao snapshot anterior
+    ({user_id: (position, total_points)}), no formato compacto
+    [user_id, position, total_points].
+    """
+    delta = []
+    for row in ranking:
+        current = (row["position"], row["total_points"])
+        if previous.get(row["user_id"]) != current:
+            delta.append([row["user_id"], *current])
+    return delta
+
+
+def publish_ranking_delta(tournament):
+    """
+    Recalcula o ranking com os resultados atuais (já deixando o cache
+    aquecido para os clientes) e publica só o que mudou desde a última
+    publicação deste torneio.
+    """
+    ranking = get_ranking(tournament)
+
+    snapshot_key = _ranking_snapshot_key(tournament.id)
+    previous = cache.get(snapshot_key) or {}
+    delta = ranking_delta(previous, ranking)
+    cache.set(
+        snapshot_key,
+        {row["user_id"]: (row["position"], row["total_points"]) for row in ranking},
+        None,
+    )
+    if delta:
+        hub.publish(
+            {"type": "ranking", "tournament": tournament.id, "data": delta}
+        )
@@ -0,0 +1,86 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from copa.archive import archive_tournament, dump_path, restore_tournament
+from copa.exports import CHUNK_SIZE
+from copa.management.utils import get_tournament
+from copa.models import Match, TournamentArchive
+
+
+class Command(BaseCommand):
+    help = (
+        "Arquiva um torneio encerrado: grava classificação final, resumo por "
+        "usuário e um dump comprimido dos palpites, e apaga os palpites das "
+        "tabelas (ver copa/archive.py). Com --restore, desfaz."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tournament-id",
+            type=int,
+            default=None,
+            help="ID do Tournament. Se omitido e houver só um torneio, usa esse.",
+        )
+        parser.add_argument(
+            "--restore",
+            action="store_true",
+            help="Recoloca os palpites do dump e remove o arquivamento.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help=(
+                "Arquiva mesmo com jogos sem resultado (os prazos ainda "
+                "abertos são encerrados antes do dump)."
+            ),
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=CHUNK_SIZE,
+            help=f"Linhas por lote (padrão: {CHUNK_SIZE}).",
+        )
+
+    def handle(self, *args, **options):
+        tournament = get_tournament(options.get("tournament_id"))
+        chunk_size = options["chunk_size"]
+        if chunk_size < 1:
+            raise CommandError("--chunk-size deve ser positivo.")
+
+        if options["restore"]:
+            try:
+                bets, extras, skipped = restore_tournament(tournament, chunk_size)
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            if skipped:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"{skipped} palpite(s) de usuários apagados ficaram de fora."
+                    )
+                )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{tournament}: {bets} palpite(s) e {extras} extra(s) restaurados."
+                )
+            )
+            return
+
+        resuming = TournamentArchive.objects.filter(tournament=tournament).exists()
+        pending = Match.objects.filter(tournament=tournament).exclude(
+            home_score__isnull=False, away_score__isnull=False
+        )
+        if not resuming and not options["force"] and pending.exists():
+            raise CommandError(
+                f"{pending.count()} jogo(s) sem resultado. Use --force para "
+                "arquivar mesmo assim."
+            )
+
+        archive = archive_tournament(tournament, chunk_size)
+        if resuming:
+            self.stdout.write("Arquivamento já existia: apagando o que restou.")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{tournament}: {archive.bets_count} palpite(s) e "
+                f"{archive.extra_bets_count} extra(s) arquivados em "
+                f"{dump_path(archive)}."
+            )
+        )
@@ -0,0 +1,71 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from bolao2026.renderers import ORJSONRenderer, fast_json_enabled
+from copa.management.utils import get_tournament
+from copa.ranking import compute_ranking
+from copa.serializers import MatchSerializer
+from copa.views import match_queryset
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara o JSONRenderer do DRF com o ORJSONRenderer nos payloads de "
+        "ranking e lista de jogos do torneio (mesma saída, tempo por render)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tournament-id",
+            type=int,
+            default=None,
+            help="ID do Tournament. Se omitido e houver só um torneio, usa esse.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=200,
+            help="Renders por medição (padrão: 200).",
+        )
+        parser.add_argument(
+            "--scale",
+            type=int,
+            default=1,
+            help="Multiplica o ranking N vezes, para simular bolões maiores.",
+        )
+
+    def handle(self, *args, **options):
+        if not fast_json_enabled():
+            raise CommandError(
+                "orjson não está instalado (ou API_FAST_JSON = False)."
+            )
+        tournament = get_tournament(options.get("tournament_id"))
+        repeat = options["repeat"]
+
+        payloads = {
+            "ranking": compute_ranking(tournament) * options["scale"],
+            "matches": MatchSerializer(
+                match_queryset({"tournament": tournament.id}), many=True
+            ).data,
+        }
+        for name, data in payloads.items():
+            standard = JSONRenderer().render(data)
+            fast = ORJSONRenderer().render(data)
+            if json.loads(standard) != json.loads(fast):
+                raise CommandError(f"Saídas diferentes para '{name}'.")
+
+            timings = {}
+            for label, renderer in (("drf", JSONRenderer()), ("orjson", ORJSONRenderer())):
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    renderer.render(data)
+                timings[label] = (time.perf_counter() - started) / repeat * 1000
+
+            self.stdout.write(
+                f"{name}: {len(standard) / 1024:.0f} KB | "
+                f"drf {timings['drf']:.2f} ms | orjson {timings['orjson']:.2f} ms | "
+                f"{timings['drf'] / timings['orjson']:.1f}x"
+            )
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+
+from copa.exports import CHUNK_SIZE, EXPORT_FORMATS, iter_export
+from copa.management.utils import get_tournament
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta todos os palpites (jogos + extras) de um torneio, com pontos.\n"
+        "Saída em NDJSON ou CSV, em streaming (memória constante)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tournament-id",
+            type=int,
+            default=None,
+            help="ID do Tournament. Se omitido e houver só um torneio, usa esse.",
+        )
+        parser.add_argument(
+            "--output",
+            choices=sorted(EXPORT_FORMATS),
+            default="ndjson",
+            help="Formato de saída (padrão: ndjson).",
+        )
+        parser.add_argument(
+            "--file",
+            type=str,
+            default=None,
+            help="Arquivo de destino. Se omitido, escreve na saída padrão.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=CHUNK_SIZE,
+            help=f"Linhas lidas do banco por lote (padrão: {CHUNK_SIZE}).",
+        )
+
+    def handle(self, *args, **options):
+        tournament = get_tournament(options.get("tournament_id"))
+        lines = iter_export(tournament, options["output"], options["chunk_size"])
+
+        path = options.get("file")
+        if not path:
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+
+        count = 0
+        with open(path, "w", encoding="utf-8", newline="") as fh:
+            for line in lines:
+                fh.write(line)
+                count += 1
+        self.stderr.write(
+            self.style.SUCCESS(f"{count} linha(s) exportada(s) para {path}.")
+        )
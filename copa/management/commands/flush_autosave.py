@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from copa.autosave import autosave_seconds, flush_pending
+
+
+class Command(BaseCommand):
+    help = (
+        "Passa para Bet os buffers do autosave vencidos e os com jogo de "
+        "prazo encerrado (ver copa/autosave.py). Em produção, rode com --loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Fica rodando, gravando a cada COPA_AUTOSAVE_SECONDS.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Grava também os buffers mais recentes.",
+        )
+
+    def handle(self, *args, **options):
+        if options["loop"] and options["force"]:
+            raise CommandError("--loop e --force não combinam.")
+        if not options["loop"]:
+            written = flush_pending(force=options["force"])
+            self.stdout.write(self.style.SUCCESS(f"{written} palpite(s) gravado(s)."))
+            return
+
+        interval = max(autosave_seconds(), 1)
+        self.stdout.write(f"Gravando os buffers do autosave a cada {interval} s.")
+        try:
+            while True:
+                close_old_connections()
+                written = flush_pending()
+                if written:
+                    self.stdout.write(f"{written} palpite(s) gravado(s).")
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            self.stdout.write("Encerrado.")
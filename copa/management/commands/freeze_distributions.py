@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from copa.distributions import freeze_stage
+from copa.management.utils import get_tournament
+from copa.models import Stage
+
+
+class Command(BaseCommand):
+    help = (
+        "Congela a distribuição de palpites dos jogos de todas as etapas com "
+        "prazo encerrado (para rodar via cron logo após cada prazo)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tournament-id",
+            type=int,
+            default=None,
+            help="ID do Tournament. Se omitido e houver só um torneio, usa esse.",
+        )
+
+    def handle(self, *args, **options):
+        tournament = get_tournament(options.get("tournament_id"))
+        stages = Stage.objects.filter(
+            tournament=tournament, deadline__lte=timezone.now()
+        ).order_by("order")
+
+        for stage in stages:
+            created = freeze_stage(stage)
+            self.stdout.write(f"{stage.name}: {created} jogo(s) congelado(s).")
+        self.stdout.write(self.style.SUCCESS("Distribuições atualizadas."))
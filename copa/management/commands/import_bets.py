@@ -0,0 +1,198 @@
+import csv
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from copa.cache import bump_bets_version
+from copa.distributions import unfreeze_matches
+from copa.jobs import enqueue
+from copa.models import Match, Bet, Job
+from copa.snapshots import discard_snapshots
+
+User = get_user_model()
+
+MAX_SCORE = 32767  # PositiveSmallIntegerField
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa palpites em lote a partir de um CSV (cédulas em papel digitadas).\n"
+        "Colunas: username, match (ID do jogo), home_score, away_score.\n"
+        "Palpites já existentes para o mesmo usuário/jogo são sobrescritos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", type=str, help="Caminho do arquivo CSV.")
+        parser.add_argument(
+            "--tournament-id",
+            type=int,
+            default=None,
+            help="Restringe a importação aos jogos deste torneio.",
+        )
+        parser.add_argument(
+            "--delimiter",
+            type=str,
+            default=",",
+            help="Separador de colunas (padrão: ','; planilhas pt-BR costumam usar ';').",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Palpites gravados por transação (padrão: 5000).",
+        )
+        parser.add_argument(
+            "--ignore-deadline",
+            action="store_true",
+            help="Aceita palpites de etapas cujo prazo já encerrou "
+            "(cédulas entregues no prazo e digitadas depois).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Só valida o arquivo, sem gravar nada.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size deve ser maior que zero.")
+
+        started = time.monotonic()
+
+        # Caches em memória: nenhuma query por linha do arquivo.
+        users = dict(User.objects.values_list("username", "id"))
+        matches_qs = Match.objects.all()
+        if options["tournament_id"] is not None:
+            matches_qs = matches_qs.filter(tournament_id=options["tournament_id"])
+        deadlines = dict(matches_qs.values_list("id", "stage__deadline"))
+
+        now = timezone.now()
+        check_deadline = not options["ignore_deadline"]
+        dry_run = options["dry_run"]
+
+        self._closed_matches = set()
+        read = valid = written = errors = 0
+        # (user_id, match_id) -> (home, away): dentro do lote, vale a última linha
+        batch = {}
+
+        try:
+            fh = open(options["path"], encoding="utf-8-sig", newline="")
+        except OSError as exc:
+            raise CommandError(f"Não foi possível abrir o arquivo: {exc}")
+
+        with fh:
+            reader = csv.DictReader(fh, delimiter=options["delimiter"])
+            missing = {"username", "match", "home_score", "away_score"} - set(
+                reader.fieldnames or []
+            )
+            if missing:
+                raise CommandError(
+                    f"Colunas ausentes no CSV: {', '.join(sorted(missing))}."
+                )
+
+            # linha 1 é o cabeçalho
+            for lineno, row in enumerate(reader, start=2):
+                read += 1
+                try:
+                    key, scores = self._parse_row(
+                        row, users, deadlines, now, check_deadline
+                    )
+                except ValueError as exc:
+                    errors += 1
+                    self.stderr.write(f"linha {lineno}: {exc}")
+                    continue
+
+                valid += 1
+                batch[key] = scores
+                if len(batch) >= batch_size:
+                    written += self._flush(batch, dry_run)
+                    batch = {}
+
+        if batch:
+            written += self._flush(batch, dry_run)
+
+        # Palpites gravados depois do prazo invalidam distribuições e
+        # snapshots já gerados dessas etapas, e podem ser de jogos que já
+        # têm resultado (pontos a regravar).
+        if self._closed_matches and not dry_run:
+            unfreeze_matches(self._closed_matches)
+            for match_id in self._closed_matches:
+                enqueue(Job.Kind.RESCORE_MATCH, match_id)
+            discard_snapshots(
+                Match.objects.filter(id__in=self._closed_matches)
+                .values_list("stage_id", flat=True)
+                .distinct()
+            )
+
+        elapsed = time.monotonic() - started
+        rate = read / elapsed if elapsed > 0 else 0
+        summary = (
+            f"{read} linha(s) lida(s), {valid} válida(s), {errors} com erro, "
+            f"{written} palpite(s) {'validados' if dry_run else 'gravados'} "
+            f"em {elapsed:.1f}s ({rate:.0f} linhas/s)."
+        )
+        style = self.style.WARNING if errors else self.style.SUCCESS
+        self.stdout.write(style(summary))
+
+    def _parse_row(self, row, users, deadlines, now, check_deadline):
+        username = (row.get("username") or "").strip()
+        user_id = users.get(username)
+        if user_id is None:
+            raise ValueError(f"usuário '{username}' não existe.")
+
+        raw_match = (row.get("match") or "").strip()
+        try:
+            match_id = int(raw_match)
+        except ValueError:
+            raise ValueError(f"jogo inválido: '{raw_match}'.")
+        deadline = deadlines.get(match_id)
+        if deadline is None:
+            raise ValueError(f"jogo {match_id} não existe.")
+        if deadline <= now:
+            if check_deadline:
+                raise ValueError(
+                    f"prazo para palpites do jogo {match_id} já encerrou."
+                )
+            self._closed_matches.add(match_id)
+
+        scores = []
+        for field in ("home_score", "away_score"):
+            raw = (row.get(field) or "").strip()
+            try:
+                value = int(raw)
+            except ValueError:
+                raise ValueError(f"{field} inválido: '{raw}'.")
+            if not 0 <= value <= MAX_SCORE:
+                raise ValueError(f"{field} fora do intervalo: {value}.")
+            scores.append(value)
+
+        return (user_id, match_id), tuple(scores)
+
+    def _flush(self, batch, dry_run):
+        if dry_run:
+            return len(batch)
+
+        bets = [
+            Bet(user_id=user_id, match_id=match_id, home_score=hs, away_score=as_)
+            for (user_id, match_id), (hs, as_) in batch.items()
+        ]
+        upsert = {
+            "update_conflicts": True,
+            "update_fields": ["home_score", "away_score", "updated_at"],
+        }
+        # MySQL não aceita unique_fields (ON DUPLICATE KEY usa qualquer chave única).
+        if connection.features.supports_update_conflicts_with_target:
+            upsert["unique_fields"] = ["user", "match"]
+
+        with transaction.atomic():
+            Bet.objects.bulk_create(bets, **upsert)
+            # bulk_create não dispara os signals de Bet
+            for user_id in {user_id for user_id, _ in batch}:
+                transaction.on_commit(
+                    lambda user_id=user_id: bump_bets_version(user_id)
+                )
+        return len(bets)
@@ -0,0 +1,413 @@
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from copa.management.utils import get_tournament
+from copa.models import Stage
+
+DEFAULT_PREFIX = "loadtest"
+DEFAULT_PASSWORD = "loadtest-2026"
+MIN_PREFIX_LENGTH = 4
+# marca dos usuários criados pelo --setup (só eles são apagados no --cleanup)
+MARKER_DOMAIN = "loadtest.invalid"
+
+
+def marker_email(username):
+    return f"{username}@{MARKER_DOMAIN}"
+
+
+def is_local_database():
+    """
+    Banco de desenvolvimento/teste: DEBUG, SQLite ou nome com "test".
+    """
+    return (
+        settings.DEBUG
+        or connection.vendor == "sqlite"
+        or "test" in str(connection.settings_dict.get("NAME") or "").lower()
+    )
+
+
+def percentile(values, pct):
+    """
+    Percentil por vizinho mais próximo de uma lista já ordenada.
+    """
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, round(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+class Recorder:
+    """
+    Latências e status por endpoint, compartilhado entre as threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    def add(self, label, seconds, status):
+        with self.lock:
+            self.latencies[label].append(seconds)
+            self.statuses[label][status] += 1
+
+
+class VirtualUser:
+    """
+    Um usuário do bolão na última hora antes do prazo: faz login, carrega
+    os jogos da etapa e os próprios palpites, e fica mandando/alterando
+    palpites (com uma recarga da lista de jogos de vez em quando).
+    """
+
+    def __init__(self, base_url, username, password, tournament_id, stage_order,
+                 recorder, think, timeout):
+        self.base_url = base_url.rstrip("/")
+        self.username = username
+        self.password = password
+        self.tournament_id = tournament_id
+        self.stage_order = stage_order
+        self.recorder = recorder
+        self.think = think
+        self.timeout = timeout
+        self.token = None
+        self.bets = {}  # match_id -> bet_id
+        self.match_ids = []
+
+    def request(self, label, method, path, data=None):
+        body = json.dumps(data).encode() if data is not None else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        req.add_header("Accept", "application/json")
+        req.add_header("Accept-Encoding", "identity")
+        if body is not None:
+            req.add_header("Content-Type", "application/json")
+        if self.token:
+            req.add_header("Authorization", f"Token {self.token}")
+
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                status, content = resp.status, resp.read()
+        except urllib.error.HTTPError as exc:
+            status, content = exc.code, exc.read()
+        except (urllib.error.URLError, OSError):
+            status, content = 0, b""  # conexão recusada/timeout
+        self.recorder.add(label, time.perf_counter() - started, status)
+        if 200 <= status < 300 and content:
+            return json.loads(content)
+        return None
+
+    def start(self):
+        data = self.request(
+            "login",
+            "POST",
+            "/api/accounts/login/",
+            {"username": self.username, "password": self.password},
+        )
+        if not data:
+            return False
+        self.token = data["token"]
+        self.load_matches()
+        bets = self.request(
+            "bets (GET)", "GET", f"/api/copa/bets/?tournament={self.tournament_id}"
+        )
+        for bet in bets or []:
+            self.bets[bet["match"]["id"]] = bet["id"]
+        return bool(self.match_ids)
+
+    def load_matches(self):
+        matches = self.request(
+            "matches",
+            "GET",
+            f"/api/copa/matches/?tournament={self.tournament_id}"
+            f"&stage_order={self.stage_order}",
+        )
+        if matches is not None:
+            self.match_ids = [m["id"] for m in matches]
+
+    def submit_bet(self):
+        match_id = random.choice(self.match_ids)
+        scores = {"home_score": random.randint(0, 4), "away_score": random.randint(0, 4)}
+        bet_id = self.bets.get(match_id)
+        if bet_id is None:
+            data = self.request(
+                "bets (POST)", "POST", "/api/copa/bets/", {"match_id": match_id, **scores}
+            )
+            if data:
+                self.bets[match_id] = data["id"]
+        else:
+            self.request("bets (PATCH)", "PATCH", f"/api/copa/bets/{bet_id}/", scores)
+
+    def run(self, until):
+        if not self.start():
+            return
+        while time.monotonic() < until:
+            if random.random() < 0.1:
+                self.load_matches()
+            else:
+                self.submit_bet()
+            if self.think:
+                time.sleep(random.uniform(0, self.think))
+
+
+class Command(BaseCommand):
+    help = (
+        "Teste de carga do pico antes do prazo de uma etapa: usuários virtuais "
+        "fazem login (LoginView), carregam os jogos e mandam palpites "
+        "(BetViewSet) contra um servidor local. Mostra vazão, taxa de erro e "
+        "latências p50/p95/p99 por endpoint. Use só com banco local: --setup "
+        "cria usuários de teste e pode reabrir o prazo da etapa."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tournament-id",
+            type=int,
+            default=None,
+            help="ID do Tournament. Se omitido e houver só um torneio, usa esse.",
+        )
+        parser.add_argument(
+            "--stage-order",
+            type=int,
+            default=1,
+            help="Etapa (order) em que os usuários palpitam (padrão: 1).",
+        )
+        parser.add_argument(
+            "--base-url",
+            default="http://127.0.0.1:8000",
+            help="Servidor alvo (padrão: http://127.0.0.1:8000).",
+        )
+        parser.add_argument(
+            "--serve",
+            action="store_true",
+            help="Sobe um runserver local (--noreload) em --base-url durante o "
+            "teste. Para dimensionar workers, rode o gunicorn à parte.",
+        )
+        parser.add_argument("--users", type=int, default=50, help="Usuários virtuais.")
+        parser.add_argument(
+            "--duration", type=float, default=60, help="Duração em segundos."
+        )
+        parser.add_argument(
+            "--ramp-up",
+            type=float,
+            default=10,
+            help="Segundos para todos os usuários entrarem (padrão: 10).",
+        )
+        parser.add_argument(
+            "--think",
+            type=float,
+            default=1.0,
+            help="Pausa máxima (s) entre ações de cada usuário (padrão: 1.0).",
+        )
+        parser.add_argument(
+            "--timeout", type=float, default=30, help="Timeout por requisição (s)."
+        )
+        parser.add_argument(
+            "--prefix",
+            default=DEFAULT_PREFIX,
+            help=f"Prefixo dos usuários de teste (mín. {MIN_PREFIX_LENGTH} letras/"
+            f"dígitos; padrão: {DEFAULT_PREFIX}).",
+        )
+        parser.add_argument("--password", default=DEFAULT_PASSWORD)
+        parser.add_argument(
+            "--setup",
+            action="store_true",
+            help="Cria os usuários de teste que faltarem e, se o prazo da etapa "
+            "já passou, empurra o prazo para daqui a 1 hora.",
+        )
+        parser.add_argument(
+            "--cleanup",
+            action="store_true",
+            help="Apaga os usuários criados pelo --setup (e seus palpites) e sai.",
+        )
+        parser.add_argument(
+            "--i-know",
+            action="store_true",
+            help="Permite --setup/--cleanup num banco que não parece local "
+            "(sem DEBUG, não SQLite, nome sem \"test\").",
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        prefix = options["prefix"]
+        if len(prefix) < MIN_PREFIX_LENGTH or not prefix.isalnum():
+            raise CommandError(
+                f"--prefix deve ter ao menos {MIN_PREFIX_LENGTH} letras/dígitos."
+            )
+        if (options["setup"] or options["cleanup"]) and not (
+            options["i_know"] or is_local_database()
+        ):
+            raise CommandError(
+                f"--setup/--cleanup alteram o banco {connection.settings_dict['NAME']!r}, "
+                "que não parece local nem de teste. Use um banco de teste ou "
+                "--i-know."
+            )
+
+        if options["cleanup"]:
+            deleted, _ = User.objects.filter(
+                username__startswith=prefix, email__endswith=f"@{MARKER_DOMAIN}"
+            ).delete()
+            self.stdout.write(self.style.SUCCESS(f"{deleted} registros apagados."))
+            return
+
+        if options["users"] < 1 or options["duration"] <= 0:
+            raise CommandError("--users e --duration devem ser positivos.")
+
+        tournament = get_tournament(options.get("tournament_id"))
+        try:
+            stage = Stage.objects.get(tournament=tournament, order=options["stage_order"])
+        except Stage.DoesNotExist:
+            raise CommandError(f"Etapa {options['stage_order']} não encontrada.")
+
+        usernames = [f"{prefix}{i:05d}" for i in range(options["users"])]
+        if options["setup"]:
+            self.setup(User, usernames, options["password"], stage)
+        elif stage.deadline <= timezone.now():
+            self.stdout.write(
+                self.style.WARNING(
+                    "Prazo da etapa encerrado: os palpites vão falhar (use --setup)."
+                )
+            )
+
+        server = self.start_server(options["base_url"]) if options["serve"] else None
+        try:
+            recorder, elapsed = self.run_users(usernames, tournament, stage, options)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+        self.report(recorder, elapsed, len(usernames))
+
+    def setup(self, User, usernames, password, stage):
+        existing = dict(
+            User.objects.filter(username__in=usernames).values_list("username", "email")
+        )
+        foreign = sorted(u for u, email in existing.items() if email != marker_email(u))
+        if foreign:
+            raise CommandError(
+                f"Usuário(s) que não são de teste com o mesmo nome: "
+                f"{', '.join(foreign[:5])}. Use outro --prefix."
+            )
+        # um hash só para todos: o PBKDF2 por usuário dominaria o setup
+        hashed = make_password(password)
+        User.objects.bulk_create(
+            [
+                User(username=u, email=marker_email(u), password=hashed)
+                for u in usernames
+                if u not in existing
+            ],
+            batch_size=1000,
+        )
+        User.objects.filter(
+            username__in=usernames, email__endswith=f"@{MARKER_DOMAIN}"
+        ).update(password=hashed)
+        self.stdout.write(f"{len(usernames) - len(existing)} usuários de teste criados.")
+
+        if stage.deadline <= timezone.now():
+            stage.deadline = timezone.now() + timedelta(hours=1)
+            stage.save(update_fields=["deadline"])
+            self.stdout.write(f"Prazo de '{stage.name}' reaberto até {stage.deadline}.")
+
+    def start_server(self, base_url):
+        address = base_url.split("://", 1)[-1].rstrip("/")
+        manage = os.path.join(settings.BASE_DIR, "manage.py")
+        server = subprocess.Popen(
+            [sys.executable, manage, "runserver", address, "--noreload"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(base_url.rstrip("/") + "/api/copa/stages/", timeout=1)
+                return server
+            except urllib.error.HTTPError:
+                return server
+            except (urllib.error.URLError, OSError):
+                if server.poll() is not None:
+                    break
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f"Servidor local não subiu em {base_url}.")
+
+    def run_users(self, usernames, tournament, stage, options):
+        recorder = Recorder()
+        started = time.monotonic()
+        until = started + options["ramp_up"] + options["duration"]
+        step = options["ramp_up"] / len(usernames)
+
+        threads = []
+        for i, username in enumerate(usernames):
+            user = VirtualUser(
+                options["base_url"],
+                username,
+                options["password"],
+                tournament.id,
+                stage.order,
+                recorder,
+                options["think"],
+                options["timeout"],
+            )
+            thread = threading.Thread(target=user.run, args=(until,), daemon=True)
+            threads.append(thread)
+            # entrada escalonada, como o pessoal chegando perto do prazo
+            time.sleep(max(0.0, started + i * step - time.monotonic()))
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return recorder, time.monotonic() - started
+
+    def report(self, recorder, elapsed, users):
+        total = sum(len(v) for v in recorder.latencies.values())
+        errors = sum(
+            count
+            for statuses in recorder.statuses.values()
+            for status, count in statuses.items()
+            if not 200 <= status < 300
+        )
+        self.stdout.write(
+            f"{users} usuários | {elapsed:.1f} s | {total} requisições | "
+            f"{total / elapsed:.1f} req/s | erros {errors} "
+            f"({errors / total * 100 if total else 0:.2f}%)"
+        )
+        self.stdout.write(
+            f"{'endpoint':<14}{'req':>8}{'erros':>8}{'p50 ms':>10}{'p95 ms':>10}"
+            f"{'p99 ms':>10}{'máx ms':>10}"
+        )
+        for label in sorted(recorder.latencies):
+            values = sorted(recorder.latencies[label])
+            failed = sum(
+                count
+                for status, count in recorder.statuses[label].items()
+                if not 200 <= status < 300
+            )
+            self.stdout.write(
+                f"{label:<14}{len(values):>8}{failed:>8}"
+                f"{percentile(values, 50) * 1000:>10.1f}"
+                f"{percentile(values, 95) * 1000:>10.1f}"
+                f"{percentile(values, 99) * 1000:>10.1f}"
+                f"{values[-1] * 1000:>10.1f}"
+            )
+        codes = Counter()
+        for statuses in recorder.statuses.values():
+            codes.update(statuses)
+        failures = {s: c for s, c in codes.items() if not 200 <= s < 300}
+        if failures:
+            detail = ", ".join(
+                f"{'conexão' if s == 0 else s}: {c}" for s, c in sorted(failures.items())
+            )
+            self.stdout.write(self.style.WARNING(f"Falhas por status: {detail}"))
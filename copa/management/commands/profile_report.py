@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from bolao2026.profiling import (
+    SORT_KEYS,
+    clear_profiles,
+    merged_stats,
+    profile_report,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Mostra as funções mais caras das requisições lentas amostradas pelo "
+        "ProfilingMiddleware, por view (ver bolao2026/profiling.py)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--view",
+            default=None,
+            help="Só esta view (ex.: RankingView.get, MatchViewSet.list).",
+        )
+        parser.add_argument(
+            "--top", type=int, default=20, help="Funções por view (padrão: 20)."
+        )
+        parser.add_argument("--sort", choices=SORT_KEYS, default="cumulative")
+        parser.add_argument(
+            "--output",
+            default=None,
+            help="Grava os perfis somados num .prof (snakeviz, pstats).",
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Apaga os perfis guardados (da view, se --view) e sai.",
+        )
+
+    def handle(self, *args, **options):
+        view = options["view"]
+        if options["clear"]:
+            removed = clear_profiles(view)
+            self.stdout.write(self.style.SUCCESS(f"{removed} perfil(s) apagado(s)."))
+            return
+
+        if options["output"]:
+            stats = merged_stats(view)
+            if stats is None:
+                raise CommandError("Nenhum perfil guardado.")
+            stats.dump_stats(options["output"])
+            self.stdout.write(self.style.SUCCESS(f"Perfis somados em {options['output']}."))
+            return
+
+        report = profile_report(view, top=options["top"], sort=options["sort"])
+        if not report:
+            self.stdout.write("Nenhum perfil guardado.")
+            return
+        for entry in report:
+            self.stdout.write(
+                self.style.MIGRATE_HEADING(
+                    f"{entry['view']}: {entry['samples']} amostra(s), "
+                    f"média {entry['avg_ms']:.0f} ms, máx {entry['max_ms']:.0f} ms"
+                )
+            )
+            self.stdout.write(f"{'cum ms':>10}{'tot ms':>10}{'calls':>10}  função")
+            for func in entry["functions"]:
+                self.stdout.write(
+                    f"{func['cumtime_ms']:>10.1f}{func['tottime_ms']:>10.1f}"
+                    f"{func['calls']:>10g}  {func['function']}"
+                )
@@ -0,0 +1,137 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from copa.cache import bump_results_version
+from copa.jobs import refresh_standings
+from copa.management.utils import get_tournament, init_worker_process
+from copa.models import Bet, ExtraBet, Stage
+from copa.rescore import (
+    chunk_bounds,
+    rescore_bets,
+    rescore_extras,
+    rescore_snapshot,
+    scoring_context,
+)
+from copa.team_stats import derive_extra_results, rebuild_team_goals
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula do zero os dados derivados de um torneio: gols por "
+        "seleção, gabaritos automáticos, pontos gravados (Bet.points / "
+        "ExtraBet.points) e o ranking. Para mudança de regra "
+        "(Stage.points_*) ou dados derivados suspeitos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tournament-id",
+            type=int,
+            default=None,
+            help="ID do Tournament. Se omitido e houver só um torneio, usa esse.",
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Processos do pool (padrão: nº de CPUs).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=20000,
+            help="Palpites por bloco de trabalho (padrão: 20000).",
+        )
+
+    def handle(self, *args, **options):
+        if options["processes"] < 1 or options["chunk_size"] < 1:
+            raise CommandError("--processes e --chunk-size devem ser maiores que zero.")
+
+        tournament = get_tournament(options.get("tournament_id"))
+        started = time.monotonic()
+
+        # Gols por seleção e gabaritos automáticos antes de pontuar os extras.
+        rebuild_team_goals(tournament)
+        derive_extra_results(tournament.id)
+
+        context = scoring_context(tournament)
+
+        # Etapas encerradas com snapshot: pontuadas pelo arquivo, fora da
+        # varredura por faixas de id.
+        scanned = updated = 0
+        from_snapshot = set()
+        closed = Stage.objects.filter(
+            tournament=tournament, deadline__lte=timezone.now()
+        ).values_list("id", flat=True)
+        for stage_id in closed:
+            result = rescore_snapshot(stage_id, context)
+            if result is None:
+                continue
+            stage_scanned, stage_updated, match_ids = result
+            scanned += stage_scanned
+            updated += stage_updated
+            from_snapshot.update(match_ids)
+            if options["verbosity"] >= 2:
+                self.stdout.write(
+                    f"etapa {stage_id} (snapshot): {stage_scanned} lido(s), "
+                    f"{stage_updated} alterado(s)."
+                )
+        if from_snapshot:
+            context["matches"] = {
+                match_id: rules
+                for match_id, rules in context["matches"].items()
+                if match_id not in from_snapshot
+            }
+
+        tasks = [
+            (rescore_bets, lo, hi)
+            for lo, hi in chunk_bounds(
+                Bet.objects.filter(match__tournament=tournament).exclude(
+                    match_id__in=from_snapshot
+                ),
+                options["chunk_size"],
+            )
+        ] + [
+            (rescore_extras, lo, hi)
+            for lo, hi in chunk_bounds(
+                ExtraBet.objects.filter(tournament=tournament),
+                options["chunk_size"],
+            )
+        ]
+
+        # conexões abertas não podem ser herdadas pelos processos filhos
+        connections.close_all()
+        with ProcessPoolExecutor(
+            options["processes"], initializer=init_worker_process
+        ) as pool:
+            futures = [pool.submit(func, lo, hi, context) for func, lo, hi in tasks]
+            for done, future in enumerate(as_completed(futures), start=1):
+                chunk_scanned, chunk_updated = future.result()
+                scanned += chunk_scanned
+                updated += chunk_updated
+                if options["verbosity"] >= 2:
+                    self.stdout.write(
+                        f"bloco {done}/{len(tasks)}: {chunk_scanned} lido(s), "
+                        f"{chunk_updated} alterado(s)."
+                    )
+        scoring_elapsed = time.monotonic() - started
+
+        # Regras podem ter mudado sem nenhum resultado novo: invalida o que
+        # foi cacheado e recalcula o ranking.
+        bump_results_version(tournament.id)
+        refresh_standings(tournament.id)
+
+        elapsed = time.monotonic() - started
+        rate = scanned / scoring_elapsed if scoring_elapsed > 0 else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{scanned} palpite(s) repontuado(s), {updated} alterado(s), "
+                f"em {elapsed:.1f}s ({rate:.0f} palpites/s, "
+                f"{options['processes']} processo(s), {len(tasks)} bloco(s))."
+            )
+        )
@@ -0,0 +1,101 @@
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from copa.jobs import claim_jobs, requeue_stale, run_job
+from copa.management.utils import init_worker_process
+
+
+class Command(BaseCommand):
+    help = (
+        "Executa os jobs em segundo plano da fila (repontuação, ranking, "
+        "cache; ver copa/jobs.py). Rode um ou mais workers em produção."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=4,
+            help="Jobs simultâneos em threads (padrão: 4).",
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=0,
+            help="Usa um pool de N processos em vez de threads.",
+        )
+        parser.add_argument(
+            "--poll",
+            type=float,
+            default=1.0,
+            help="Segundos entre consultas à fila quando ela está vazia.",
+        )
+        parser.add_argument(
+            "--stale-seconds",
+            type=int,
+            default=600,
+            help="Jobs 'running' há mais tempo que isso voltam para a fila "
+            "(worker que morreu no meio).",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Esvazia a fila e sai (útil em cron/testes).",
+        )
+
+    def handle(self, *args, **options):
+        if options["processes"] < 0 or options["threads"] < 1:
+            raise CommandError("--threads/--processes inválidos.")
+
+        if options["processes"]:
+            size = options["processes"]
+            # conexões abertas não podem ser herdadas pelos processos filhos
+            connections.close_all()
+            executor = ProcessPoolExecutor(size, initializer=init_worker_process)
+            mode = f"{size} processo(s)"
+        else:
+            size = options["threads"]
+            executor = ThreadPoolExecutor(size)
+            mode = f"{size} thread(s)"
+        self.stdout.write(f"Worker iniciado com {mode}.")
+
+        running = set()
+        done_count = failed_count = 0
+        try:
+            while True:
+                requeue_stale(options["stale_seconds"])
+                claimed = claim_jobs(size - len(running))
+                running |= {executor.submit(run_job, job_id) for job_id in claimed}
+
+                if not running:
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll"])
+                    continue
+
+                finished, running = wait(
+                    running, timeout=options["poll"], return_when=FIRST_COMPLETED
+                )
+                for future in finished:
+                    if future.result():
+                        done_count += 1
+                    else:
+                        failed_count += 1
+        except KeyboardInterrupt:
+            self.stdout.write("Encerrando: aguardando jobs em andamento...")
+        finally:
+            executor.shutdown(wait=True)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{done_count} job(s) concluído(s), {failed_count} com falha."
+            )
+        )
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from copa.management.utils import get_tournament
+from copa.models import Stage
+from copa.snapshots import build_snapshot, snapshot_path
+
+
+class Command(BaseCommand):
+    help = (
+        "Grava o snapshot binário (ver copa/snapshots.py) dos palpites de "
+        "cada etapa com prazo encerrado que ainda não tenha um."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tournament-id",
+            type=int,
+            default=None,
+            help="ID do Tournament. Se omitido e houver só um torneio, usa esse.",
+        )
+        parser.add_argument(
+            "--stage-id",
+            type=int,
+            default=None,
+            help="Só esta etapa.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regrava snapshots que já existem.",
+        )
+
+    def handle(self, *args, **options):
+        tournament = get_tournament(options.get("tournament_id"))
+        stages = Stage.objects.filter(
+            tournament=tournament, deadline__lte=timezone.now()
+        ).order_by("order")
+        if options["stage_id"] is not None:
+            stages = stages.filter(id=options["stage_id"])
+            if not stages:
+                raise CommandError(
+                    f"Etapa {options['stage_id']} não existe ou o prazo não encerrou."
+                )
+
+        for stage in stages:
+            path = snapshot_path(stage.id)
+            if path.exists() and not options["force"]:
+                self.stdout.write(f"{stage.name}: já existe ({path}).")
+                continue
+            try:
+                count = build_snapshot(stage)
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            self.stdout.write(
+                f"{stage.name}: {count} palpite(s), {path.stat().st_size} bytes."
+            )
+        self.stdout.write(self.style.SUCCESS("Snapshots atualizados."))
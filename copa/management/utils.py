@@ -0,0 +1,33 @@
+import django
+from django.core.management.base import CommandError
+from django.db import connections
+
+from copa.models import Tournament
+
+
+def get_tournament(tournament_id):
+    """
+    Resolve o torneio dos comandos: se o ID for omitido e houver só um
+    torneio cadastrado, usa esse.
+    """
+    qs = Tournament.objects.all()
+    if tournament_id is None:
+        if qs.count() != 1:
+            raise CommandError(
+                f"Existe(m) {qs.count()} torneio(s). Informe --tournament-id."
+            )
+        return qs.first()
+    try:
+        return qs.get(pk=tournament_id)
+    except Tournament.DoesNotExist:
+        raise CommandError(f"Tournament {tournament_id} não existe.")
+
+
+def init_worker_process():
+    """
+    initializer dos ProcessPoolExecutor dos comandos: garante o Django
+    configurado no processo filho (fork ou spawn) e nenhuma conexão
+    herdada do pai; cada filho abre as suas.
+    """
+    django.setup()
+    connections.close_all()
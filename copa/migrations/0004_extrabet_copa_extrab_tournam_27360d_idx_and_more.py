@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-18 23:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('copa', '0003_alter_stage_order'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='extrabet',
+            index=models.Index(fields=['tournament', 'type'], name='copa_extrab_tournam_27360d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['tournament', 'stage', 'kickoff'], name='copa_match_tournam_f7648a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['tournament', 'kickoff'], name='copa_match_tournam_e10ac3_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-18 23:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('copa', '0004_extrabet_copa_extrab_tournam_27360d_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BetDistribution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.PositiveIntegerField()),
+                ('home_wins', models.PositiveIntegerField()),
+                ('draws', models.PositiveIntegerField()),
+                ('away_wins', models.PositiveIntegerField()),
+                ('top_scores', models.JSONField(default=list)),
+                ('computed_at', models.DateTimeField(auto_now_add=True)),
+                ('match', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='distribution', to='copa.match')),
+            ],
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 6.0 on 2026-10-18 23:58
+
+from django.db import migrations, models
+
+from copa.models import EXTRA_POINTS
+from copa.scoring import result_points_expression, score_extra
+
+BATCH_SIZE = 1000
+
+
+def backfill_points(apps, schema_editor):
+    """
+    Pontos dos palpites que já tinham resultado (um UPDATE por jogo e um
+    por gabarito de extra).
+    """
+    Match = apps.get_model("copa", "Match")
+    Bet = apps.get_model("copa", "Bet")
+    ExtraBet = apps.get_model("copa", "ExtraBet")
+    ExtraResult = apps.get_model("copa", "ExtraResult")
+
+    finished = Match.objects.filter(
+        home_score__isnull=False, away_score__isnull=False
+    ).select_related("stage")
+    for match in finished.iterator():
+        stage = match.stage
+        Bet.objects.filter(match_id=match.id).update(
+            points=result_points_expression(
+                match.home_score,
+                match.away_score,
+                stage.points_exact_score,
+                stage.points_result,
+                stage.points_one_team_goals,
+            )
+        )
+
+    for result in ExtraResult.objects.all():
+        rows = ExtraBet.objects.filter(
+            tournament_id=result.tournament_id, type=result.type
+        ).values_list("id", "team_id", "player_name")
+        hits = [
+            pk
+            for pk, team_id, player_name in rows.iterator()
+            if score_extra(
+                result.type,
+                team_id,
+                player_name,
+                result.team_id,
+                result.player_name,
+                EXTRA_POINTS[result.type],
+            )
+        ]
+        for i in range(0, len(hits), BATCH_SIZE):
+            ExtraBet.objects.filter(id__in=hits[i : i + BATCH_SIZE]).update(
+                points=EXTRA_POINTS[result.type]
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('copa', '0006_league_leaguemembership_league_members'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bet',
+            name='points',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='extrabet',
+            name='points',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_points, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('rescore_match', 'Repontuar palpites de um jogo'), ('rescore_extras', 'Repontuar extras de um torneio'), ('refresh_standings', 'Atualizar ranking'), ('warm_cache', 'Aquecer cache')], max_length=30)),
+                ('key', models.CharField(max_length=50)),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('running', 'Executando'), ('done', 'Concluído'), ('failed', 'Falhou')], default='pending', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'id'], name='copa_job_status_ed4093_idx'), models.Index(fields=['kind', 'key', 'status'], name='copa_job_kind_d1258d_idx')],
+            },
+        ),
+    ]
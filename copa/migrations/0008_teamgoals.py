@@ -0,0 +1,60 @@
+# Generated by Django 6.0 on 2026-10-19 00:05
+
+import django.db.models.deletion
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def backfill_team_goals(apps, schema_editor):
+    Match = apps.get_model("copa", "Match")
+    TeamGoals = apps.get_model("copa", "TeamGoals")
+
+    totals = defaultdict(lambda: [0, 0, 0])  # played, gf, ga
+    finished = Match.objects.filter(
+        home_score__isnull=False, away_score__isnull=False
+    ).values_list(
+        "tournament_id", "home_team_id", "away_team_id", "home_score", "away_score"
+    )
+    for tournament_id, home, away, home_score, away_score in finished.iterator():
+        for team_id, gf, ga in ((home, home_score, away_score), (away, away_score, home_score)):
+            row = totals[(tournament_id, team_id)]
+            row[0] += 1
+            row[1] += gf
+            row[2] += ga
+
+    TeamGoals.objects.bulk_create(
+        TeamGoals(
+            tournament_id=tournament_id,
+            team_id=team_id,
+            played=played,
+            goals_for=gf,
+            goals_against=ga,
+        )
+        for (tournament_id, team_id), (played, gf, ga) in totals.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('copa', '0007_bet_points_extrabet_points_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeamGoals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('played', models.PositiveSmallIntegerField(default=0)),
+                ('goals_for', models.PositiveSmallIntegerField(default=0)),
+                ('goals_against', models.PositiveSmallIntegerField(default=0)),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='goals', to='copa.team')),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='team_goals', to='copa.tournament')),
+            ],
+            options={
+                'unique_together': {('tournament', 'team')},
+            },
+        ),
+        migrations.RunPython(backfill_team_goals, migrations.RunPython.noop),
+    ]
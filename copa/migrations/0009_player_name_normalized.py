@@ -0,0 +1,55 @@
+# Generated by Django 6.0 on 2026-10-19 00:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+from copa.scoring import normalize_player_name
+
+BATCH_SIZE = 2000
+
+
+def backfill_normalized_names(apps, schema_editor):
+    for model_name in ("ExtraBet", "ExtraResult"):
+        model = apps.get_model("copa", model_name)
+        rows = model.objects.exclude(player_name="").values_list("id", "player_name")
+        batch = []
+        for pk, player_name in rows.iterator(chunk_size=BATCH_SIZE):
+            batch.append(
+                model(id=pk, player_name_normalized=normalize_player_name(player_name))
+            )
+            if len(batch) >= BATCH_SIZE:
+                model.objects.bulk_update(batch, ["player_name_normalized"])
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, ["player_name_normalized"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('copa', '0008_teamgoals'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='extrabet',
+            name='player_name_normalized',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='extraresult',
+            name='player_name_normalized',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        # preenche antes de criar o índice (mais rápido que atualizar o índice linha a linha)
+        migrations.RunPython(backfill_normalized_names, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='extrabet',
+            index=models.Index(fields=['tournament', 'type', 'player_name_normalized'], name='copa_extrab_tournam_2305dd_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='extrabet',
+            name='copa_extrab_tournam_27360d_idx',
+        ),
+    ]
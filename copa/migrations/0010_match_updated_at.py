@@ -0,0 +1,22 @@
+# Generated by Django 6.0 on 2026-10-19 01:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('copa', '0009_player_name_normalized'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['tournament', 'updated_at'], name='copa_match_tournam_333a92_idx'),
+        ),
+    ]
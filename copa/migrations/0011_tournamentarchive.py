@@ -0,0 +1,50 @@
+# Generated by Django 6.0 on 2026-10-19 01:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('copa', '0010_match_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TournamentArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('standings', models.JSONField(default=list)),
+                ('dump_file', models.CharField(max_length=255)),
+                ('dump_sha256', models.CharField(max_length=64)),
+                ('bets_count', models.PositiveIntegerField(default=0)),
+                ('extra_bets_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('tournament', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='archive', to='copa.tournament')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedUserSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('username', models.CharField(max_length=150)),
+                ('position', models.PositiveIntegerField()),
+                ('total_points', models.PositiveIntegerField(default=0)),
+                ('extras_points', models.PositiveIntegerField(default=0)),
+                ('exact_scores', models.PositiveIntegerField(default=0)),
+                ('results', models.PositiveIntegerField(default=0)),
+                ('bets_count', models.PositiveIntegerField(default=0)),
+                ('stage_points', models.JSONField(default=dict)),
+                ('champion_hit', models.BooleanField(default=False)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_summaries', to=settings.AUTH_USER_MODEL)),
+                ('archive', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summaries', to='copa.tournamentarchive')),
+            ],
+            options={
+                'ordering': ['position'],
+                'unique_together': {('archive', 'user')},
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-19 02:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('copa', '0011_tournamentarchive'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tournamentarchive',
+            name='tournament',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.PROTECT, related_name='archive', to='copa.tournament'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 02:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('copa', '0012_tournamentarchive_protect'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='extraresult',
+            name='derived',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 03:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('copa', '0014_autosavebuffer'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('rescore_match', 'Repontuar palpites de um jogo'), ('rescore_extras', 'Repontuar extras de um torneio'), ('refresh_standings', 'Atualizar ranking'), ('warm_cache', 'Aquecer cache'), ('freeze_distributions', 'Congelar distribuições')], max_length=30),
+        ),
+    ]
@@ -1,6 +1,15 @@
+import secrets
+
 from django.conf import settings
 from django.db import models
 
+from .scoring import (
+    NORMALIZED_NAME_MAX_LENGTH,
+    normalize_player_name,
+    score_bet,
+    score_extra,
+)
+
 User = settings.AUTH_USER_MODEL
 
 
@@ -83,6 +92,22 @@ class Match(models.Model):
     home_penalties = models.PositiveSmallIntegerField(blank=True, null=True)
     away_penalties = models.PositiveSmallIntegerField(blank=True, null=True)
 
+    # Última alteração (resultado, criação pelo mata-mata, admin): usado no
+    # ?since= da API. bulk_update não preenche auto_now, quem usa precisa
+    # setar e incluir o campo.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # MatchViewSet (?tournament=&stage=) e generate_knockout
+            # filtram por torneio + fase e ordenam por kickoff.
+            models.Index(fields=["tournament", "stage", "kickoff"]),
+            # MatchViewSet só com ?tournament=, ordenado por kickoff.
+            models.Index(fields=["tournament", "kickoff"]),
+            # MatchViewSet ?tournament=&since=
+            models.Index(fields=["tournament", "updated_at"]),
+        ]
+
     def __str__(self):
         return f"{self.home_team} x {self.away_team} ({self.stage})"
 
@@ -100,6 +125,9 @@ class Bet(models.Model):
     )
     home_score = models.PositiveSmallIntegerField()
     away_score = models.PositiveSmallIntegerField()
+    # Pontos gravados pelo job de repontuação (copa/jobs.py) quando sai o
+    # resultado do jogo. calculate_points() continua calculando na hora.
+    points = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -117,35 +145,16 @@ class Bet(models.Model):
         - Senão, gols de pelo menos um time corretos (sem acertar resultado) -> points_one_team_goals
         - Senão -> 0
         """
-        if not self.match.is_finished:
-            return 0
-
         stage = self.match.stage
-        ah = self.match.home_score
-        aa = self.match.away_score
-        ph = self.home_score
-        pa = self.away_score
-
-        # Placar exato
-        if ah == ph and aa == pa:
-            return stage.points_exact_score
-
-        # Resultado real
-        real_diff = ah - aa
-        pred_diff = ph - pa
-
-        real_sign = 0 if real_diff == 0 else (1 if real_diff > 0 else -1)
-        pred_sign = 0 if pred_diff == 0 else (1 if pred_diff > 0 else -1)
-
-        # Resultado (vitória/empate/derrota)
-        if real_sign == pred_sign:
-            return stage.points_result
-
-        # Não acertou resultado, mas acertou gols de pelo menos um time
-        if ah == ph or aa == pa:
-            return stage.points_one_team_goals
-
-        return 0
+        return score_bet(
+            self.home_score,
+            self.away_score,
+            self.match.home_score,
+            self.match.away_score,
+            stage.points_exact_score,
+            stage.points_result,
+            stage.points_one_team_goals,
+        )
 
     def is_exact_score(self):
         if not self.match.is_finished:
@@ -177,6 +186,66 @@ class Bet(models.Model):
         return self.calculate_points()
 
 
+class AutosaveBuffer(models.Model):
+    """
+    Usuário com palpites do autosave no buffer do cache (ver
+    copa/autosave.py). Uma linha por buffer, não por palpite: é por aqui
+    que o flush_autosave e o congelamento no prazo, em qualquer processo,
+    acham quem tem palpites para gravar.
+    """
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="+"
+    )
+    # quando o buffer começou e o menor prazo entre os jogos dele
+    created_at = models.DateTimeField(db_index=True)
+    deadline = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Autosave de {self.user}"
+
+
+class BetDistribution(models.Model):
+    """
+    Distribuição dos palpites de um jogo ("62% apostaram no Brasil, placar
+    mais comum 2x0"). Calculada uma única vez depois do prazo da etapa,
+    quando os palpites não mudam mais.
+    """
+    match = models.OneToOneField(
+        Match, on_delete=models.CASCADE, related_name="distribution"
+    )
+    total = models.PositiveIntegerField()
+    home_wins = models.PositiveIntegerField()
+    draws = models.PositiveIntegerField()
+    away_wins = models.PositiveIntegerField()
+    # placares mais palpitados: [[home_score, away_score, quantidade], ...]
+    top_scores = models.JSONField(default=list)
+    computed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Distribuição - {self.match}"
+
+
+class TeamGoals(models.Model):
+    """
+    Gols pró/contra de cada seleção no torneio, atualizados a cada
+    resultado gravado (copa/team_stats.py). Base dos extras de gols.
+    """
+    tournament = models.ForeignKey(
+        Tournament, on_delete=models.CASCADE, related_name="team_goals"
+    )
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name="goals")
+    played = models.PositiveSmallIntegerField(default=0)
+    goals_for = models.PositiveSmallIntegerField(default=0)
+    goals_against = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("tournament", "team")
+
+    def __str__(self):
+        return f"{self.team} ({self.goals_for}x{self.goals_against})"
+
+
 class ExtraType(models.TextChoices):
     CHAMPION = "CHAMPION", "Campeã"
     RUNNER_UP = "RUNNER_UP", "Vice-campeã"
@@ -204,6 +273,43 @@ EXTRA_POINTS = {
 }
 
 
+class PlayerNameQuerySet(models.QuerySet):
+    """
+    bulk_create, bulk_update e update() não passam pelo save(): mantêm
+    player_name_normalized aqui (ExtraResult e ExtraBet).
+    """
+
+    @staticmethod
+    def _with_normalized(fields):
+        if fields is not None and "player_name" in fields:
+            return [*fields, "player_name_normalized"]
+        return fields
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.player_name_normalized = normalize_player_name(obj.player_name)
+        kwargs["update_fields"] = self._with_normalized(kwargs.get("update_fields"))
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        if "player_name" in fields:
+            for obj in objs:
+                obj.player_name_normalized = normalize_player_name(obj.player_name)
+        return super().bulk_update(objs, self._with_normalized(fields), *args, **kwargs)
+
+    def update(self, **kwargs):
+        # bulk_update chega aqui com os dois campos já calculados
+        if "player_name" in kwargs and "player_name_normalized" not in kwargs:
+            if not isinstance(kwargs["player_name"], str):
+                raise TypeError("update(player_name=...) só aceita texto.")
+            kwargs["player_name_normalized"] = normalize_player_name(
+                kwargs["player_name"]
+            )
+        return super().update(**kwargs)
+
+
 class ExtraResult(models.Model):
     """
     Gabarito dos extras.
@@ -216,6 +322,16 @@ class ExtraResult(models.Model):
         Team, on_delete=models.SET_NULL, null=True, blank=True
     )
     player_name = models.CharField(max_length=100, blank=True)
+    # normalize_player_name(player_name), mantido pelo save() e pelas
+    # operações em lote de PlayerNameQuerySet
+    player_name_normalized = models.CharField(
+        max_length=NORMALIZED_NAME_MAX_LENGTH, blank=True
+    )
+    # gravado por derive_extra_results (que o retira se os jogos mudarem);
+    # gabaritos lançados à mão ficam com False e nunca são retirados
+    derived = models.BooleanField(default=False, editable=False)
+
+    objects = PlayerNameQuerySet.as_manager()
 
     class Meta:
         unique_together = ("tournament", "type")
@@ -223,6 +339,13 @@ class ExtraResult(models.Model):
     def __str__(self):
         return f"{self.get_type_display()} - {self.team or self.player_name}"
 
+    def save(self, *args, **kwargs):
+        self.player_name_normalized = normalize_player_name(self.player_name)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "player_name" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "player_name_normalized"}
+        super().save(*args, **kwargs)
+
 
 class ExtraBet(models.Model):
     tournament = models.ForeignKey(
@@ -236,32 +359,202 @@ class ExtraBet(models.Model):
         Team, on_delete=models.SET_NULL, null=True, blank=True
     )
     player_name = models.CharField(max_length=100, blank=True)
+    # normalize_player_name(player_name), mantido pelo save() e pelas
+    # operações em lote de PlayerNameQuerySet
+    player_name_normalized = models.CharField(
+        max_length=NORMALIZED_NAME_MAX_LENGTH, blank=True
+    )
+    # Pontos gravados pelo job de repontuação quando o gabarito muda.
+    points = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = PlayerNameQuerySet.as_manager()
+
     class Meta:
         unique_together = ("tournament", "user", "type")
+        indexes = [
+            # pontuação/estatísticas por tipo de extra dentro do torneio;
+            # para TOP_SCORER, também acertos/contagem por jogador
+            models.Index(fields=["tournament", "type", "player_name_normalized"]),
+        ]
 
     def __str__(self):
         return f"{self.user} - {self.get_type_display()}"
 
-    def calculate_points(self):
-        try:
-            gabarito = ExtraResult.objects.get(
-                tournament=self.tournament, type=self.type
-            )
-        except ExtraResult.DoesNotExist:
-            return 0
+    def save(self, *args, **kwargs):
+        self.player_name_normalized = normalize_player_name(self.player_name)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "player_name" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "player_name_normalized"}
+        super().save(*args, **kwargs)
 
-        if self.type == ExtraType.TOP_SCORER:
-            if (
-                self.player_name
-                and gabarito.player_name
-                and self.player_name.strip().lower()
-                == gabarito.player_name.strip().lower()
-            ):
-                return EXTRA_POINTS[self.type]
-            return 0
+    def calculate_points(self, results=None):
+        """
+        `results` (opcional): dict {type: ExtraResult} já carregado, para
+        evitar uma query por palpite ao pontuar muitos extras de uma vez.
+        """
+        if results is not None:
+            gabarito = results.get(self.type)
+            if gabarito is None:
+                return 0
         else:
-            if self.team and gabarito.team and self.team_id == gabarito.team_id:
-                return EXTRA_POINTS[self.type]
-            return 0
+            try:
+                gabarito = ExtraResult.objects.get(
+                    tournament=self.tournament, type=self.type
+                )
+            except ExtraResult.DoesNotExist:
+                return 0
+
+        return score_extra(
+            self.type,
+            self.team_id,
+            self.player_name,
+            gabarito.team_id,
+            gabarito.player_name,
+            EXTRA_POINTS[self.type],
+        )
+
+
+def generate_invite_code():
+    return secrets.token_hex(4).upper()
+
+
+class League(models.Model):
+    """
+    Mini-liga privada (escritório, família...) dentro de um torneio.
+    O ranking da liga é o ranking geral filtrado pelos membros.
+    """
+
+    tournament = models.ForeignKey(
+        Tournament, on_delete=models.CASCADE, related_name="leagues"
+    )
+    name = models.CharField(max_length=100)
+    owner = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="owned_leagues"
+    )
+    invite_code = models.CharField(
+        max_length=16, unique=True, default=generate_invite_code
+    )
+    members = models.ManyToManyField(
+        User, through="LeagueMembership", related_name="leagues"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.tournament})"
+
+
+class LeagueMembership(models.Model):
+    league = models.ForeignKey(
+        League, on_delete=models.CASCADE, related_name="memberships"
+    )
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="league_memberships"
+    )
+    joined_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("league", "user")
+
+    def __str__(self):
+        return f"{self.user} em {self.league}"
+
+
+class Job(models.Model):
+    """
+    Fila de tarefas em segundo plano (executadas pelo comando run_worker).
+    Jobs são idempotentes: rodar duas vezes dá o mesmo resultado.
+    """
+
+    class Kind(models.TextChoices):
+        RESCORE_MATCH = "rescore_match", "Repontuar palpites de um jogo"
+        RESCORE_EXTRAS = "rescore_extras", "Repontuar extras de um torneio"
+        REFRESH_STANDINGS = "refresh_standings", "Atualizar ranking"
+        WARM_CACHE = "warm_cache", "Aquecer cache"
+        FREEZE_DISTRIBUTIONS = "freeze_distributions", "Congelar distribuições"
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pendente"
+        RUNNING = "running", "Executando"
+        DONE = "done", "Concluído"
+        FAILED = "failed", "Falhou"
+
+    kind = models.CharField(max_length=30, choices=Kind.choices)
+    # alvo do job: ID do jogo ou do torneio, conforme o tipo
+    key = models.CharField(max_length=50)
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # worker: próximos pendentes em ordem de chegada
+            models.Index(fields=["status", "id"]),
+            # deduplicação: já existe job pendente igual?
+            models.Index(fields=["kind", "key", "status"]),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.key} ({self.status})"
+
+
+class TournamentArchive(models.Model):
+    """
+    Torneio encerrado e arquivado (comando archive_tournament): classificação
+    final e resumos por usuário ficam aqui; os palpites crus (Bet/ExtraBet)
+    saem das tabelas e ficam num dump comprimido em COPA_ARCHIVE_DIR.
+    """
+
+    # PROTECT: apagar o torneio apagaria a única referência ao dump
+    tournament = models.OneToOneField(
+        Tournament, on_delete=models.PROTECT, related_name="archive"
+    )
+    # mesmo formato de compute_ranking (servido pelo RankingView)
+    standings = models.JSONField(default=list)
+    dump_file = models.CharField(max_length=255)
+    dump_sha256 = models.CharField(max_length=64)
+    bets_count = models.PositiveIntegerField(default=0)
+    extra_bets_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Arquivo de {self.tournament}"
+
+
+class ArchivedUserSummary(models.Model):
+    """
+    Resumo do desempenho de um usuário num torneio arquivado.
+    """
+
+    archive = models.ForeignKey(
+        TournamentArchive, on_delete=models.CASCADE, related_name="summaries"
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="archived_summaries",
+    )
+    username = models.CharField(max_length=150)
+    position = models.PositiveIntegerField()
+    total_points = models.PositiveIntegerField(default=0)
+    extras_points = models.PositiveIntegerField(default=0)
+    exact_scores = models.PositiveIntegerField(default=0)
+    results = models.PositiveIntegerField(default=0)
+    bets_count = models.PositiveIntegerField(default=0)
+    # pontos dos jogos por fase: {"1": 120, "2": 30, ...}
+    stage_points = models.JSONField(default=dict)
+    champion_hit = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ("archive", "user")
+        ordering = ["position"]
+
+    def __str__(self):
+        return f"{self.position}º {self.username} ({self.archive.tournament})"
@@ -0,0 +1,205 @@
+"""
+Cálculo do ranking de um torneio (usado pelo RankingView e pela versão async).
+"""
+import asyncio
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+
+from bolao2026.compression import acached_payload, cached_payload
+from bolao2026.db_routing import replica_reads
+
+from .cache import (
+    RANKING_CACHE_SECONDS,
+    aresults_recently_changed,
+    aresults_version,
+    ranking_key,
+    ranking_payload_key,
+    results_recently_changed,
+    results_version,
+)
+from .models import (
+    Bet,
+    ExtraBet,
+    ExtraResult,
+    ExtraType,
+    LeagueMembership,
+    TournamentArchive,
+)
+
+
+def ranking_querysets(tournament):
+    bets = (
+        Bet.objects.filter(match__tournament=tournament)
+        .select_related("user", "match", "match__stage")
+    )
+    extra_bets = (
+        ExtraBet.objects.filter(tournament=tournament)
+        .select_related("user")
+    )
+    return bets, extra_bets
+
+
+def compute_ranking(tournament):
+    # torneio arquivado: os palpites saíram das tabelas, vale a classificação final
+    archived = (
+        TournamentArchive.objects.filter(tournament=tournament)
+        .values_list("standings", flat=True)
+        .first()
+    )
+    if archived is not None:
+        return archived
+
+    bets, extra_bets = ranking_querysets(tournament)
+    results = {
+        r.type: r for r in ExtraResult.objects.filter(tournament=tournament)
+    }
+
+    data = defaultdict(
+        lambda: {
+            "user_id": None,
+            "username": "",
+            "position": 0,
+            "total_points": 0,
+            "exact_scores": 0,
+            "results": 0,
+            "stage5_points": 0,
+            "extras_points": 0,
+            "champion_hit": False,
+        }
+    )
+
+    # Pontos dos jogos
+    for b in bets:
+        uid = b.user_id
+        if data[uid]["user_id"] is None:
+            data[uid]["user_id"] = uid
+            data[uid]["username"] = b.user.username
+
+        pts = b.calculate_points()
+        data[uid]["total_points"] += pts
+        data[uid]["stage5_points"] += b.points_stage5()
+        if b.is_exact_score():
+            data[uid]["exact_scores"] += 1
+        elif b.is_correct_result():
+            data[uid]["results"] += 1
+
+    # Pontos dos extras
+    for e in extra_bets:
+        uid = e.user_id
+        if data[uid]["user_id"] is None:
+            data[uid]["user_id"] = uid
+            data[uid]["username"] = e.user.username
+        pts = e.calculate_points(results)
+        data[uid]["total_points"] += pts
+        data[uid]["extras_points"] += pts
+        if e.type == ExtraType.CHAMPION and pts > 0:
+            data[uid]["champion_hit"] = True
+
+    ranking = list(data.values())
+
+    ranking.sort(
+        key=lambda x: (
+            -x["total_points"],
+            -int(x["champion_hit"]),
+            -x["exact_scores"],
+            -x["results"],
+            -x["stage5_points"],
+            -x["extras_points"],
+        )
+    )
+
+    for i, row in enumerate(ranking, start=1):
+        row["position"] = i
+
+    return ranking
+
+
+def compute_ranking_from_replica(tournament, fresh_results=False):
+    """
+    Calcula o ranking lendo de uma réplica (se houver), exceto logo depois
+    de um resultado novo, quando a réplica ainda pode estar atrasada.
+    """
+    with replica_reads(not fresh_results):
+        return compute_ranking(tournament)
+
+
+def get_ranking(tournament):
+    """
+    Ranking do cache; recalcula só quando um resultado muda ou expira.
+    """
+    key = ranking_key(tournament.id, results_version(tournament.id))
+    ranking = cache.get(key)
+    if ranking is None:
+        ranking = compute_ranking_from_replica(
+            tournament, results_recently_changed(tournament.id)
+        )
+        cache.set(key, ranking, RANKING_CACHE_SECONDS)
+    return ranking
+
+
+def get_ranking_payload(tournament):
+    """
+    Ranking já renderizado em JSON (e gzip), para servir direto do cache.
+    """
+    key = ranking_payload_key(tournament.id, results_version(tournament.id))
+    return cached_payload(key, lambda: get_ranking(tournament), RANKING_CACHE_SECONDS)
+
+
+def filter_ranking(ranking, user_ids):
+    """
+    Ranking restrito a um grupo de usuários, na mesma ordem (e com os
+    mesmos desempates) do ranking geral. "position" é renumerada dentro
+    do grupo; a posição geral fica em "overall_position".
+    """
+    rows = []
+    for row in ranking:
+        if row["user_id"] in user_ids:
+            rows.append(
+                {**row, "position": len(rows) + 1, "overall_position": row["position"]}
+            )
+    return rows
+
+
+def get_league_ranking(league):
+    """
+    Ranking de uma mini-liga: reaproveita o ranking geral em cache, então
+    nenhum palpite é pontuado de novo por liga.
+    """
+    members = set(
+        LeagueMembership.objects.filter(league=league).values_list(
+            "user_id", flat=True
+        )
+    )
+    return filter_ranking(get_ranking(league.tournament), members)
+
+
+# Um lock por chave, por processo: num cache miss, só uma corrotina do
+# worker recalcula; as demais esperam e leem o valor recém-gravado.
+_locks = defaultdict(asyncio.Lock)
+
+
+async def aget_ranking(tournament):
+    key = ranking_key(tournament.id, await aresults_version(tournament.id))
+    ranking = await cache.aget(key)
+    if ranking is not None:
+        return ranking
+
+    async with _locks[key]:
+        ranking = await cache.aget(key)
+        if ranking is None:
+            fresh = await aresults_recently_changed(tournament.id)
+            ranking = await sync_to_async(compute_ranking_from_replica)(
+                tournament, fresh
+            )
+            await cache.aset(key, ranking, RANKING_CACHE_SECONDS)
+    _locks.pop(key, None)
+    return ranking
+
+
+async def aget_ranking_payload(tournament):
+    key = ranking_payload_key(tournament.id, await aresults_version(tournament.id))
+    return await acached_payload(
+        key, lambda: aget_ranking(tournament), RANKING_CACHE_SECONDS
+    )
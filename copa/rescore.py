@@ -0,0 +1,194 @@
+"""
+Repontuação completa de um torneio a partir dos palpites crus.
+
+Para recuperação de desastre ou mudança de regra (Stage.points_*): os
+palpites são divididos em faixas de id (keyset) e cada faixa é pontuada
+num processo do pool, que lê só as colunas necessárias, calcula com as
+funções puras de copa/scoring.py e grava apenas os pontos que mudaram,
+com bulk_update em lotes.
+
+Etapas encerradas com snapshot (copa/snapshots.py) não passam pela
+varredura: rescore_snapshot() tira do arquivo os placares distintos de
+cada jogo e faz um UPDATE por (jogo, placar). Se os resultados e as
+regras da etapa são os mesmos da última pontuação pelo arquivo, a etapa
+é pulada.
+"""
+import hashlib
+
+from django.db.models import Count, Sum
+
+from .models import Match, Bet, ExtraBet, ExtraResult, EXTRA_POINTS
+from .scoring import score_bet, score_extra
+from .snapshots import load_snapshot, read_scored, write_scored
+
+UPDATE_BATCH_SIZE = 1000
+
+
+def chunk_bounds(qs, chunk_size):
+    """
+    Faixas (lo, hi] de ids que dividem `qs` em blocos de até chunk_size
+    linhas; a última é aberta (hi=None). Cada limite sai de uma leitura
+    no índice da chave primária.
+    """
+    bounds = []
+    last_id = 0
+    while True:
+        upper = list(
+            qs.filter(pk__gt=last_id)
+            .order_by("pk")
+            .values_list("pk", flat=True)[chunk_size - 1 : chunk_size]
+        )
+        if not upper:
+            bounds.append((last_id, None))
+            return bounds
+        bounds.append((last_id, upper[0]))
+        last_id = upper[0]
+
+
+def _id_range(lo, hi):
+    lookup = {"pk__gt": lo}
+    if hi is not None:
+        lookup["pk__lte"] = hi
+    return lookup
+
+
+def scoring_context(tournament):
+    """
+    Tudo o que os processos precisam para pontuar, carregado uma vez
+    (poucas linhas): regras/resultado de cada jogo e gabarito dos extras.
+    """
+    matches = {
+        m["id"]: (
+            m["home_score"],
+            m["away_score"],
+            m["stage__points_exact_score"],
+            m["stage__points_result"],
+            m["stage__points_one_team_goals"],
+        )
+        for m in Match.objects.filter(tournament=tournament).values(
+            "id",
+            "home_score",
+            "away_score",
+            "stage__points_exact_score",
+            "stage__points_result",
+            "stage__points_one_team_goals",
+        )
+    }
+    extras = {
+        r.type: (r.team_id, r.player_name)
+        for r in ExtraResult.objects.filter(tournament=tournament)
+    }
+    return {"tournament_id": tournament.id, "matches": matches, "extras": extras}
+
+
+def _write(model, changed):
+    model.objects.bulk_update(
+        [model(id=pk, points=points) for pk, points in changed],
+        ["points"],
+        batch_size=UPDATE_BATCH_SIZE,
+    )
+
+
+def rescore_bets(lo, hi, context):
+    """
+    Repontua os palpites (de jogos do torneio) com id em (lo, hi].
+    Devolve (lidos, alterados).
+    """
+    matches = context["matches"]
+    rows = Bet.objects.filter(
+        match_id__in=list(matches), **_id_range(lo, hi)
+    ).values_list("id", "match_id", "home_score", "away_score", "points")
+
+    changed = []
+    scanned = 0
+    for pk, match_id, home, away, old in rows.iterator(chunk_size=5000):
+        scanned += 1
+        points = score_bet(home, away, *matches[match_id])
+        if points != old:
+            changed.append((pk, points))
+    _write(Bet, changed)
+    return scanned, len(changed)
+
+
+def rescore_snapshot(stage_id, context):
+    """
+    Repontua os palpites de uma etapa encerrada a partir do snapshot, sem
+    ler as linhas: cada (jogo, placar) distinto do arquivo vira um UPDATE
+    dos palpites com esse placar cujos pontos mudaram. Nada é gravado se
+    os placares dos jogos, os Stage.points_* e o total de pontos gravado
+    são os mesmos da última pontuação pelo arquivo. Devolve
+    (lidos, alterados, ids dos jogos), ou None se a etapa não tem snapshot
+    ou se ele não bate com a tabela (aí a etapa vai para a varredura
+    normal).
+    """
+    sheet = load_snapshot(stage_id)
+    if sheet is None:
+        return None
+    with sheet:
+        match_ids = list(sheet.match_ids)
+        scores = set(zip(sheet.match_idx, sheet.home, sheet.away))
+        scanned = len(sheet)
+
+    stage_matches = set(
+        Match.objects.filter(stage_id=stage_id).values_list("id", flat=True)
+    )
+    if set(match_ids) != stage_matches:
+        return None
+    bets = Bet.objects.filter(match_id__in=match_ids)
+    stored = bets.aggregate(count=Count("id"), points=Sum("points"))
+    if stored["count"] != scanned:
+        return None
+
+    matches = context["matches"]
+    fingerprint = _scoring_fingerprint(matches, match_ids)
+    # o total confere que os pontos ainda são os gravados da última vez
+    # (ex.: banco restaurado depois dela)
+    if read_scored(stage_id) == f"{fingerprint}:{stored['points'] or 0}":
+        return scanned, 0, match_ids
+
+    changed = 0
+    for idx, home, away in scores:
+        match_id = match_ids[idx]
+        points = score_bet(home, away, *matches[match_id])
+        changed += (
+            Bet.objects.filter(match_id=match_id, home_score=home, away_score=away)
+            .exclude(points=points)
+            .update(points=points)
+        )
+    total = bets.aggregate(points=Sum("points"))["points"] or 0
+    write_scored(stage_id, f"{fingerprint}:{total}")
+    return scanned, changed, match_ids
+
+
+def _scoring_fingerprint(matches, match_ids):
+    """
+    Hash dos placares e das regras de pontuação dos jogos: muda quando sai
+    ou é corrigido um resultado, ou quando mudam os Stage.points_*.
+    """
+    rules = [(match_id, matches[match_id]) for match_id in sorted(match_ids)]
+    return hashlib.sha256(repr(rules).encode()).hexdigest()
+
+
+def rescore_extras(lo, hi, context):
+    """
+    Repontua os palpites especiais do torneio com id em (lo, hi].
+    Devolve (lidos, alterados).
+    """
+    results = context["extras"]
+    rows = ExtraBet.objects.filter(
+        tournament_id=context["tournament_id"], **_id_range(lo, hi)
+    ).values_list("id", "type", "team_id", "player_name", "points")
+
+    changed = []
+    scanned = 0
+    for pk, type_, team_id, player_name, old in rows.iterator(chunk_size=5000):
+        scanned += 1
+        points = 0
+        if type_ in results:
+            points = score_extra(
+                type_, team_id, player_name, *results[type_], EXTRA_POINTS[type_]
+            )
+        if points != old:
+            changed.append((pk, points))
+    _write(ExtraBet, changed)
+    return scanned, len(changed)
@@ -0,0 +1,94 @@
+"""
+Gravação de resultados oficiais (placar e pênaltis).
+
+Usado pelo PATCH de um jogo e pelo lançamento em lote: os jogos são
+gravados numa transação e, depois do commit, o cache de resultados é
+invalidado, os placares publicados ao vivo e a repontuação enfileirada
+(copa/jobs.py) — a requisição não espera pelo ranking.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import bump_results_version
+from .jobs import enqueue_result_jobs
+from .live import publish_match_result
+from .models import Match
+from .team_stats import apply_goal_changes, derive_extra_results
+
+RESULT_FIELDS = ("home_score", "away_score", "home_penalties", "away_penalties")
+MAX_SCORE = 32767  # PositiveSmallIntegerField
+
+
+def _parse_score(value, field):
+    if value in ("", None):
+        return None
+    if isinstance(value, int) and not isinstance(value, bool):
+        number = value
+    elif isinstance(value, str) and value.strip().isdigit():
+        number = int(value)
+    else:
+        raise ValueError(f"{field} inválido: {value!r}.")
+    if not 0 <= number <= MAX_SCORE:
+        raise ValueError(f"{field} fora do intervalo: {number}.")
+    return number
+
+
+def parse_result(data):
+    """
+    Valida placar/pênaltis vindos da API. Campos ausentes ou vazios viram
+    None (jogo sem resultado). Levanta ValueError com a mensagem de erro.
+    """
+    result = {field: _parse_score(data.get(field), field) for field in RESULT_FIELDS}
+    for home, away in (
+        ("home_score", "away_score"),
+        ("home_penalties", "away_penalties"),
+    ):
+        if (result[home] is None) != (result[away] is None):
+            raise ValueError(f"Informe {home} e {away} juntos.")
+    if result["home_penalties"] is not None and result["home_score"] is None:
+        raise ValueError("Pênaltis informados sem o placar do jogo.")
+    return result
+
+
+def _after_commit(matches):
+    for tournament_id in {m.tournament_id for m in matches}:
+        bump_results_version(tournament_id)
+    for match in matches:
+        publish_match_result(match)
+    enqueue_result_jobs(matches)
+
+
+def apply_results(results):
+    """
+    Grava resultados já validados: lista de (match, {campo: valor}).
+    Devolve os jogos atualizados.
+    """
+    now = timezone.now()
+    matches = []
+    goal_changes = []
+    with transaction.atomic():
+        # placar antigo lido do banco com os jogos travados: dois
+        # lançamentos simultâneos do mesmo jogo não somam os gols duas vezes
+        current = {
+            pk: (home, away)
+            for pk, home, away in Match.objects.select_for_update()
+            .filter(pk__in=[match.pk for match, _ in results])
+            .order_by("pk")
+            .values_list("pk", "home_score", "away_score")
+        }
+        for match, values in results:
+            goal_changes.append((match, current[match.pk]))
+            for field, value in values.items():
+                setattr(match, field, value)
+            match.updated_at = now
+            current[match.pk] = (match.home_score, match.away_score)
+            matches.append(match)
+
+        # bulk_update não dispara post_save: a invalidação do cache (que os
+        # signals fariam jogo a jogo) acontece uma vez só, após o commit.
+        Match.objects.bulk_update(matches, [*RESULT_FIELDS, "updated_at"])
+        apply_goal_changes(goal_changes)
+        for tournament_id in {m.tournament_id for m in matches}:
+            derive_extra_results(tournament_id)
+        transaction.on_commit(lambda: _after_commit(matches))
+    return matches
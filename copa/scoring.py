@@ -0,0 +1,171 @@
+"""
+Regras de pontuação como funções puras e como expressões SQL.
+
+As funções são usadas pelos models (Bet.calculate_points /
+ExtraBet.calculate_points) e por rotinas que trabalham com valores crus
+(exportação, importação, recálculo), sem instanciar models nem fazer
+queries extras. As expressões servem para agregar no próprio banco.
+"""
+import unicodedata
+
+from django.db.models import Case, F, IntegerField, Q, Value, When
+
+
+def _sign(diff):
+    return 0 if diff == 0 else (1 if diff > 0 else -1)
+
+
+def score_bet(
+    ph, pa, ah, aa, points_exact_score, points_result, points_one_team_goals
+):
+    """
+    Pontos de um palpite (ph x pa) para o resultado oficial (ah x aa).
+
+    - Placar exato -> points_exact_score
+    - Senão, resultado correto (vitória/empate) -> points_result
+    - Senão, gols de pelo menos um time corretos -> points_one_team_goals
+    - Senão (ou jogo sem resultado) -> 0
+    """
+    if ah is None or aa is None:
+        return 0
+    if ah == ph and aa == pa:
+        return points_exact_score
+    if _sign(ah - aa) == _sign(ph - pa):
+        return points_result
+    if ah == ph or aa == pa:
+        return points_one_team_goals
+    return 0
+
+
+# tamanho de player_name_normalized: NFKD e casefold podem alongar o nome
+# ("ß" -> "ss", ligaduras), então a coluna é mais larga que player_name
+NORMALIZED_NAME_MAX_LENGTH = 255
+
+
+def normalize_player_name(name):
+    """
+    Forma canônica do nome de um jogador para comparação:
+    "  Kylian  MBAPPÉ " -> "kylian mbappe" (sem acentos, casefold,
+    espaços colapsados). Cortada em NORMALIZED_NAME_MAX_LENGTH, para
+    caber na coluna; os dois lados da comparação são cortados igual.
+    """
+    if not name:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    normalized = " ".join(stripped.casefold().split())
+    return normalized[:NORMALIZED_NAME_MAX_LENGTH].rstrip()
+
+
+def score_extra(
+    extra_type, team_id, player_name, result_team_id, result_player_name, points
+):
+    """
+    Pontos de um palpite especial contra o gabarito (ExtraResult).
+    """
+    from .models import ExtraType
+
+    if extra_type == ExtraType.TOP_SCORER:
+        normalized = normalize_player_name(player_name)
+        if normalized and normalized == normalize_player_name(result_player_name):
+            return points
+        return 0
+    if team_id and result_team_id and team_id == result_team_id:
+        return points
+    return 0
+
+
+# ---------- Mesmas regras como expressões SQL ----------
+#
+# Para agregações (GROUP BY) sem instanciar um model por palpite.
+# Os prefixos permitem usar as expressões a partir de Bet (padrão) ou de
+# outro model que chegue ao palpite/jogo por relação (ex.: Match com
+# FilteredRelation para os palpites de um usuário).
+
+
+def bet_conditions(bet_prefix="", match_prefix="match__"):
+    """
+    Condições (Q) sobre um palpite e seu jogo:
+    finished, exact, same_result e one_team_goals.
+    """
+    def b(field):
+        return bet_prefix + field
+
+    def m(field):
+        return F(match_prefix + field)
+
+    finished = Q(
+        **{
+            f"{match_prefix}home_score__isnull": False,
+            f"{match_prefix}away_score__isnull": False,
+        }
+    )
+    exact = Q(**{b("home_score"): m("home_score"), b("away_score"): m("away_score")})
+    same_result = (
+        Q(
+            **{
+                f"{b('home_score')}__gt": F(b("away_score")),
+                f"{match_prefix}home_score__gt": m("away_score"),
+            }
+        )
+        | Q(
+            **{
+                b("home_score"): F(b("away_score")),
+                f"{match_prefix}home_score": m("away_score"),
+            }
+        )
+        | Q(
+            **{
+                f"{b('home_score')}__lt": F(b("away_score")),
+                f"{match_prefix}home_score__lt": m("away_score"),
+            }
+        )
+    )
+    one_team_goals = Q(**{b("home_score"): m("home_score")}) | Q(
+        **{b("away_score"): m("away_score")}
+    )
+    return {
+        "finished": finished,
+        "exact": finished & exact,
+        "same_result": finished & same_result,
+        "one_team_goals": finished & one_team_goals,
+    }
+
+
+def bet_points_expression(bet_prefix="", match_prefix="match__"):
+    """
+    Expressão SQL equivalente a score_bet().
+    """
+    c = bet_conditions(bet_prefix, match_prefix)
+    stage = match_prefix + "stage__"
+    return Case(
+        When(c["exact"], then=F(stage + "points_exact_score")),
+        When(c["same_result"], then=F(stage + "points_result")),
+        When(c["one_team_goals"], then=F(stage + "points_one_team_goals")),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def result_points_expression(
+    ah, aa, points_exact_score, points_result, points_one_team_goals
+):
+    """
+    Pontos de cada palpite de um jogo com resultado conhecido (ah x aa),
+    usando só colunas do próprio Bet: serve para um UPDATE único sobre os
+    palpites do jogo (UPDATE não aceita JOIN com match/stage).
+    """
+    if ah is None or aa is None:
+        return Value(0, output_field=IntegerField())
+    same_result = {
+        1: Q(home_score__gt=F("away_score")),
+        0: Q(home_score=F("away_score")),
+        -1: Q(home_score__lt=F("away_score")),
+    }[_sign(ah - aa)]
+    return Case(
+        When(Q(home_score=ah, away_score=aa), then=Value(points_exact_score)),
+        When(same_result, then=Value(points_result)),
+        When(Q(home_score=ah) | Q(away_score=aa), then=Value(points_one_team_goals)),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
@@ -9,6 +9,9 @@ from .models import (
     Bet,
     ExtraBet,
     ExtraType,
+    League,
+    LeagueMembership,
+    Job,
 )
 
 
@@ -51,7 +54,7 @@ class MatchSerializer(serializers.ModelSerializer):
             "away_score",
             "home_penalties",   # <<< NOVO
             "away_penalties", 
-
+            "updated_at",
         ]
         read_only_fields = ["home_score", "away_score", "tournament", "stage"]
 
@@ -61,7 +64,8 @@ class BetSerializer(serializers.ModelSerializer):
     match_id = serializers.PrimaryKeyRelatedField(
         queryset=Match.objects.all(), write_only=True, source="match"
     )
-    points = serializers.SerializerMethodField()
+    # gravado pelo job rescore_match quando sai o resultado (copa/jobs.py)
+    points = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Bet
@@ -77,9 +81,6 @@ class BetSerializer(serializers.ModelSerializer):
         ]
     read_only_fields = ["created_at", "updated_at", "points"]
 
-    def get_points(self, obj):
-        return obj.calculate_points()
-
     def validate(self, attrs):
         match = attrs.get("match") or self.instance.match
         now = timezone.now()
@@ -99,7 +100,8 @@ class BetSerializer(serializers.ModelSerializer):
 
 
 class ExtraBetSerializer(serializers.ModelSerializer):
-    points = serializers.SerializerMethodField()
+    # gravado pelo job rescore_extras quando o gabarito muda (copa/jobs.py)
+    points = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = ExtraBet
@@ -114,9 +116,6 @@ class ExtraBetSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["created_at", "points"]
 
-    def get_points(self, obj):
-        return obj.calculate_points()
-
     def validate(self, attrs):
         tournament = attrs.get("tournament") or self.instance.tournament
         if timezone.now() >= tournament.extras_deadline:
@@ -138,3 +137,45 @@ class ExtraBetSerializer(serializers.ModelSerializer):
         user = self.context["request"].user
         validated_data["user"] = user
         return super().create(validated_data)
+
+
+class LeagueSerializer(serializers.ModelSerializer):
+    owner = serializers.ReadOnlyField(source="owner.username")
+    members_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = League
+        fields = [
+            "id",
+            "tournament",
+            "name",
+            "owner",
+            "invite_code",
+            "members_count",
+            "created_at",
+        ]
+        read_only_fields = ["invite_code", "created_at"]
+
+    def create(self, validated_data):
+        user = self.context["request"].user
+        validated_data["owner"] = user
+        league = super().create(validated_data)
+        LeagueMembership.objects.create(league=league, user=user)
+        league.members_count = 1
+        return league
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = [
+            "id",
+            "kind",
+            "key",
+            "status",
+            "attempts",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
@@ -0,0 +1,134 @@
+"""
+"Minha cartela": os jogos de uma etapa com o palpite do usuário em cada um.
+
+Substitui o par /matches/?stage_order=N + /bets/ juntado no cliente. Uma
+query só: jogos da etapa com LEFT JOIN filtrado nos palpites do usuário
+(FilteredRelation), pontos calculados no banco e saída montada a partir
+de .values(), sem serializers aninhados.
+"""
+from django.db.models import FilteredRelation, Q
+from django.utils import timezone
+
+from .models import Stage, Match
+from .scoring import bet_points_expression
+
+FIELDS = (
+    "id",
+    "kickoff",
+    "group_name",
+    "home_score",
+    "away_score",
+    "home_penalties",
+    "away_penalties",
+    "home_team_id",
+    "home_team__code",
+    "home_team__name",
+    "away_team_id",
+    "away_team__code",
+    "away_team__name",
+    "stage_id",
+    "stage__order",
+    "stage__name",
+    "stage__deadline",
+    "stage__points_exact_score",
+    "stage__points_result",
+    "stage__points_one_team_goals",
+    "my_bet__id",
+    "my_bet__home_score",
+    "my_bet__away_score",
+    "my_bet_points",
+)
+
+
+def _stage_data(stage_id, order, name, deadline, exact, result, one_team, now):
+    return {
+        "id": stage_id,
+        "order": order,
+        "name": name,
+        "deadline": deadline,
+        "open": deadline > now,
+        "points_exact_score": exact,
+        "points_result": result,
+        "points_one_team_goals": one_team,
+    }
+
+
+def compute_stage_sheet(tournament, stage_order, user):
+    """
+    Etapa + jogos com o palpite do usuário (ou None), ou None se a etapa
+    não existe no torneio.
+    """
+    now = timezone.now()
+    rows = (
+        Match.objects.filter(tournament=tournament, stage__order=stage_order)
+        .annotate(my_bet=FilteredRelation("bets", condition=Q(bets__user=user)))
+        .annotate(my_bet_points=bet_points_expression("my_bet__", ""))
+        .values(*FIELDS)
+        .order_by("kickoff", "id")
+    )
+
+    stage = None
+    matches = []
+    for row in rows:
+        if stage is None:
+            stage = _stage_data(
+                row["stage_id"],
+                row["stage__order"],
+                row["stage__name"],
+                row["stage__deadline"],
+                row["stage__points_exact_score"],
+                row["stage__points_result"],
+                row["stage__points_one_team_goals"],
+                now,
+            )
+        bet = None
+        if row["my_bet__id"] is not None:
+            bet = {
+                "id": row["my_bet__id"],
+                "home_score": row["my_bet__home_score"],
+                "away_score": row["my_bet__away_score"],
+                "points": row["my_bet_points"],
+            }
+        matches.append(
+            {
+                "id": row["id"],
+                "kickoff": row["kickoff"],
+                "group_name": row["group_name"],
+                "home_team": {
+                    "id": row["home_team_id"],
+                    "code": row["home_team__code"],
+                    "name": row["home_team__name"],
+                },
+                "away_team": {
+                    "id": row["away_team_id"],
+                    "code": row["away_team__code"],
+                    "name": row["away_team__name"],
+                },
+                "home_score": row["home_score"],
+                "away_score": row["away_score"],
+                "home_penalties": row["home_penalties"],
+                "away_penalties": row["away_penalties"],
+                "bet": bet,
+            }
+        )
+
+    if stage is None:
+        # etapa sem jogos ainda (ex.: mata-mata não gerado)
+        found = (
+            Stage.objects.filter(tournament=tournament, order=stage_order)
+            .values_list(
+                "id",
+                "order",
+                "name",
+                "deadline",
+                "points_exact_score",
+                "points_result",
+                "points_one_team_goals",
+            )
+            .first()
+        )
+        if found is None:
+            return None
+        stage = _stage_data(*found, now)
+
+    return {"tournament": tournament.id, "stage": stage, "matches": matches}
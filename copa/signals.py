@@ -0,0 +1,69 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_bets_version, bump_results_version
+from .jobs import enqueue
+from .models import Stage, Match, Bet, ExtraBet, ExtraResult, Job
+
+# campos que mudam os pontos dos palpites
+RESULT_FIELDS = {"home_score", "away_score"}
+STAGE_POINT_FIELDS = {
+    "points_exact_score",
+    "points_result",
+    "points_one_team_goals",
+}
+
+
+@receiver([post_save, post_delete], sender=Match)
+@receiver([post_save, post_delete], sender=ExtraResult)
+def invalidate_results_cache(sender, instance, **kwargs):
+    """
+    Resultado oficial, gabarito de extra ou jogo novo/removido:
+    tudo que foi cacheado com a versão anterior deixa de valer.
+    """
+    bump_results_version(instance.tournament_id)
+
+
+def _touches(update_fields, fields):
+    return update_fields is None or bool(fields & set(update_fields))
+
+
+@receiver(post_save, sender=Match)
+def rescore_match_on_save(sender, instance, created, update_fields, **kwargs):
+    """
+    Resultado gravado por save() (admin, shell): repontua os palpites do
+    jogo. O serviço de resultados usa bulk_update e enfileira sozinho.
+    """
+    if created or not _touches(update_fields, RESULT_FIELDS):
+        return
+    match_id = instance.id
+    transaction.on_commit(lambda: enqueue(Job.Kind.RESCORE_MATCH, match_id))
+
+
+@receiver(post_save, sender=Stage)
+def rescore_stage_on_save(sender, instance, created, update_fields, **kwargs):
+    """
+    Regra de pontuação da etapa alterada: repontua os jogos dela.
+    """
+    if created or not _touches(update_fields, STAGE_POINT_FIELDS):
+        return
+    match_ids = list(instance.matches.values_list("id", flat=True))
+
+    def enqueue_all():
+        for match_id in match_ids:
+            enqueue(Job.Kind.RESCORE_MATCH, match_id)
+
+    transaction.on_commit(enqueue_all)
+
+
+@receiver([post_save, post_delete], sender=ExtraResult)
+def rescore_extras_on_result(sender, instance, **kwargs):
+    tournament_id = instance.tournament_id
+    transaction.on_commit(lambda: enqueue(Job.Kind.RESCORE_EXTRAS, tournament_id))
+
+
+@receiver([post_save, post_delete], sender=Bet)
+@receiver([post_save, post_delete], sender=ExtraBet)
+def invalidate_user_bets_cache(sender, instance, **kwargs):
+    bump_bets_version(instance.user_id)
@@ -0,0 +1,245 @@
+"""
+Snapshot binário dos palpites de uma etapa encerrada.
+
+Depois do prazo os palpites da etapa não mudam mais. Em vez de instanciar
+um Bet por linha a cada repontuação (copa/rescore.py), a etapa é gravada uma vez num
+arquivo colunar e lida com mmap, sem cópia:
+
+    cabeçalho  "<4sHHII": b"BSNP", versão, nº de jogos, nº de usuários,
+               nº de palpites
+    user_ids   uint32 x usuários   (índice -> User.id)
+    match_ids  uint32 x jogos      (índice -> Match.id)
+    user_idx   uint32 x palpites
+    match_idx  uint16 x palpites
+    home       uint8  x palpites
+    away       uint8  x palpites
+
+Inteiros em little-endian; palpites ordenados por (jogo, usuário).
+Todas as colunas de 4 bytes começam em offset alinhado.
+
+Ao lado do snapshot, stage-<id>.scored guarda a impressão digital dos
+resultados e das regras (Stage.points_*) com que a etapa foi pontuada
+pelo arquivo da última vez (ver copa/rescore.py). Gravar ou descartar o
+snapshot apaga esse arquivo.
+"""
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from .autosave import flush_pending
+from .models import Match, Bet
+
+MAGIC = b"BSNP"
+VERSION = 1
+HEADER = struct.Struct("<4sHHII")
+
+MAX_MATCHES = 0xFFFF
+MAX_SCORE = 0xFF
+
+# (nome, typecode do array/memoryview)
+COLUMNS = (
+    ("user_idx", "I"),
+    ("match_idx", "H"),
+    ("home", "B"),
+    ("away", "B"),
+)
+
+
+def snapshot_dir():
+    return Path(settings.COPA_SNAPSHOT_DIR)
+
+
+def snapshot_path(stage_id):
+    return snapshot_dir() / f"stage-{stage_id}.bin"
+
+
+def scored_path(stage_id):
+    return snapshot_dir() / f"stage-{stage_id}.scored"
+
+
+def read_scored(stage_id):
+    """
+    Impressão digital da última pontuação pelo snapshot, ou None.
+    """
+    try:
+        return scored_path(stage_id).read_text()
+    except FileNotFoundError:
+        return None
+
+
+def write_scored(stage_id, fingerprint):
+    scored_path(stage_id).write_text(fingerprint)
+
+
+def _little_endian(values):
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+def build_snapshot(stage):
+    """
+    Grava o snapshot da etapa (sobrescreve se já existir) e devolve o
+    número de palpites. A etapa precisa estar com o prazo encerrado.
+    """
+    if stage.deadline > timezone.now():
+        raise ValueError(f"O prazo da etapa {stage.name} ainda não encerrou.")
+    flush_pending(force=True)
+
+    match_ids = array(
+        "I",
+        Match.objects.filter(stage=stage)
+        .order_by("id")
+        .values_list("id", flat=True),
+    )
+    if len(match_ids) > MAX_MATCHES:
+        raise ValueError(f"Etapa {stage.name} com jogos demais para o snapshot.")
+    match_index = {match_id: i for i, match_id in enumerate(match_ids)}
+
+    user_ids = array("I")
+    user_index = {}
+    columns = {name: array(typecode) for name, typecode in COLUMNS}
+
+    rows = (
+        Bet.objects.filter(match__stage=stage)
+        .order_by("match_id", "user_id")
+        .values_list("user_id", "match_id", "home_score", "away_score")
+    )
+    for user_id, match_id, home, away in rows.iterator(chunk_size=5000):
+        if home > MAX_SCORE or away > MAX_SCORE:
+            raise ValueError(
+                f"Palpite {home}x{away} (jogo {match_id}) não cabe no snapshot."
+            )
+        idx = user_index.get(user_id)
+        if idx is None:
+            idx = user_index[user_id] = len(user_ids)
+            user_ids.append(user_id)
+        columns["user_idx"].append(idx)
+        columns["match_idx"].append(match_index[match_id])
+        columns["home"].append(home)
+        columns["away"].append(away)
+
+    path = snapshot_path(stage.id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Grava num temporário e troca de uma vez: leitores nunca veem arquivo pela metade.
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(
+                HEADER.pack(
+                    MAGIC,
+                    VERSION,
+                    len(match_ids),
+                    len(user_ids),
+                    len(columns["user_idx"]),
+                )
+            )
+            fh.write(_little_endian(user_ids).tobytes())
+            fh.write(_little_endian(match_ids).tobytes())
+            for name, _ in COLUMNS:
+                fh.write(_little_endian(columns[name]).tobytes())
+        os.replace(tmp, path)
+        scored_path(stage.id).unlink(missing_ok=True)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return len(columns["user_idx"])
+
+
+def discard_snapshots(stage_ids):
+    """
+    Apaga snapshots que deixaram de valer (ex.: palpites importados depois
+    do prazo com import_bets --ignore-deadline).
+    """
+    for stage_id in stage_ids:
+        snapshot_path(stage_id).unlink(missing_ok=True)
+        scored_path(stage_id).unlink(missing_ok=True)
+
+
+class BetSheet:
+    """
+    Palpites de uma etapa lidos do snapshot. As colunas são memoryviews
+    sobre o arquivo mapeado em memória (nada é copiado nem instanciado):
+
+        with load_snapshot(stage.id) as sheet:
+            for i in range(len(sheet)):
+                sheet.user_ids[sheet.user_idx[i]], sheet.home[i], ...
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as fh:
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views = []
+        try:
+            magic, version, n_matches, n_users, n_bets = HEADER.unpack_from(
+                self._mmap
+            )
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"Snapshot inválido: {path}")
+
+            offset = HEADER.size
+            self.user_ids, offset = self._column(offset, "I", n_users)
+            self.match_ids, offset = self._column(offset, "I", n_matches)
+            for name, typecode in COLUMNS:
+                view, offset = self._column(offset, typecode, n_bets)
+                setattr(self, name, view)
+            if offset != len(self._mmap):
+                raise ValueError(f"Snapshot truncado ou corrompido: {path}")
+        except BaseException:
+            self.close()
+            raise
+
+    def _column(self, offset, typecode, count):
+        size = array(typecode).itemsize * count
+        raw = memoryview(self._mmap)[offset : offset + size]
+        self._views.append(raw)
+        if sys.byteorder == "little":
+            view = raw.cast(typecode)
+            self._views.append(view)
+        else:
+            # Máquina big-endian: aqui não dá para evitar a cópia.
+            view = array(typecode, raw.tobytes())
+            view.byteswap()
+        return view, offset + size
+
+    def __len__(self):
+        return len(self.user_idx)
+
+    def __iter__(self):
+        """
+        (user_id, match_id, home_score, away_score) de cada palpite.
+        """
+        user_ids, match_ids = self.user_ids, self.match_ids
+        for u, m, h, a in zip(self.user_idx, self.match_idx, self.home, self.away):
+            yield user_ids[u], match_ids[m], h, a
+
+    def close(self):
+        # As memoryviews precisam ser liberadas antes de fechar o mmap.
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_snapshot(stage_id):
+    """
+    BetSheet da etapa, ou None se ainda não houver snapshot.
+    """
+    path = snapshot_path(stage_id)
+    if not path.exists():
+        return None
+    return BetSheet(path)
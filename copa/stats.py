@@ -0,0 +1,219 @@
+"""
+Estatísticas de desempenho calculadas no banco.
+
+- Desempenho do usuário: em vez de listar todos os palpites (com jogo
+  aninhado) e rodar calculate_points() em cada um, uma query agrupada por
+  fase devolve as contagens e a soma de pontos; os extras (no máximo um
+  por tipo) vêm de uma segunda query pequena.
+- Confronto entre dois usuários: uma única query sobre os jogos com dois
+  LEFT JOINs filtrados (um para os palpites de cada usuário).
+"""
+from django.core.cache import cache
+from django.db.models import Count, FilteredRelation, Q, Sum
+from django.utils import timezone
+
+from .cache import (
+    STATS_CACHE_SECONDS,
+    bets_version,
+    head_to_head_key,
+    results_version,
+    user_stats_key,
+)
+from .models import Stage, Match, Bet, ExtraBet, ExtraResult
+from .scoring import bet_conditions, bet_points_expression
+
+COUNTERS = ("bets", "finished", "exact_scores", "results", "one_team_goals", "points")
+
+
+def _rate(part, whole):
+    return round(part / whole, 4) if whole else 0.0
+
+
+def _with_rates(row):
+    """
+    Completa uma linha com erros, médias e taxas de acerto. Taxas e média
+    consideram só palpites de jogos já encerrados.
+    """
+    finished = row["finished"]
+    row["misses"] = (
+        finished - row["exact_scores"] - row["results"] - row["one_team_goals"]
+    )
+    row["avg_points"] = _rate(row["points"], finished)
+    row["exact_rate"] = _rate(row["exact_scores"], finished)
+    row["result_rate"] = _rate(row["results"], finished)
+    row["one_team_goals_rate"] = _rate(row["one_team_goals"], finished)
+    return row
+
+
+def compute_user_stats(tournament, user):
+    c = bet_conditions()
+    rows = (
+        Bet.objects.filter(user=user, match__tournament=tournament)
+        .values("match__stage__order", "match__stage__name")
+        .annotate(
+            bets=Count("id"),
+            finished=Count("id", filter=c["finished"]),
+            exact_scores=Count("id", filter=c["exact"]),
+            # mesmas categorias exclusivas do ranking:
+            # resultado sem placar exato; gols de um time sem acertar resultado
+            results=Count("id", filter=c["same_result"] & ~c["exact"]),
+            one_team_goals=Count(
+                "id", filter=c["one_team_goals"] & ~c["same_result"]
+            ),
+            points=Sum(bet_points_expression()),
+        )
+        .order_by("match__stage__order")
+    )
+
+    stages = []
+    totals = dict.fromkeys(COUNTERS, 0)
+    for row in rows:
+        stage = {
+            "order": row["match__stage__order"],
+            "name": row["match__stage__name"],
+        }
+        for counter in COUNTERS:
+            stage[counter] = row[counter] or 0
+            totals[counter] += stage[counter]
+        stages.append(_with_rates(stage))
+
+    results = {
+        r.type: r for r in ExtraResult.objects.filter(tournament=tournament)
+    }
+    extras_points = sum(
+        e.calculate_points(results)
+        for e in ExtraBet.objects.filter(user=user, tournament=tournament)
+    )
+
+    return {
+        "tournament": tournament.id,
+        "user_id": user.id,
+        "stages": stages,
+        "totals": _with_rates(totals),
+        "extras_points": extras_points,
+        "total_points": totals["points"] + extras_points,
+    }
+
+
+def get_user_stats(tournament, user):
+    """
+    Estatísticas do cache; invalidadas quando sai um resultado novo ou
+    quando o usuário grava um palpite.
+    """
+    key = user_stats_key(
+        tournament.id, user.id, results_version(tournament.id), bets_version(user.id)
+    )
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_user_stats(tournament, user)
+        cache.set(key, stats, STATS_CACHE_SECONDS)
+    return stats
+
+
+def _bet_of(row, prefix):
+    if row[f"{prefix}__id"] is None:
+        return None
+    return {
+        "home_score": row[f"{prefix}__home_score"],
+        "away_score": row[f"{prefix}__away_score"],
+        "points": row[f"{prefix}_points"],
+    }
+
+
+def compute_head_to_head(tournament, user_a, user_b, now=None):
+    """
+    Palpites e pontos dos dois usuários em todos os jogos de fases com
+    prazo encerrado (antes disso os palpites dos outros não são públicos).
+    """
+    now = now or timezone.now()
+    rows = (
+        Match.objects.filter(tournament=tournament, stage__deadline__lte=now)
+        .annotate(
+            bet_a=FilteredRelation("bets", condition=Q(bets__user=user_a)),
+            bet_b=FilteredRelation("bets", condition=Q(bets__user=user_b)),
+        )
+        .annotate(
+            bet_a_points=bet_points_expression("bet_a__", ""),
+            bet_b_points=bet_points_expression("bet_b__", ""),
+        )
+        .values(
+            "id",
+            "kickoff",
+            "stage__order",
+            "home_team__code",
+            "away_team__code",
+            "home_score",
+            "away_score",
+            "home_penalties",
+            "away_penalties",
+            "bet_a__id",
+            "bet_a__home_score",
+            "bet_a__away_score",
+            "bet_a_points",
+            "bet_b__id",
+            "bet_b__home_score",
+            "bet_b__away_score",
+            "bet_b_points",
+        )
+        .order_by("kickoff", "id")
+    )
+
+    matches = []
+    totals = {user_a.id: 0, user_b.id: 0}
+    for row in rows:
+        bet_a = _bet_of(row, "bet_a")
+        bet_b = _bet_of(row, "bet_b")
+        totals[user_a.id] += row["bet_a_points"]
+        totals[user_b.id] += row["bet_b_points"]
+        matches.append(
+            {
+                "id": row["id"],
+                "kickoff": row["kickoff"],
+                "stage_order": row["stage__order"],
+                "home_team": row["home_team__code"],
+                "away_team": row["away_team__code"],
+                "home_score": row["home_score"],
+                "away_score": row["away_score"],
+                "home_penalties": row["home_penalties"],
+                "away_penalties": row["away_penalties"],
+                "bets": {str(user_a.id): bet_a, str(user_b.id): bet_b},
+            }
+        )
+
+    return {
+        "tournament": tournament.id,
+        "users": [
+            {"id": u.id, "username": u.username, "points": totals[u.id]}
+            for u in (user_a, user_b)
+        ],
+        "matches": matches,
+    }
+
+
+def get_head_to_head(tournament, user_a, user_b):
+    """
+    Confronto do cache. A chave depende do par, das fases encerradas e das
+    versões de resultados e dos palpites dos dois: palpites de fases
+    encerradas ainda mudam pelo import_bets --ignore-deadline.
+    """
+    now = timezone.now()
+    closed = list(
+        Stage.objects.filter(tournament=tournament, deadline__lte=now)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    # mesmo resultado para (a, b) e (b, a)
+    user_a, user_b = sorted((user_a, user_b), key=lambda u: u.id)
+    key = head_to_head_key(
+        tournament.id,
+        user_a.id,
+        user_b.id,
+        closed,
+        results_version(tournament.id),
+        (bets_version(user_a.id), bets_version(user_b.id)),
+    )
+    data = cache.get(key)
+    if data is None:
+        data = compute_head_to_head(tournament, user_a, user_b, now)
+        cache.set(key, data, STATS_CACHE_SECONDS)
+    return data
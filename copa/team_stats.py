@@ -0,0 +1,214 @@
+"""
+Gols por seleção e gabarito automático dos extras que saem dos jogos.
+
+TeamGoals é mantido incrementalmente pelo serviço de resultados: cada
+resultado gravado soma (ou corrige) só os gols dos dois times do jogo.
+Com isso os extras de gols (MOST_GF, FEWEST_GF, MOST_GC, FEWEST_GC) são
+decididos olhando uma tabela com uma linha por seleção, e CHAMPION,
+RUNNER_UP e THIRD_PLACE saem dos dois jogos da última fase. Quando os dois
+jogos da última fase têm resultado, os ExtraResult são gravados sozinhos
+(os signals cuidam do cache e da repontuação). Empates deixam o extra
+sem gabarito automático, para decisão manual. Se um resultado da última
+fase for apagado ou corrigido, os gabaritos automáticos que deixaram de
+valer são retirados (os lançados à mão ficam).
+"""
+from collections import defaultdict
+
+from django.db.models import F
+
+from .models import Match, ExtraResult, ExtraType, TeamGoals
+
+FINAL_STAGE_ORDER = 6
+# group_name dos jogos da última fase (ver generate_knockout)
+FINAL_GROUP = "Final"
+THIRD_PLACE_GROUP = "3º lugar"
+
+GOAL_EXTRAS = {
+    # tipo: (campo, maior?)
+    ExtraType.MOST_GOALS_SCORED: ("goals_for", True),
+    ExtraType.FEWEST_GOALS_SCORED: ("goals_for", False),
+    ExtraType.MOST_GOALS_CONCEDED: ("goals_against", True),
+    ExtraType.FEWEST_GOALS_CONCEDED: ("goals_against", False),
+}
+DERIVED_EXTRAS = (
+    ExtraType.CHAMPION,
+    ExtraType.RUNNER_UP,
+    ExtraType.THIRD_PLACE,
+    *GOAL_EXTRAS,
+)
+
+
+def _goals(home_score, away_score):
+    """
+    (home_gf, away_gf) de um placar, ou None se o jogo não tem resultado.
+    """
+    if home_score is None or away_score is None:
+        return None
+    return home_score, away_score
+
+
+def match_winner(home_score, away_score, home_penalties, away_penalties):
+    """
+    "home", "away" ou None (sem resultado, ou empate sem pênaltis decisivos).
+    """
+    if home_score is None or away_score is None:
+        return None
+    if home_score != away_score:
+        return "home" if home_score > away_score else "away"
+    if home_penalties is None or away_penalties is None:
+        return None
+    if home_penalties == away_penalties:
+        return None
+    return "home" if home_penalties > away_penalties else "away"
+
+
+def apply_goal_changes(changes):
+    """
+    Atualiza TeamGoals com a diferença entre o placar antigo e o novo de
+    cada jogo: lista de (match, (home_antigo, away_antigo)). Chamar dentro
+    da transação que grava os resultados.
+    """
+    deltas = defaultdict(lambda: [0, 0, 0])  # (torneio, time) -> played, gf, ga
+    for match, (old_home, old_away) in changes:
+        for sign, goals in (
+            (-1, _goals(old_home, old_away)),
+            (1, _goals(match.home_score, match.away_score)),
+        ):
+            if goals is None:
+                continue
+            home_goals, away_goals = goals
+            for team_id, gf, ga in (
+                (match.home_team_id, home_goals, away_goals),
+                (match.away_team_id, away_goals, home_goals),
+            ):
+                delta = deltas[(match.tournament_id, team_id)]
+                delta[0] += sign
+                delta[1] += sign * gf
+                delta[2] += sign * ga
+
+    deltas = {key: d for key, d in deltas.items() if any(d)}
+    if not deltas:
+        return
+    TeamGoals.objects.bulk_create(
+        [TeamGoals(tournament_id=t, team_id=team) for t, team in deltas],
+        ignore_conflicts=True,
+    )
+    for (tournament_id, team_id), (played, gf, ga) in deltas.items():
+        TeamGoals.objects.filter(tournament_id=tournament_id, team_id=team_id).update(
+            played=F("played") + played,
+            goals_for=F("goals_for") + gf,
+            goals_against=F("goals_against") + ga,
+        )
+
+
+def rebuild_team_goals(tournament):
+    """
+    Recalcula TeamGoals do torneio do zero (recuperação; ex.: resultados
+    alterados fora do serviço de resultados, pelo admin).
+    """
+    TeamGoals.objects.filter(tournament=tournament).delete()
+    finished = Match.objects.filter(
+        tournament=tournament, home_score__isnull=False, away_score__isnull=False
+    )
+    apply_goal_changes([(match, (None, None)) for match in finished])
+
+
+def _single_best(rows, field, highest):
+    """
+    Time com o maior/menor valor de `field`, ou None se houver empate.
+    """
+    if not rows:
+        return None
+    values = [row[field] for row in rows]
+    best = max(values) if highest else min(values)
+    teams = [row["team_id"] for row in rows if row[field] == best]
+    return teams[0] if len(teams) == 1 else None
+
+
+def derive_extra_results(tournament_id):
+    """
+    Preenche os ExtraResult que saem dos jogos, quando a última fase já
+    tem resultado, e apaga os automáticos que deixaram de valer (jogo sem
+    resultado, corrigido ou empatado sem pênaltis). Gabaritos lançados à
+    mão (derived=False) nunca são sobrescritos. Devolve os tipos gravados
+    ou apagados.
+    """
+    answers = _derived_answers(tournament_id)
+    current = {
+        result.type: result
+        for result in ExtraResult.objects.filter(
+            tournament_id=tournament_id, type__in=list(answers)
+        )
+    }
+    written = []
+    for type_, team_id in answers.items():
+        result = current.get(type_)
+        if result is None:
+            result = ExtraResult(tournament_id=tournament_id, type=type_, derived=True)
+        elif not result.derived or result.team_id == team_id:
+            continue
+        # save() dispara os signals (cache e repontuação dos extras)
+        result.team_id = team_id
+        result.player_name = ""
+        result.save()
+        written.append(type_)
+
+    # delete() carrega as linhas: os signals invalidam o cache e
+    # enfileiram a repontuação dos extras
+    stale = ExtraResult.objects.filter(
+        tournament_id=tournament_id, derived=True, type__in=DERIVED_EXTRAS
+    ).exclude(type__in=list(answers))
+    withdrawn = list(stale.values_list("type", flat=True))
+    if withdrawn:
+        stale.delete()
+    return written + withdrawn
+
+
+def _derived_answers(tournament_id):
+    """
+    {tipo: team_id} dos extras decididos pelos jogos (vazio enquanto a
+    última fase não tem os dois resultados).
+    """
+    final_matches = {
+        m.group_name: m
+        for m in Match.objects.filter(
+            tournament_id=tournament_id,
+            stage__order=FINAL_STAGE_ORDER,
+            group_name__in=(FINAL_GROUP, THIRD_PLACE_GROUP),
+        )
+    }
+    final = final_matches.get(FINAL_GROUP)
+    third = final_matches.get(THIRD_PLACE_GROUP)
+    if final is None or third is None or not (final.is_finished and third.is_finished):
+        return {}
+
+    answers = {}
+    final_winner = match_winner(
+        final.home_score, final.away_score, final.home_penalties, final.away_penalties
+    )
+    if final_winner:
+        champion, runner_up = (
+            (final.home_team_id, final.away_team_id)
+            if final_winner == "home"
+            else (final.away_team_id, final.home_team_id)
+        )
+        answers[ExtraType.CHAMPION] = champion
+        answers[ExtraType.RUNNER_UP] = runner_up
+    third_winner = match_winner(
+        third.home_score, third.away_score, third.home_penalties, third.away_penalties
+    )
+    if third_winner:
+        answers[ExtraType.THIRD_PLACE] = (
+            third.home_team_id if third_winner == "home" else third.away_team_id
+        )
+
+    rows = list(
+        TeamGoals.objects.filter(tournament_id=tournament_id, played__gt=0).values(
+            "team_id", "goals_for", "goals_against"
+        )
+    )
+    for type_, (field, highest) in GOAL_EXTRAS.items():
+        team_id = _single_best(rows, field, highest)
+        if team_id is not None:
+            answers[type_] = team_id
+    return answers
@@ -1,3 +1,654 @@
-from django.test import TestCase
+import json
+import re
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .archive import BET_FIELDS, EXTRA_BET_FIELDS, archive_tournament, restore_tournament
+from .autosave import _buffer_key, autosave_bets, flush_pending, flush_user
+from .jobs import claim_jobs, run_job
+from .models import (
+    Tournament,
+    Stage,
+    Team,
+    Match,
+    AutosaveBuffer,
+    Bet,
+    ExtraBet,
+    ExtraResult,
+    ExtraType,
+    Job,
+    TournamentArchive,
+)
+from .ranking import compute_ranking, ranking_querysets
+from .scoring import bet_points_expression, result_points_expression, score_bet
+from .views import MatchViewSet, BetViewSet
+
+User = get_user_model()
+
+# Tabelas de dimensão (dezenas de linhas): varrer inteiras é aceitável.
+SMALL_TABLES = {"copa_tournament", "copa_stage", "copa_team"}
+
+
+def full_scans(queryset):
+    """
+    Roda EXPLAIN na query e devolve (tabelas varridas por completo, plano).
+    """
+    vendor = connection.vendor
+
+    if vendor == "mysql":
+        plan = queryset.explain(format="JSON")
+        tables = []
+
+        def walk(node):
+            if isinstance(node, dict):
+                if node.get("access_type") == "ALL":
+                    tables.append(node.get("table_name"))
+                for value in node.values():
+                    walk(value)
+            elif isinstance(node, list):
+                for value in node:
+                    walk(value)
+
+        walk(json.loads(plan))
+        return tables, plan
+
+    plan = queryset.explain()
+    if vendor == "postgresql":
+        return re.findall(r"Seq Scan on (\w+)", plan), plan
+    if vendor == "sqlite":
+        # "SCAN tabela" (sem SEARCH) = varredura completa, com ou sem índice
+        return re.findall(r"\bSCAN (?!CONSTANT)(\w+)", plan), plan
+    raise NotImplementedError(f"EXPLAIN não suportado para {vendor}.")
+
+
+class HotQueryPlanTests(TestCase):
+    """
+    Garante que as queries quentes continuam usando índices.
+    Se alguma regredir para varredura completa, o teste falha e mostra o plano.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        teams = Team.objects.bulk_create(
+            Team(name=f"Time {i}", code=f"T{i:02d}") for i in range(16)
+        )
+        cls.users = User.objects.bulk_create(
+            User(username=f"user{i}") for i in range(10)
+        )
+
+        # Vários torneios: os filtros por torneio precisam ser seletivos,
+        # senão o otimizador prefere (com razão) varrer a tabela.
+        for t in range(4):
+            tournament = Tournament.objects.create(
+                name=f"Torneio {t}",
+                start_date=now,
+                extras_deadline=now + timedelta(days=1),
+            )
+            matches = []
+            for order in range(1, 7):
+                stage = Stage.objects.create(
+                    tournament=tournament,
+                    order=order,
+                    name=f"Fase {order}",
+                    deadline=now + timedelta(days=order),
+                    points_exact_score=25,
+                    points_result=10,
+                    points_one_team_goals=5,
+                )
+                for i in range(8):
+                    matches.append(
+                        Match(
+                            tournament=tournament,
+                            stage=stage,
+                            home_team=teams[(2 * i) % 16],
+                            away_team=teams[(2 * i + 1) % 16],
+                            kickoff=now + timedelta(days=order, hours=i),
+                            group_name="A" if order == 1 else None,
+                            home_score=i % 3,
+                            away_score=i % 2,
+                        )
+                    )
+            matches = Match.objects.bulk_create(matches)
+            Bet.objects.bulk_create(
+                Bet(user=u, match=m, home_score=1, away_score=0)
+                for u in cls.users
+                for m in matches
+            )
+            ExtraBet.objects.bulk_create(
+                ExtraBet(
+                    tournament=tournament, user=u, type=ExtraType.CHAMPION, team=teams[0]
+                )
+                for u in cls.users
+            )
+
+        cls.tournament = Tournament.objects.order_by("id").last()
+        cls.group_stage = cls.tournament.stages.get(order=1)
+        cls.final_stage = cls.tournament.stages.get(order=6)
+
+        if connection.vendor == "mysql":
+            with connection.cursor() as cursor:
+                for model in (Match, Bet, ExtraBet, Stage):
+                    cursor.execute(f"ANALYZE TABLE {model._meta.db_table}")
+
+    def setUp(self):
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsesIndexes(self, queryset):
+        tables, plan = full_scans(queryset)
+        scanned = [t for t in tables if t not in SMALL_TABLES]
+        self.assertEqual(scanned, [], f"Varredura completa em {scanned}:\n{plan}")
+
+    def _view_queryset(self, viewset_class, query, user=None):
+        factory = APIRequestFactory()
+        request = Request(factory.get("/", query))
+        request.user = user or self.users[0]
+        view = viewset_class(request=request, format_kwarg=None, kwargs={})
+        return view.get_queryset()
+
+    # ---------- RankingView ----------
+
+    def test_ranking_bets(self):
+        bets, _ = ranking_querysets(self.tournament)
+        self.assertUsesIndexes(bets)
+
+    def test_ranking_extra_bets(self):
+        _, extra_bets = ranking_querysets(self.tournament)
+        self.assertUsesIndexes(extra_bets)
+
+    # ---------- MatchViewSet ----------
+
+    def test_matches_by_tournament(self):
+        qs = self._view_queryset(MatchViewSet, {"tournament": self.tournament.id})
+        self.assertUsesIndexes(qs)
+
+    def test_matches_by_tournament_and_stage(self):
+        qs = self._view_queryset(
+            MatchViewSet,
+            {"tournament": self.tournament.id, "stage": self.group_stage.id},
+        )
+        self.assertUsesIndexes(qs)
+
+    def test_matches_by_tournament_and_stage_order(self):
+        qs = self._view_queryset(
+            MatchViewSet, {"tournament": self.tournament.id, "stage_order": 1}
+        )
+        self.assertUsesIndexes(qs)
+
+    # ---------- BetViewSet ----------
+
+    def test_bets_of_user(self):
+        qs = self._view_queryset(BetViewSet, {}, user=self.users[3])
+        self.assertUsesIndexes(qs)
+
+    # ---------- generate_knockout ----------
+
+    def test_knockout_stage_matches(self):
+        qs = Match.objects.filter(tournament=self.tournament, stage=self.final_stage)
+        self.assertUsesIndexes(qs.order_by("kickoff", "id"))
+
+    def test_knockout_group_matches(self):
+        qs = Match.objects.filter(
+            tournament=self.tournament, stage=self.group_stage
+        ).select_related("home_team", "away_team")
+        self.assertUsesIndexes(qs)
+
+    def test_knockout_undecided_matches(self):
+        qs = Match.objects.filter(
+            tournament=self.tournament, stage=self.group_stage
+        ).filter(home_score__isnull=True) | Match.objects.filter(
+            tournament=self.tournament, stage=self.group_stage, away_score__isnull=True
+        )
+        self.assertUsesIndexes(qs)
+
+
+class ArchiveRoundTripTests(TestCase):
+    """
+    archive_tournament + restore_tournament: a classificação não muda com
+    o torneio arquivado e os palpites voltam idênticos.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        teams = Team.objects.bulk_create(
+            Team(name=f"Time {i}", code=f"T{i:02d}") for i in range(4)
+        )
+        users = User.objects.bulk_create(User(username=f"user{i}") for i in range(5))
+        cls.tournament = Tournament.objects.create(
+            name="Torneio", start_date=now, extras_deadline=now - timedelta(days=1)
+        )
+        # um jogo ainda aberto e sem resultado: o arquivamento (--force)
+        # precisa fechar o prazo antes do dump
+        for order, deadline, score in (
+            (1, now - timedelta(days=1), (2, 1)),
+            (2, now + timedelta(days=1), (None, None)),
+        ):
+            stage = Stage.objects.create(
+                tournament=cls.tournament,
+                order=order,
+                name=f"Fase {order}",
+                deadline=deadline,
+                points_exact_score=25,
+                points_result=10,
+                points_one_team_goals=5,
+            )
+            match = Match.objects.create(
+                tournament=cls.tournament,
+                stage=stage,
+                home_team=teams[0],
+                away_team=teams[1],
+                kickoff=deadline,
+                home_score=score[0],
+                away_score=score[1],
+            )
+            for i, user in enumerate(users):
+                bet = Bet.objects.create(
+                    user=user, match=match, home_score=i % 3, away_score=i % 2
+                )
+                bet.points = bet.calculate_points()
+                bet.save(update_fields=["points"])
+        ExtraResult.objects.create(
+            tournament=cls.tournament, type=ExtraType.TOP_SCORER, player_name="Müller"
+        )
+        for i, user in enumerate(users):
+            ExtraBet.objects.create(
+                tournament=cls.tournament,
+                user=user,
+                type=ExtraType.TOP_SCORER,
+                player_name="MULLER" if i % 2 else "Kane",
+            )
+
+    def setUp(self):
+        archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(archive_dir.cleanup)
+        settings = override_settings(COPA_ARCHIVE_DIR=archive_dir.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def rows(self):
+        return (
+            list(
+                Bet.objects.filter(match__tournament=self.tournament)
+                .order_by("id")
+                .values(*BET_FIELDS)
+            ),
+            list(
+                ExtraBet.objects.filter(tournament=self.tournament)
+                .order_by("id")
+                .values(*EXTRA_BET_FIELDS)
+            ),
+        )
+
+    def test_archive_and_restore(self):
+        standings = compute_ranking(self.tournament)
+        rows = self.rows()
+
+        archive = archive_tournament(self.tournament, chunk_size=3)
+        self.assertEqual((archive.bets_count, archive.extra_bets_count), (10, 5))
+        self.assertEqual(self.rows(), ([], []))
+        self.assertFalse(
+            self.tournament.stages.filter(deadline__gt=timezone.now()).exists()
+        )
+        self.assertEqual(compute_ranking(self.tournament), standings)
+
+        self.assertEqual(
+            restore_tournament(self.tournament, chunk_size=3), (10, 5, 0)
+        )
+        self.assertFalse(TournamentArchive.objects.exists())
+        self.assertEqual(self.rows(), rows)
+        self.assertEqual(compute_ranking(self.tournament), standings)
+
+
+@override_settings(COPA_AUTOSAVE_SECONDS=60)
+class AutosaveTests(TestCase):
+    """
+    Buffer do autosave no cache (AutosaveBuffer marca quem tem buffer):
+    coalescência, gravação em Bet e gravação direta perto do prazo ou sem
+    cache compartilhado.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        home, away = Team.objects.bulk_create(
+            [Team(name="Casa", code="CAS"), Team(name="Fora", code="FOR")]
+        )
+        cls.user = User.objects.create(username="torcedor")
+        tournament = Tournament.objects.create(
+            name="Torneio", start_date=now, extras_deadline=now + timedelta(days=1)
+        )
+        cls.stage = Stage.objects.create(
+            tournament=tournament,
+            order=1,
+            name="Fase 1",
+            deadline=now + timedelta(days=1),
+            points_exact_score=25,
+            points_result=10,
+            points_one_team_goals=5,
+        )
+        cls.matches = Match.objects.bulk_create(
+            Match(
+                tournament=tournament,
+                stage=cls.stage,
+                home_team=home,
+                away_team=away,
+                kickoff=now + timedelta(days=2),
+            )
+            for _ in range(2)
+        )
+
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        backend = "django.core.cache.backends.filebased.FileBasedCache"
+        settings = override_settings(
+            CACHES={"default": {"BACKEND": backend, "LOCATION": cache_dir.name}}
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def scores(self):
+        rows = Bet.objects.filter(user=self.user).values_list(
+            "match_id", "home_score", "away_score"
+        )
+        return {match_id: (home, away) for match_id, home, away in rows}
+
+    def buffered(self):
+        buffer = cache.get(_buffer_key(self.user.id))
+        return buffer["bets"] if buffer else {}
+
+    def test_buffer_keeps_last_score(self):
+        first, second = self.matches
+        self.assertEqual(autosave_bets(self.user, [(first.id, 1, 0)]), "buffered")
+        self.assertEqual(autosave_bets(self.user, [(first.id, 2, 0)]), "buffered")
+        self.assertEqual(autosave_bets(self.user, [(second.id, 0, 0)]), "buffered")
+        self.assertEqual(self.scores(), {})
+        self.assertEqual(self.buffered(), {first.id: (2, 0), second.id: (0, 0)})
+        self.assertEqual(AutosaveBuffer.objects.count(), 1)
+
+    def test_flush(self):
+        first, second = self.matches
+        autosave_bets(self.user, [(first.id, 1, 0), (second.id, 3, 3)])
+        self.assertEqual(flush_pending(), 0)  # buffer ainda novo
+
+        self.assertEqual(flush_user(self.user.id), 2)
+        self.assertEqual(self.scores(), {first.id: (1, 0), second.id: (3, 3)})
+        self.assertEqual(self.buffered(), {})
+        self.assertFalse(AutosaveBuffer.objects.exists())
+
+        autosave_bets(self.user, [(first.id, 4, 1)])
+        self.assertEqual(flush_pending(force=True), 1)
+        self.assertEqual(self.scores()[first.id], (4, 1))
+
+    def test_flush_old_and_closed(self):
+        first, _ = self.matches
+        autosave_bets(self.user, [(first.id, 1, 0)])
+        AutosaveBuffer.objects.update(
+            created_at=timezone.now() - timedelta(minutes=2)
+        )
+        self.assertEqual(flush_pending(), 1)
+
+        autosave_bets(self.user, [(first.id, 2, 2)])
+        AutosaveBuffer.objects.update(deadline=timezone.now())
+        self.assertEqual(flush_pending(), 1)
+        self.assertEqual(self.scores(), {first.id: (2, 2)})
+
+    def test_write_through_near_deadline(self):
+        first, second = self.matches
+        autosave_bets(self.user, [(first.id, 1, 0)])
+        Stage.objects.filter(pk=self.stage.pk).update(
+            deadline=timezone.now() + timedelta(seconds=60)
+        )
+        self.assertEqual(autosave_bets(self.user, [(second.id, 2, 1)]), "written")
+        # o buffer anterior vai junto
+        self.assertEqual(self.scores(), {first.id: (1, 0), second.id: (2, 1)})
+        self.assertEqual(self.buffered(), {})
+        self.assertFalse(AutosaveBuffer.objects.exists())
+
+    @override_settings(COPA_AUTOSAVE_SECONDS=0)
+    def test_disabled_writes_through(self):
+        first, _ = self.matches
+        self.assertEqual(autosave_bets(self.user, [(first.id, 1, 1)]), "written")
+        self.assertEqual(self.scores(), {first.id: (1, 1)})
+        self.assertFalse(AutosaveBuffer.objects.exists())
+
+    def test_unshared_cache_writes_through(self):
+        first, _ = self.matches
+        for backend in ("locmem.LocMemCache", "db.DatabaseCache"):
+            config = {
+                "BACKEND": f"django.core.cache.backends.{backend}",
+                "LOCATION": "copa_cache",
+            }
+            with override_settings(CACHES={"default": config}):
+                self.assertEqual(
+                    autosave_bets(self.user, [(first.id, 3, 2)]), "written"
+                )
+        self.assertEqual(self.scores(), {first.id: (3, 2)})
+        self.assertFalse(AutosaveBuffer.objects.exists())
+
+
+class StoredPointsTests(TestCase):
+    """
+    Pontos gravados em Bet.points: mesmas regras do score_bet() nas
+    expressões SQL, no lançamento em lote, no worker de jobs e nas edições
+    pelo admin (resultado e Stage.points_*), e o que as telas mostram.
+    """
+
+    SCORES = [(home, away) for home in range(4) for away in range(4)]
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        teams = Team.objects.bulk_create(
+            Team(name=f"Time {i}", code=f"T{i:02d}") for i in range(4)
+        )
+        cls.admin = User.objects.create(username="admin", is_superuser=True)
+        cls.users = User.objects.bulk_create(
+            User(username=f"torcedor{i}") for i in range(len(cls.SCORES))
+        )
+        cls.tournament = Tournament.objects.create(
+            name="Torneio", start_date=now, extras_deadline=now
+        )
+        cls.stage = Stage.objects.create(
+            tournament=cls.tournament,
+            order=1,
+            name="Fase 1",
+            deadline=now - timedelta(hours=1),
+            points_exact_score=25,
+            points_result=10,
+            points_one_team_goals=5,
+        )
+        cls.matches = Match.objects.bulk_create(
+            Match(
+                tournament=cls.tournament,
+                stage=cls.stage,
+                home_team=teams[i],
+                away_team=teams[i + 1],
+                kickoff=now + timedelta(hours=i),
+            )
+            for i in range(2)
+        )
+        # um usuário por placar de 0x0 a 3x3, com o mesmo palpite nos dois jogos
+        Bet.objects.bulk_create(
+            Bet(user=user, match=match, home_score=home, away_score=away)
+            for user, (home, away) in zip(cls.users, cls.SCORES)
+            for match in cls.matches
+        )
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def expected(self, match):
+        match.refresh_from_db()
+        stage = Stage.objects.get(pk=match.stage_id)
+        return {
+            user.id: score_bet(
+                home,
+                away,
+                match.home_score,
+                match.away_score,
+                stage.points_exact_score,
+                stage.points_result,
+                stage.points_one_team_goals,
+            )
+            for user, (home, away) in zip(self.users, self.SCORES)
+        }
+
+    def stored(self, match):
+        return dict(Bet.objects.filter(match=match).values_list("user_id", "points"))
+
+    def set_result(self, match, home, away):
+        with self.captureOnCommitCallbacks(execute=True):
+            match.home_score, match.away_score = home, away
+            match.save()
+
+    def test_expressions_match_score_bet(self):
+        match = self.matches[0]
+        for home, away in [(None, None)] + self.SCORES:
+            Match.objects.filter(pk=match.pk).update(home_score=home, away_score=away)
+            expected = self.expected(match)
+            joined = dict(
+                Bet.objects.filter(match=match)
+                .annotate(value=bet_points_expression())
+                .values_list("user_id", "value")
+            )
+            single = dict(
+                Bet.objects.filter(match=match)
+                .annotate(value=result_points_expression(home, away, 25, 10, 5))
+                .values_list("user_id", "value")
+            )
+            self.assertEqual(joined, expected, (home, away))
+            self.assertEqual(single, expected, (home, away))
+
+    @override_settings(COPA_JOBS_EAGER=True)
+    def test_bulk_results(self):
+        first, second = self.matches
+        client = self.client_for(self.admin)
+        url = "/api/copa/matches/results/"
+
+        response = client.patch(
+            url,
+            [
+                {"id": first.id, "home_score": 2, "away_score": 1},
+                {"id": second.id, "home_score": "x"},
+            ],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("1", response.json()["errors"])
+        first.refresh_from_db()
+        self.assertIsNone(first.home_score)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.patch(
+                url,
+                [
+                    {"id": first.id, "home_score": 2, "away_score": 1},
+                    {"id": second.id, "home_score": 0, "away_score": 0},
+                ],
+                format="json",
+            )
+        self.assertEqual(response.status_code, 200)
+        for match in self.matches:
+            self.assertEqual(self.stored(match), self.expected(match))
+
+        response = self.client_for(self.users[0]).patch(url, [], format="json")
+        self.assertEqual(response.status_code, 403)
+
+    def test_worker_runs_queued_jobs(self):
+        first, _ = self.matches
+        self.set_result(first, 1, 0)
+        self.assertEqual(set(self.stored(first).values()), {0})
+        self.assertTrue(
+            Job.objects.filter(
+                kind=Job.Kind.RESCORE_MATCH, key=str(first.id), status=Job.Status.PENDING
+            ).exists()
+        )
+
+        # os jobs enfileiram outros (ranking); roda até a fila esvaziar
+        with mock.patch("copa.jobs.close_old_connections"):
+            while job_ids := claim_jobs(10):
+                for job_id in job_ids:
+                    self.assertTrue(run_job(job_id))
+        self.assertFalse(Job.objects.exclude(status=Job.Status.DONE).exists())
+        self.assertEqual(self.stored(first), self.expected(first))
+
+    @override_settings(COPA_JOBS_EAGER=True)
+    def test_admin_match_save_rescores(self):
+        first, second = self.matches
+        self.set_result(first, 3, 3)
+        self.assertEqual(self.stored(first), self.expected(first))
+
+        # corrigido depois: os pontos acompanham
+        self.set_result(first, 0, 2)
+        self.assertEqual(self.stored(first), self.expected(first))
+        self.assertEqual(set(self.stored(second).values()), {0})
+
+    @override_settings(COPA_JOBS_EAGER=True)
+    def test_stage_points_edit_rescores_and_syncs(self):
+        first, _ = self.matches
+        self.set_result(first, 2, 0)
+        old = timezone.now() - timedelta(hours=1)
+        Bet.objects.update(updated_at=old)
+        Match.objects.update(updated_at=old)
+        cursor = str(int((old + timedelta(minutes=1)).timestamp() * 1000))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.stage.points_result = 12
+            self.stage.save()
+        self.assertEqual(self.stored(first), self.expected(first))
+
+        # só os palpites com pontos novos voltam no ?since=
+        response = self.client_for(self.users[4]).get(  # palpite 1x0
+            "/api/copa/bets/", {"since": cursor}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(bet["match"]["id"], bet["points"]) for bet in response.json()["results"]],
+            [(first.id, 12)],
+        )
+
+    @override_settings(COPA_JOBS_EAGER=True)
+    def test_stats_views(self):
+        first, second = self.matches
+        self.set_result(first, 1, 1)
+        self.set_result(second, 2, 1)
+        alice, bob = self.users[5], self.users[6]  # palpites 1x1 e 1x2
+        client = self.client_for(alice)
+        params = {"tournament": self.tournament.id}
+
+        response = client.get("/api/copa/me/stats/", params)
+        self.assertEqual(response.status_code, 200)
+        totals = response.json()["totals"]
+        self.assertEqual(totals["points"], 25 + 5)
+        self.assertEqual(totals["exact_scores"], 1)
+        self.assertEqual(totals["one_team_goals"], 1)
+
+        response = client.get("/api/copa/me/sheet/", {**params, "stage_order": 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [m["bet"]["points"] for m in response.json()["matches"]], [25, 5]
+        )
+        response = client.get("/api/copa/me/sheet/", params)
+        self.assertEqual(response.status_code, 400)
+
+        response = client.get("/api/copa/compare/", {**params, "rival": bob.id})
+        self.assertEqual(response.status_code, 200)
+        points = {u["id"]: u["points"] for u in response.json()["users"]}
+        self.assertEqual(points, {alice.id: 25 + 5, bob.id: 5 + 0})
+        response = client.get("/api/copa/compare/", {**params, "rival": 0})
+        self.assertEqual(response.status_code, 404)
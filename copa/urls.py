@@ -1,13 +1,27 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
+from .async_views import (
+    AsyncRankingView,
+    AsyncMatchListView,
+    AsyncMatchDetailView,
+    AsyncBetListView,
+    LiveEventsView,
+)
 from .views import (
     TeamViewSet,
     StageViewSet,
     MatchViewSet,
     BetViewSet,
     ExtraBetViewSet,
+    LeagueViewSet,
     RankingView,
+    MyStatsView,
+    MyStageSheetView,
+    HeadToHeadView,
+    ExportView,
+    JobStatusView,
+    ProfileReportView,
 )
 
 router = DefaultRouter()
@@ -16,8 +30,25 @@ router.register("stages", StageViewSet, basename="stage")
 router.register("matches", MatchViewSet, basename="match")
 router.register("bets", BetViewSet, basename="bet")
 router.register("extra-bets", ExtraBetViewSet, basename="extra-bet")
+router.register("leagues", LeagueViewSet, basename="league")
 
 urlpatterns = [
     path("", include(router.urls)),
     path("ranking/", RankingView.as_view(), name="ranking"),
+    path("me/stats/", MyStatsView.as_view(), name="my-stats"),
+    path("me/sheet/", MyStageSheetView.as_view(), name="my-stage-sheet"),
+    path("compare/", HeadToHeadView.as_view(), name="head-to-head"),
+    path("export/", ExportView.as_view(), name="export"),
+    path("jobs/", JobStatusView.as_view(), name="job-status"),
+    path("profiles/", ProfileReportView.as_view(), name="profile-report"),
+    # Leitura async (ASGI) para polling
+    path("async/ranking/", AsyncRankingView.as_view(), name="async-ranking"),
+    path("async/matches/", AsyncMatchListView.as_view(), name="async-match-list"),
+    path(
+        "async/matches/<int:pk>/",
+        AsyncMatchDetailView.as_view(),
+        name="async-match-detail",
+    ),
+    path("async/bets/", AsyncBetListView.as_view(), name="async-bet-list"),
+    path("live/", LiveEventsView.as_view(), name="live-events"),
 ]
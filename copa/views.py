@@ -1,11 +1,24 @@
-from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
 
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Q
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import permissions, viewsets
+from rest_framework import mixins, permissions, viewsets
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from accounts.permissions import IsSuperUser
+from bolao2026.compression import accepts_payload, cached_payload, payload_response
+from bolao2026.profiling import profile_report
+
+from .autosave import autosave_bets, flush_user, parse_autosave
+from .cache import MATCHES_CACHE_SECONDS, matches_key, results_version
+from .distributions import DISTRIBUTION_MAX_AGE, distribution_etag, get_distribution
+from .exports import EXPORT_FORMATS, iter_export
 from .models import (
     Tournament,
     Stage,
@@ -13,16 +26,128 @@ from .models import (
     Match,
     Bet,
     ExtraBet,
-    ExtraType,
+    League,
+    LeagueMembership,
+    Job,
 )
+from .ranking import get_league_ranking, get_ranking, get_ranking_payload
+from .results import apply_results, parse_result
+from .sheets import compute_stage_sheet
+from .stats import get_head_to_head, get_user_stats
 from .serializers import (
     TeamSerializer,
     StageSerializer,
     MatchSerializer,
     BetSerializer,
     ExtraBetSerializer,
+    LeagueSerializer,
+    JobSerializer,
 )
 
+User = get_user_model()
+
+
+def match_queryset(params):
+    """
+    Jogos com os filtros flexíveis da API (ver MatchViewSet).
+    `params`: request.query_params ou request.GET.
+    """
+    qs = (
+        Match.objects.select_related(
+            "tournament", "stage", "home_team", "away_team"
+        )
+        .all()
+        .order_by("kickoff", "id")
+    )
+
+    # torneio
+    tournament_id = params.get("tournament")
+    if tournament_id:
+        qs = qs.filter(tournament_id=tournament_id)
+
+    # por ID de stage (ex.: stage=2)
+    stage_id = params.get("stage")
+    if stage_id:
+        qs = qs.filter(stage_id=stage_id)
+
+    # por ordem da fase (ex.: stage__order=2, stage_order=2, stageOrder=2)
+    stage_order = (
+        params.get("stage__order")
+        or params.get("stage_order")
+        or params.get("stageOrder")
+    )
+    if stage_order:
+        qs = qs.filter(stage__order=stage_order)
+
+    # por grupo (só faz sentido na fase de grupos)
+    group_name = params.get("group_name")
+    if group_name:
+        qs = qs.filter(group_name=group_name)
+
+    return qs
+
+
+# Filtros aceitos pela lista de jogos (fazem parte da chave do cache).
+MATCH_FILTER_PARAMS = (
+    "tournament",
+    "stage",
+    "stage__order",
+    "stage_order",
+    "stageOrder",
+    "group_name",
+)
+
+
+# ?since=<cursor>: o cursor é o instante (epoch em ms) da consulta anterior
+# menos SYNC_OVERLAP, para não perder linhas de transações que gravaram com
+# updated_at um pouco antes do commit. O cliente pode receber de novo
+# algumas linhas dos últimos segundos (basta sobrescrever pelo id).
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+def parse_sync_cursor(value):
+    """
+    datetime do cursor (?since=0 na primeira sincronização), ou ValueError.
+    """
+    if not value.isdigit():
+        raise ValueError("Cursor inválido.")
+    return datetime.fromtimestamp(int(value) / 1000, tz=dt_timezone.utc)
+
+
+def next_sync_cursor():
+    """
+    Cursor a devolver; tirar antes da consulta.
+    """
+    return str(int((timezone.now() - SYNC_OVERLAP).timestamp() * 1000))
+
+
+def sync_response(data, ids, cursor):
+    """
+    Resposta do modo ?since=: linhas alteradas, IDs atuais (o que sumiu da
+    lista foi apagado) e o próximo cursor.
+    """
+    return Response({"results": data, "ids": ids, "cursor": cursor})
+
+
+def match_list_cache_key(params, version):
+    return matches_key(
+        version,
+        tuple((name, params[name]) for name in MATCH_FILTER_PARAMS if params.get(name)),
+    )
+
+
+def bet_queryset(user):
+    return (
+        Bet.objects.filter(user=user)
+        .select_related(
+            "match",
+            "match__stage",
+            "match__home_team",
+            "match__away_team",
+        )
+        .order_by("match__kickoff")
+    )
+
 
 class TeamViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Team.objects.all().order_by("name")
@@ -47,6 +172,7 @@ class MatchViewSet(viewsets.ModelViewSet):
       - ?stage_order=N
       - ?stageOrder=N
       - ?group_name=A
+      - ?since=<cursor>  (só os alterados; ver sync_response)
     """
 
     serializer_class = MatchSerializer
@@ -61,41 +187,41 @@ class MatchViewSet(viewsets.ModelViewSet):
     http_method_names = ["get", "patch", "head", "options"]
 
     def get_queryset(self):
-        qs = (
-            Match.objects.select_related(
-                "tournament", "stage", "home_team", "away_team"
-            )
-            .all()
-            .order_by("kickoff", "id")
+        return match_queryset(self.request.query_params)
+
+    def list(self, request, *args, **kwargs):
+        params = request.query_params
+        if "since" in params:
+            return self.changes(params["since"])
+        if not accepts_payload(request):
+            return super().list(request, *args, **kwargs)
+        key = match_list_cache_key(params, results_version(params.get("tournament")))
+        payload = cached_payload(
+            key,
+            lambda: self.get_serializer(
+                self.filter_queryset(self.get_queryset()), many=True
+            ).data,
+            MATCHES_CACHE_SECONDS,
         )
+        return payload_response(request, payload)
 
-        params = self.request.query_params
-
-        # torneio
-        tournament_id = params.get("tournament")
-        if tournament_id:
-            qs = qs.filter(tournament_id=tournament_id)
-
-        # por ID de stage (ex.: stage=2)
-        stage_id = params.get("stage")
-        if stage_id:
-            qs = qs.filter(stage_id=stage_id)
-
-        # por ordem da fase (ex.: stage__order=2, stage_order=2, stageOrder=2)
-        stage_order = (
-            params.get("stage__order")
-            or params.get("stage_order")
-            or params.get("stageOrder")
+    def changes(self, since):
+        """
+        GET /api/copa/matches/?tournament=ID&since=<cursor>
+        Só os jogos alterados depois do cursor (resultados, mata-mata).
+        """
+        try:
+            since = parse_sync_cursor(since)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+        cursor = next_sync_cursor()
+        qs = self.filter_queryset(self.get_queryset())
+        changed = qs.filter(updated_at__gt=since)
+        return sync_response(
+            self.get_serializer(changed, many=True).data,
+            list(qs.values_list("id", flat=True)),
+            cursor,
         )
-        if stage_order:
-            qs = qs.filter(stage__order=stage_order)
-
-        # por grupo (só faz sentido na fase de grupos)
-        group_name = params.get("group_name")
-        if group_name:
-            qs = qs.filter(group_name=group_name)
-
-        return qs
 
     def partial_update(self, request, *args, **kwargs):
         """
@@ -112,54 +238,153 @@ class MatchViewSet(viewsets.ModelViewSet):
             )
 
         instance = self.get_object()
+        try:
+            result = parse_result(request.data)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
 
-        home_score = request.data.get("home_score", None)
-        away_score = request.data.get("away_score", None)
-        home_penalties = request.data.get("home_penalties", None)
-        away_penalties = request.data.get("away_penalties", None)
+        apply_results([(instance, result)])
 
-        # Converte gols para int ou None
-        if home_score in ("", None):
-            instance.home_score = None
-        else:
-            instance.home_score = int(home_score)
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data)
 
-        if away_score in ("", None):
-            instance.away_score = None
-        else:
-            instance.away_score = int(away_score)
+    @action(detail=False, methods=["patch"], url_path="results")
+    def bulk_results(self, request):
+        """
+        PATCH /api/copa/matches/results/
 
-        # Converte pênaltis para int ou None
-        if home_penalties in ("", None):
-            instance.home_penalties = None
-        else:
-            instance.home_penalties = int(home_penalties)
+        Lança vários resultados oficiais de uma vez (apenas superuser):
+            [{"id": 1, "home_score": 2, "away_score": 0}, ...]
+        Mesmos campos do PATCH de um jogo. Tudo é validado antes de gravar:
+        se algum item tiver erro, nada é gravado. A repontuação e a
+        invalidação do cache acontecem uma vez só para o lote.
+        """
+        if not request.user.is_superuser:
+            return Response(
+                {"detail": "Apenas superusuários podem alterar resultados oficiais."},
+                status=403,
+            )
 
-        if away_penalties in ("", None):
-            instance.away_penalties = None
-        else:
-            instance.away_penalties = int(away_penalties)
+        items = request.data
+        if isinstance(items, dict):
+            items = items.get("results")
+        if not isinstance(items, list) or not items:
+            return Response(
+                {"detail": "Envie uma lista de resultados."}, status=400
+            )
+
+        ids = [item.get("id") if isinstance(item, dict) else None for item in items]
+        matches = Match.objects.select_related("tournament").in_bulk(
+            [i for i in ids if isinstance(i, int)]
+        )
 
-        instance.save()
+        errors = {}
+        results = []
+        seen = set()
+        for index, (item, match_id) in enumerate(zip(items, ids)):
+            match = matches.get(match_id)
+            if match is None:
+                errors[index] = f"Jogo {match_id!r} não existe."
+                continue
+            if match_id in seen:
+                errors[index] = f"Jogo {match_id} repetido no lote."
+                continue
+            seen.add(match_id)
+            try:
+                results.append((match, parse_result(item)))
+            except ValueError as exc:
+                errors[index] = str(exc)
+
+        if errors:
+            return Response(
+                {"detail": "Nenhum resultado foi gravado.", "errors": errors},
+                status=400,
+            )
 
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        apply_results(results)
+        updated = match_queryset({}).filter(id__in=seen)
+        return Response(self.get_serializer(updated, many=True).data)
+
+    @action(detail=True, methods=["get"])
+    def distribution(self, request, pk=None):
+        """
+        GET /api/copa/matches/<id>/distribution/
+
+        Percentual de vitória/empate/derrota palpitados e placares mais
+        comuns. Só depois do prazo da etapa. Quase nunca muda, mas pode ser
+        recalculada (import_bets --ignore-deadline): cache curto no cliente,
+        revalidado pelo ETag (304 quando não mudou). 503 enquanto o job que
+        congela a etapa não terminou.
+        """
+        data = get_distribution(self.get_object())
+        if data is None:
+            return Response(
+                {"detail": "Distribuição disponível só após o prazo da etapa."},
+                status=403,
+            )
+        etag = distribution_etag(data)
+        if etag in request.headers.get("If-None-Match", ""):
+            response = Response(status=304)
+        else:
+            response = Response(data)
+        response["ETag"] = etag
+        response["Cache-Control"] = (
+            f"private, max-age={DISTRIBUTION_MAX_AGE}, must-revalidate"
+        )
+        return response
 
 
 class BetViewSet(viewsets.ModelViewSet):
     serializer_class = BetSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # buffer do autosave entra antes de ler/gravar
+        if self.action != "autosave":
+            flush_user(request.user.id)
+
     def get_queryset(self):
-        return (
-            Bet.objects.filter(user=self.request.user)
-            .select_related(
-                "match",
-                "match__stage",
-                "match__home_team",
-                "match__away_team",
-            )
-            .order_by("match__kickoff")
+        return bet_queryset(self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        """
+        GET /api/copa/bets/?since=<cursor>: só os palpites alterados depois
+        do cursor, ou cujo jogo mudou (pontos novos).
+        """
+        since = request.query_params.get("since")
+        if since is None:
+            return super().list(request, *args, **kwargs)
+        try:
+            since = parse_sync_cursor(since)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+        cursor = next_sync_cursor()
+        qs = self.get_queryset()
+        changed = qs.filter(Q(updated_at__gt=since) | Q(match__updated_at__gt=since))
+        return sync_response(
+            self.get_serializer(changed, many=True).data,
+            list(qs.values_list("id", flat=True)),
+            cursor,
+        )
+
+    @action(detail=False, methods=["post"])
+    def autosave(self, request):
+        """
+        POST /api/copa/bets/autosave/
+        body: {match_id, home_score, away_score} ou uma lista deles
+
+        Guarda o último placar de cada jogo no buffer e grava em lote
+        (ver copa/autosave.py). 202 se ficou no buffer, 200 se foi gravado.
+        """
+        try:
+            items = parse_autosave(request.data)
+            state = autosave_bets(request.user, items)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+        return Response(
+            {"status": state, "count": len(items)},
+            status=202 if state == "buffered" else 200,
         )
 
 
@@ -175,6 +400,72 @@ class ExtraBetViewSet(viewsets.ModelViewSet):
         return qs.select_related("tournament", "team")
 
 
+class LeagueViewSet(
+    mixins.CreateModelMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet,
+):
+    """
+    /api/copa/leagues/
+
+    Mini-ligas privadas do usuário logado (?tournament=ID para filtrar).
+    Quem cria a liga vira dono e membro; os outros entram pelo código de
+    convite.
+    """
+
+    serializer_class = LeagueSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        qs = (
+            League.objects.filter(
+                pk__in=LeagueMembership.objects.filter(
+                    user=self.request.user
+                ).values("league_id")
+            )
+            .select_related("owner")
+            .annotate(members_count=Count("memberships"))
+            .order_by("name")
+        )
+        tournament_id = self.request.query_params.get("tournament")
+        if tournament_id:
+            qs = qs.filter(tournament_id=tournament_id)
+        return qs
+
+    @action(detail=False, methods=["post"])
+    def join(self, request):
+        """
+        POST /api/copa/leagues/join/  {"invite_code": "..."}
+        """
+        code = str(request.data.get("invite_code", "")).strip().upper()
+        league = get_object_or_404(League, invite_code=code)
+        LeagueMembership.objects.get_or_create(league=league, user=request.user)
+        return Response(self.get_serializer(self.get_queryset().get(pk=league.pk)).data)
+
+    @action(detail=True, methods=["post"])
+    def leave(self, request, pk=None):
+        """
+        POST /api/copa/leagues/<id>/leave/
+        """
+        league = self.get_object()
+        if league.owner_id == request.user.id:
+            return Response(
+                {"detail": "O dono não pode sair da própria liga."}, status=400
+            )
+        LeagueMembership.objects.filter(league=league, user=request.user).delete()
+        return Response(status=204)
+
+    @action(detail=True, methods=["get"])
+    def ranking(self, request, pk=None):
+        """
+        GET /api/copa/leagues/<id>/ranking/
+
+        Mesmos pontos e desempates do ranking geral, só com os membros.
+        """
+        return Response(get_league_ranking(self.get_object()))
+
+
 class RankingView(APIView):
     """
     GET /api/copa/ranking/?tournament=<id>
@@ -182,74 +473,158 @@ class RankingView(APIView):
 
     permission_classes = [permissions.IsAuthenticated]
 
+    def get(self, request):
+        tournament_id = request.query_params.get("tournament")
+        tournament = get_object_or_404(Tournament, id=tournament_id)
+        if not accepts_payload(request):
+            return Response(get_ranking(tournament))
+        return payload_response(request, get_ranking_payload(tournament))
+
+
+class MyStatsView(APIView):
+    """
+    GET /api/copa/me/stats/?tournament=<id>
+
+    Desempenho do usuário logado por fase: palpites, placares exatos,
+    resultados, gols de um time, pontos, média e taxas de acerto.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        tournament_id = request.query_params.get("tournament")
+        tournament = get_object_or_404(Tournament, id=tournament_id)
+        return Response(get_user_stats(tournament, request.user))
+
+
+class MyStageSheetView(APIView):
+    """
+    GET /api/copa/me/sheet/?tournament=<id>&stage_order=<N>
+
+    Jogos da etapa, cada um com o palpite do usuário logado (ou null) e
+    os pontos, mais o prazo da etapa. Substitui /matches/ + /bets/ na
+    tela de palpites.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        tournament_id = request.query_params.get("tournament")
+        tournament = get_object_or_404(Tournament, id=tournament_id)
+        stage_order = request.query_params.get("stage_order") or request.query_params.get(
+            "stageOrder"
+        )
+        if not stage_order or not stage_order.isdigit():
+            return Response({"detail": "Informe stage_order."}, status=400)
+
+        flush_user(request.user.id)
+        sheet = compute_stage_sheet(tournament, int(stage_order), request.user)
+        if sheet is None:
+            return Response({"detail": "Não encontrado."}, status=404)
+        return Response(sheet)
+
+
+class HeadToHeadView(APIView):
+    """
+    GET /api/copa/compare/?tournament=<id>&rival=<user_id>
+
+    Palpites e pontos do usuário logado e do rival, jogo a jogo, em todas
+    as fases com prazo encerrado.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        tournament_id = request.query_params.get("tournament")
+        tournament = get_object_or_404(Tournament, id=tournament_id)
+        rival_id = request.query_params.get("rival")
+        rival = get_object_or_404(User, id=rival_id, is_active=True)
+        return Response(get_head_to_head(tournament, request.user, rival))
+
+
+class ExportView(APIView):
+    """
+    GET /api/copa/export/?tournament=<id>&output=ndjson|csv
+
+    Dump completo de palpites (jogos + extras) de todos os usuários, com
+    pontos calculados. Apenas superuser. Resposta em streaming.
+    """
+
+    permission_classes = [IsSuperUser]
+
     def get(self, request):
         tournament_id = request.query_params.get("tournament")
         tournament = get_object_or_404(Tournament, id=tournament_id)
 
-        bets = (
-            Bet.objects.filter(match__tournament=tournament)
-            .select_related("user", "match", "match__stage")
+        output = request.query_params.get("output", "ndjson")
+        if output not in EXPORT_FORMATS:
+            return Response(
+                {"detail": f"Formato inválido. Use: {', '.join(EXPORT_FORMATS)}."},
+                status=400,
+            )
+        content_type, extension = EXPORT_FORMATS[output]
+
+        response = StreamingHttpResponse(
+            iter_export(tournament, output), content_type=content_type
         )
-        extra_bets = (
-            ExtraBet.objects.filter(tournament=tournament)
-            .select_related("user")
+        response["Content-Disposition"] = (
+            f'attachment; filename="palpites-torneio-{tournament.id}.{extension}"'
         )
+        return response
 
-        data = defaultdict(
-            lambda: {
-                "user_id": None,
-                "username": "",
-                "position": 0,
-                "total_points": 0,
-                "exact_scores": 0,
-                "results": 0,
-                "stage5_points": 0,
-                "extras_points": 0,
-                "champion_hit": False,
-            }
+
+class JobStatusView(APIView):
+    """
+    GET /api/copa/jobs/?status=&kind=
+
+    Fila de jobs em segundo plano (apenas superuser): quantidade por
+    status e os últimos jobs (mais recentes primeiro).
+    """
+
+    permission_classes = [IsSuperUser]
+    RECENT_JOBS = 50
+
+    def get(self, request):
+        counts = dict.fromkeys(Job.Status.values, 0)
+        counts.update(
+            Job.objects.values_list("status").annotate(n=Count("id")).order_by()
         )
 
-        # Pontos dos jogos
-        for b in bets:
-            uid = b.user_id
-            if data[uid]["user_id"] is None:
-                data[uid]["user_id"] = uid
-                data[uid]["username"] = b.user.username
-
-            pts = b.calculate_points()
-            data[uid]["total_points"] += pts
-            data[uid]["stage5_points"] += b.points_stage5()
-            if b.is_exact_score():
-                data[uid]["exact_scores"] += 1
-            elif b.is_correct_result():
-                data[uid]["results"] += 1
-
-        # Pontos dos extras
-        for e in extra_bets:
-            uid = e.user_id
-            if data[uid]["user_id"] is None:
-                data[uid]["user_id"] = uid
-                data[uid]["username"] = e.user.username
-            pts = e.calculate_points()
-            data[uid]["total_points"] += pts
-            data[uid]["extras_points"] += pts
-            if e.type == ExtraType.CHAMPION and pts > 0:
-                data[uid]["champion_hit"] = True
-
-        ranking = list(data.values())
-
-        ranking.sort(
-            key=lambda x: (
-                -x["total_points"],
-                -int(x["champion_hit"]),
-                -x["exact_scores"],
-                -x["results"],
-                -x["stage5_points"],
-                -x["extras_points"],
-            )
+        qs = Job.objects.order_by("-id")
+        for param in ("status", "kind"):
+            value = request.query_params.get(param)
+            if value:
+                qs = qs.filter(**{param: value})
+
+        return Response(
+            {
+                "counts": counts,
+                "jobs": JobSerializer(qs[: self.RECENT_JOBS], many=True).data,
+            }
         )
 
-        for i, row in enumerate(ranking, start=1):
-            row["position"] = i
 
-        return Response(ranking)
+class ProfileReportView(APIView):
+    """
+    GET /api/copa/profiles/?view=&top=&sort=
+
+    Perfis das requisições lentas amostradas (apenas superuser), somados
+    por view: funções mais caras por requisição (ver bolao2026/profiling.py).
+    sort: cumulative (padrão), tottime ou calls.
+    """
+
+    permission_classes = [IsSuperUser]
+
+    def get(self, request):
+        top = request.query_params.get("top", "30")
+        if not top.isdigit() or int(top) < 1:
+            return Response({"detail": "top inválido."}, status=400)
+        try:
+            report = profile_report(
+                label=request.query_params.get("view") or None,
+                top=int(top),
+                sort=request.query_params.get("sort", "cumulative"),
+            )
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+        return Response(report)